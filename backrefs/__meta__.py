@@ -193,5 +193,5 @@ def parse_version(ver: str) -> Version:
     return Version(major, minor, micro, release, pre, post, dev)
 
 
-__version_info__ = Version(7, 0, 0, "final")
+__version_info__ = Version(7, 1, 0, "final")
 __version__ = __version_info__._get_canonical()
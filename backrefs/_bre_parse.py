@@ -11,7 +11,8 @@ import copyreg as _copyreg
 from . import util as _util
 import unicodedata as _unicodedata
 from . import uniprops as _uniprops
-from typing import Generic, AnyStr, Match, Any, Pattern, cast
+from . import _charset
+from typing import Generic, AnyStr, Match, Any, Pattern, Callable, cast
 
 if sys.version_info >= (3, 11):
     import re._parser as _parser  # type: ignore[import]
@@ -43,6 +44,18 @@ _SCOPED_END = frozenset((':', ')'))
 
 _CURLY_BRACKETS_ORD = frozenset((0x7b, 0x7d))
 
+# Search patterns without any of the following cannot be altered by the search parser:
+# backrefs escapes, global flags, comments or a trailing `(` (which are validated), or a `[` inside
+# a character class (POSIX style properties) or set operators.
+_RE_SEARCH_EXTENDED = _re.compile(
+    r'\\[cCeEhlLmMNpPQRX]|\((?:\?(?:[aiLmsux]+\)|#|\Z)|\Z)|\[\^?\]?(?:\\.|[^\]\\])*?(?:\[|&&|--)',
+    _re.DOTALL
+)
+_RE_SEARCH_EXTENDED_BYTES = _re.compile(_RE_SEARCH_EXTENDED.pattern.encode('ascii'), _re.DOTALL)
+
+# Anything resembling a global flag group, which may require the pattern to be parsed again.
+_RE_GLOBAL_FLAGS = _re.compile(r'\(\?([aiLmsux]+)\)')
+
 _COMPATIBILITY_PROPERTIES = frozenset(
     (
         'alpha', 'lower', 'upper', 'punct', 'digit', 'xdigit', 'alnum',
@@ -87,6 +100,23 @@ class _SearchParser(Generic[AnyStr]):
     _bytes_line_break = r'(?>\r\n|[\n\v\f\r\x85])' if _util.PY311 else r'(?:\r\n|(?!\r\n)[\n\v\f\r\x85])'
     _grapheme_cluster = r'(?:{}{}*(?!{}))'
 
+    # Runs of characters that need no special handling in a given context, so they can be skipped in one step.
+    _plain_quote = _re.compile(r'[^\\]+')
+    _plain_comment = _re.compile(r'[^\\\n]+')
+    _plain_class = (_re.compile(r'[^\\\[\]^-]+'), _re.compile(r'[^\\\[\]^&-]+'))
+    # Second character of a set operator in a character class, which must be followed by an operand.
+    _set_operator = {'&': _re.compile(r'&(?!\])'), '-': _re.compile(r'-(?!\])')}
+    _plain = (_re.compile(r'[^\\(\[]+'), _re.compile(r'[^\\(\[#]+'))
+    _plain_group = (_re.compile(r'[^\\()\[]+'), _re.compile(r'[^\\()\[#]+'))
+
+    # Property and name syntax accepted by `get_unicode_property` and `get_named_unicode`,
+    # used when a pass only needs to settle the global flags.
+    _dry_property = (
+        _re.compile(r'[a-z\u0131\u017f]|\{\^?[\w \-]*(?:\}|[:=][\w \-]*[a-z0-9][\w \-]*\})', _re.I | _re.A),
+        _re.compile(r'[a-z\u0131\u017f]|:\^?[\w \-]*(?:\}|:\]|[:=][\w \-]*[a-z0-9][\w \-]*:\])', _re.I | _re.A)
+    )
+    _dry_named = _re.compile(r'\{[^}]*\}')
+
     verbose: bool
     unicode: bool
     global_flag_swap: dict[str, bool]
@@ -94,8 +124,15 @@ class _SearchParser(Generic[AnyStr]):
     ascii: bool  # noqa: A003
     is_bytes: bool
     search: AnyStr
+    dry_run: bool
 
-    def __init__(self, search: AnyStr, re_verbose: bool = False, re_unicode: bool | None = None) -> None:
+    def __init__(
+        self,
+        search: AnyStr,
+        re_verbose: bool = False,
+        re_unicode: bool | None = None,
+        re_setops: bool = False
+    ) -> None:
         """Initialize."""
 
         if isinstance(search, bytes):
@@ -110,6 +147,8 @@ class _SearchParser(Generic[AnyStr]):
         self.search = search
         self.re_verbose = re_verbose
         self.re_unicode = re_unicode
+        self.re_setops = re_setops
+        self.dry_run = False
 
     def process_quotes(self, text: str) -> str:
         """Process quotes."""
@@ -141,6 +180,11 @@ class _SearchParser(Generic[AnyStr]):
             else:
                 current.append(t)
 
+            if not escaped:
+                run = i.match(self._plain_quote)
+                if run:
+                    (quoted if in_quotes else current).append(run)
+
         if in_quotes and escaped:
             quoted.append("\\")
         elif escaped:
@@ -169,6 +213,10 @@ class _SearchParser(Generic[AnyStr]):
                     current.append(t)
                 else:
                     current.append(t)
+                if not escaped:
+                    run = i.match(self._plain_comment)
+                    if run:
+                        current.append(run)
                 t = next(i)
         except StopIteration:
             pass
@@ -208,6 +256,11 @@ class _SearchParser(Generic[AnyStr]):
     def get_unicode_property(self, i: _util.StringIter, brackets: bool = False) -> tuple[str, str]:
         """Get Unicode property."""
 
+        if self.dry_run:
+            if not i.match(self._dry_property[brackets]):
+                raise SyntaxError('Invalid Unicode property!')
+            return '', ''
+
         index = i.index
         prop = []
         value = []
@@ -277,6 +330,11 @@ class _SearchParser(Generic[AnyStr]):
     def get_named_unicode(self, i: _util.StringIter) -> str:
         """Get Unicode name."""
 
+        if self.dry_run:
+            if not i.match(self._dry_named):
+                raise SyntaxError('Invalid Unicode name!')
+            return ''
+
         index = i.index
         value = []
         try:
@@ -422,15 +480,18 @@ class _SearchParser(Generic[AnyStr]):
             if not scoped:
                 return [flags]
 
-        current = []
+        current = [t]
+        closed = False
         try:
-            while t != ')':
-                if not current:
-                    current.append(t)
-                else:
-                    current.extend(self.normal(t, i))
-
+            while True:
+                run = i.match(self._plain_group[self.verbose])
+                if run:
+                    current.append(run)
                 t = next(i)
+                if t == ')':
+                    closed = True
+                    break
+                current.extend(self.normal(t, i))
         except StopIteration:
             pass
 
@@ -438,14 +499,14 @@ class _SearchParser(Generic[AnyStr]):
         self.verbose = verbose
         self.unicode = unicode_flag
 
-        if t == ")":
+        if closed:
             current.append(t)
         return current
 
     def char_groups(self, t: str, i: _util.StringIter) -> list[str]:
         """Handle character groups."""
 
-        current = []
+        current = []  # type: list[str]
         pos = i.index - 1
         found = False
         escaped = False
@@ -453,9 +514,24 @@ class _SearchParser(Generic[AnyStr]):
         found_property = False
         self.found_property = False
         self.found_named_unicode = False
+        # Positions in `current` where an operand of a set operation starts, and the operators before them.
+        splits = []  # type: list[int]
+        operators = []  # type: list[str]
 
         try:
             while True:
+                # Set operators between two operands.
+                if (
+                    self.re_setops and not escaped and found and t in '&-' and pos != first + 1 and
+                    i.match(self._set_operator[t])
+                ):
+                    splits.append(len(current))
+                    operators.append(t * 2)
+                    pos += 2
+                    t = next(i)
+                    self.found_property = False
+                    continue
+
                 # Prevent POSIX/Unicode class from being part of a range.
                 if self.found_property and t == '-':
                     current.append(_re.escape(t))
@@ -473,8 +549,9 @@ class _SearchParser(Generic[AnyStr]):
                     idx = len(current) - 1
                     current.extend(self.reference(t, i, True))
                     if self.found_property:
-                        # Prevent Unicode class from being part of a range.
-                        if idx >= 0 and current[idx] == '-':
+                        # Prevent Unicode class from being part of a range,
+                        # unless the hyphen ends the previous operand of a set operation.
+                        if idx >= (splits[-1] if splits else 0) and current[idx] == '-':
                             current[idx] = _re.escape('-')
                         found_property = True
                 elif t == "[" and not found:
@@ -490,7 +567,7 @@ class _SearchParser(Generic[AnyStr]):
                         i.rewind(i.index - index)
                     if prop is not None:
                         value = self.unicode_props(prop[0], prop[1], in_group=True)
-                        if current[-1] == '-':
+                        if len(current) > (splits[-1] if splits else 0) and current[-1] == '-':
                             current[-1] = _re.escape('-')
                         current.extend(value)
                         found_property = True
@@ -507,6 +584,12 @@ class _SearchParser(Generic[AnyStr]):
                 else:
                     current.append(t)
                 pos += 1
+                if not escaped:
+                    run = i.match(self._plain_class[self.re_setops])
+                    if run:
+                        current.append(run)
+                        pos += len(run)
+                        self.found_property = False
                 t = next(i)
         except StopIteration:
             pass
@@ -514,6 +597,13 @@ class _SearchParser(Generic[AnyStr]):
         if escaped:
             current.append(t)
 
+        if operators:
+            if not found and not self.dry_run:
+                return self.set_operation(current, splits, operators)
+            # The class is not evaluated, so put the operators back.
+            for split, operator in zip(reversed(splits), reversed(operators), strict=True):
+                current.insert(split, operator)
+
         # Handle properties that return an empty string.
         # This will occur when a property's values exceed
         # either the Unicode char limit on a narrow system,
@@ -531,6 +621,19 @@ class _SearchParser(Generic[AnyStr]):
 
         return current
 
+    def set_operation(self, current: list[str], splits: list[int], operators: list[str]) -> list[str]:
+        """Replace a character class with set operators with a class of the resulting characters."""
+
+        start = 2 if current[1] == '^' else 1
+        bounds = [start, *splits, len(current) - 1]
+        operands = [''.join(current[bounds[x]:bounds[x + 1]]) for x in range(len(bounds) - 1)]
+        ranges = _charset.evaluate(operands, operators, self.is_bytes, not self.unicode)
+        negate = '^' if start == 2 else ''
+        if not ranges:
+            # An empty class matches nothing, or everything when negated.
+            return [f'[{"" if negate else "^"}{_uniprops.ASCII_RANGE if self.is_bytes else _uniprops.UNICODE_RANGE}]']
+        return [f'[{negate}{_charset.to_class(ranges)}]']
+
     def normal(self, t: str, i: _util.StringIter) -> list[str]:
         """Handle normal chars."""
 
@@ -555,6 +658,9 @@ class _SearchParser(Generic[AnyStr]):
     def unicode_name(self, name: str, in_group: bool = False) -> list[str]:
         """Insert Unicode value by its name."""
 
+        if self.dry_run:
+            return ['']
+
         value = ord(_unicodedata.lookup(name))
         if self.is_bytes and value > 0xFF:
             if not in_group:
@@ -585,6 +691,9 @@ class _SearchParser(Generic[AnyStr]):
         if not prop_value and prop_value is not None:
             prop_value = None
 
+        if self.dry_run:
+            return ['']
+
         if self.is_bytes:
             mode = _uniprops.MODE_ASCII
         elif not self.unicode:
@@ -607,14 +716,17 @@ class _SearchParser(Generic[AnyStr]):
         current = []
         try:
             while True:
+                run = i.match(self._plain[self.verbose])
+                if run:
+                    current.append(run)
                 t = next(i)
                 current.extend(self.normal(t, i))
         except StopIteration:
             pass
         return current
 
-    def _parse(self, search: str) -> str:
-        """Begin parsing."""
+    def _reset(self) -> None:
+        """Reset the parser state."""
 
         self.verbose = bool(self.re_verbose)
         self.unicode = bool(self.re_unicode)
@@ -630,14 +742,33 @@ class _SearchParser(Generic[AnyStr]):
         if not self.unicode and not self.ascii:
             self.unicode = True
 
-        new_pattern = []
-        i = _util.StringIter(self.process_quotes(search))
+    def settled(self, flags: str) -> bool:
+        """Check whether none of the given global flags would change the current flags."""
 
+        if 'x' in flags and not self.verbose:
+            return False
+        if self.unicode:
+            return 'a' not in flags and 'L' not in flags
+        return 'u' not in flags or self.is_bytes
+
+    def _run(self, i: _util.StringIter, flags: str) -> list[str]:
+        """Parse the pattern, starting over each time a global flag changes how the pattern is parsed."""
+
+        new_pattern = []
         retry = True
         while retry:
             retry = False
+            # A pass that may be started over only needs to find the global flags,
+            # so it skips resolving properties and names, which is where most of the time goes.
+            self.dry_run = not self.settled(flags)
+            verbose, unicode = self.verbose, self.unicode
             try:
                 new_pattern = self.main_group(i)
+                if self.dry_run:
+                    self.dry_run = False
+                    self.verbose, self.unicode = verbose, unicode
+                    i.rewind(i.index)
+                    new_pattern = self.main_group(i)
             except GlobalRetryException as e:
                 # Prevent a loop of retry over and over for a pattern like ((?u)(?a))
                 # or (?-x:(?x))
@@ -657,27 +788,56 @@ class _SearchParser(Generic[AnyStr]):
                 }
                 i.rewind(i.index)
                 retry = True
-        return "".join(new_pattern)
+        return new_pattern
+
+    def _parse(self, search: str) -> str:
+        """Begin parsing."""
+
+        self._reset()
+        text = self.process_quotes(search)
+        flags = ''.join(_RE_GLOBAL_FLAGS.findall(text))
+        try:
+            return "".join(self._run(_util.StringIter(text), flags))
+        except Exception:
+            if not self.dry_run:
+                raise
+        # Parse again without skipping anything so that errors are reported exactly as they would be otherwise.
+        self._reset()
+        return "".join(self._run(_util.StringIter(text), ''))
 
     def parse(self) -> AnyStr:
         """Apply search template."""
 
         if isinstance(self.search, bytes):
+            if _RE_SEARCH_EXTENDED_BYTES.search(self.search) is None:
+                return self.search
             return self._parse(self.search.decode('latin-1')).encode('latin-1')
         else:
+            if _RE_SEARCH_EXTENDED.search(self.search) is None:
+                return self.search
             return self._parse(self.search)
 
 
 class _ReplaceParser(Generic[AnyStr]):
     """Pre-replace template."""
 
-    def __init__(self, pattern: Pattern[AnyStr], template: AnyStr, use_format: bool = False) -> None:
+    # Runs of characters that need no special handling in a case span, so they can be converted in one step.
+    _plain_span = (_re.compile(r'[^\\]+'), _re.compile(r'[^\\{}]+'))
+
+    def __init__(
+        self,
+        pattern: Pattern[AnyStr],
+        template: AnyStr,
+        use_format: bool = False,
+        use_codegen: bool = False
+    ) -> None:
         """Initialize."""
 
         self.pattern = pattern  # type: Pattern[AnyStr]
         self._original = template  # type: AnyStr
         self._template = template  # type: AnyStr
         self.use_format = use_format
+        self.use_codegen = use_codegen
         self.end_found = False
         self.group_slots = []  # type: list[tuple[int, tuple[int | None, int | None, Any]]]
         self.literal_slots = []  # type: list[str]
@@ -1245,6 +1405,9 @@ class _ReplaceParser(Generic[AnyStr]):
                         self.result.append(t)
                         raise
                 else:
+                    if self.is_bytes:
+                        # Only ASCII letters are converted, so a run converts the same as its characters do.
+                        t += i.match(self._plain_span[self.use_format])
                     self.result.append(self.convert_case(t, case))
                 if self.end_found or count > len(self.span_stack):
                     self.end_found = False
@@ -1258,13 +1421,9 @@ class _ReplaceParser(Generic[AnyStr]):
         """Convert case."""
 
         if self.is_bytes:
-            cased = []
-            for c in value:
-                if c in _ASCII_LETTERS:
-                    cased.append(c.lower() if case == _LOWER else c.upper())
-                else:
-                    cased.append(c)
-            return "".join(cased)
+            # Byte strings only convert ASCII letters.
+            b = value.encode('latin-1')
+            return (b.lower() if case == _LOWER else b.upper()).decode('latin-1')
         else:
             return value.lower() if case == _LOWER else value.upper()
 
@@ -1377,22 +1536,49 @@ class _ReplaceParser(Generic[AnyStr]):
             tuple(self.literals),
             hash(self.pattern),
             self.use_format,
-            self.is_bytes
+            self.is_bytes,
+            self.use_codegen
         )
 
 
+def _lower_first(value: AnyStr) -> AnyStr:
+    """Lowercase the first character."""
+
+    return value[0:1].lower() + value[1:]
+
+
+def _upper_first(value: AnyStr) -> AnyStr:
+    """Uppercase the first character."""
+
+    return value[0:1].upper() + value[1:]
+
+
+def _wrap_capture(value: AnyStr | None) -> list[AnyStr]:
+    """Wrap a group in a list of captures."""
+
+    return [] if value is None else [value]
+
+
 class ReplaceTemplate(_util.Immutable, Generic[AnyStr]):
     """Replacement template expander."""
 
-    __slots__ = ("groups", "group_slots", "literals", "pattern_hash", "use_format", "_hash", "_bytes")
+    __slots__ = (
+        "groups", "group_slots", "literals", "pattern_hash", "use_format", "use_codegen",
+        "_hash", "_bytes", "_table", "_expand", "_expand_into", "_template"
+    )
 
     groups: tuple[tuple[int, int], ...]
     group_slots: tuple[tuple[int, tuple[int | None, int | None, Any]], ...]
     literals: tuple[AnyStr | None, ...]
     pattern_hash: int
     use_format: bool
+    use_codegen: bool
     _hash: int
     _bytes: bool
+    _table: tuple[tuple[int, int | None, int | None, Any, Any] | None, ...]
+    _expand: Callable[[Match[AnyStr] | None], AnyStr] | None
+    _expand_into: Callable[[Match[AnyStr] | None, Callable[[AnyStr], Any]], None] | None
+    _template: AnyStr | None
 
     def __init__(
         self,
@@ -1401,22 +1587,30 @@ class ReplaceTemplate(_util.Immutable, Generic[AnyStr]):
         literals: tuple[AnyStr | None, ...],
         pattern_hash: int,
         use_format: bool,
-        is_bytes: bool
+        is_bytes: bool,
+        use_codegen: bool = False
     ) -> None:
         """Initialize."""
 
+        table = self._build_table(groups, group_slots, literals, use_format, is_bytes)
+        expand, expand_into = self._generate(table, literals, use_format, is_bytes) if use_codegen else (None, None)
         super().__init__(
             use_format=use_format,
+            use_codegen=use_codegen,
             groups=groups,
             group_slots=group_slots,
             literals=literals,
             pattern_hash=pattern_hash,
             _bytes=is_bytes,
+            _table=table,
+            _template=self._build_template(table, literals, use_format, is_bytes),
+            _expand=expand,
+            _expand_into=expand_into,
             _hash=hash(
                 (
                     type(self),
                     groups, group_slots, literals,
-                    pattern_hash, use_format, is_bytes
+                    pattern_hash, use_format, is_bytes, use_codegen
                 )
             )
         )
@@ -1424,6 +1618,8 @@ class ReplaceTemplate(_util.Immutable, Generic[AnyStr]):
     def __call__(self, m: Match[AnyStr] | None) -> AnyStr:
         """Call."""
 
+        if self._expand is not None:
+            return self._expand(m)
         return self.expand(m)
 
     def __hash__(self) -> int:
@@ -1441,6 +1637,7 @@ class ReplaceTemplate(_util.Immutable, Generic[AnyStr]):
             self.literals == other.literals and
             self.pattern_hash == other.pattern_hash and
             self.use_format == other.use_format and
+            self.use_codegen == other.use_codegen and
             self._bytes == other._bytes
         )
 
@@ -1454,55 +1651,175 @@ class ReplaceTemplate(_util.Immutable, Generic[AnyStr]):
             self.literals != other.literals or
             self.pattern_hash != other.pattern_hash or
             self.use_format != other.use_format or
+            self.use_codegen != other.use_codegen or
             self._bytes != self._bytes
         )
 
     def __repr__(self) -> str:  # pragma: no cover
         """Representation."""
 
-        return "{}.{}({!r}, {!r}, {!r}, {!r}, {!r})".format(
+        return "{}.{}({!r}, {!r}, {!r}, {!r}, {!r}, {!r}, {!r})".format(
             self.__module__, self.__class__.__name__,
             self.groups, self.group_slots, self.literals,
-            self.pattern_hash, self.use_format
+            self.pattern_hash, self.use_format, self._bytes, self.use_codegen
         )
 
-    def _get_group_index(self, index: int) -> int:
-        """Find and return the appropriate group index."""
+    @staticmethod
+    def _build_table(
+        groups: tuple[tuple[int, int], ...],
+        group_slots: tuple[tuple[int, tuple[int | None, int | None, Any]], ...],
+        literals: tuple[AnyStr | None, ...],
+        use_format: bool,
+        is_bytes: bool
+    ) -> tuple[tuple[int, int | None, int | None, Any, Any] | None, ...]:
+        """
+        Map each group slot to its group index and attributes so expansion can look them up directly.
 
-        g_index = 0
-        for group in self.groups:
-            if group[0] == index:
-                g_index = group[1]
-                break
-        return g_index
+        The format operations of each slot are also compiled to a function that formats the captures.
+        """
+
+        g_index = {}  # type: dict[int, int]
+        for slot, group in groups:
+            g_index.setdefault(slot, group)
+        g_attributes = {}  # type: dict[int, tuple[int | None, int | None, Any]]
+        for slot, attributes in group_slots:
+            g_attributes.setdefault(slot, attributes)
+
+        table = []  # type: list[tuple[int, int | None, int | None, Any, Any] | None]
+        for slot, l in enumerate(literals):
+            if l is None:
+                span_case, single_case, capture = g_attributes.get(slot, (None, None, -1))
+                fmt = None  # type: Callable[[Any], Any] | None
+                if use_format:
+                    if is_bytes:
+                        fmt = _util.compile_format(capture, _util._to_bstr, b'')
+                    else:
+                        fmt = _util.compile_format(capture, _util._to_str, '')
+                table.append((g_index.get(slot, 0), span_case, single_case, capture, fmt))
+            else:
+                table.append(None)
+        return tuple(table)
 
-    def _get_group_attributes(self, index: int) -> tuple[int | None, int | None, Any]:
-        """Find and return the appropriate group case."""
+    @staticmethod
+    def _build_template(
+        table: tuple[tuple[int, int | None, int | None, Any, Any] | None, ...],
+        literals: tuple[AnyStr | None, ...],
+        use_format: bool,
+        is_bytes: bool
+    ) -> AnyStr | None:
+        """
+        Build an equivalent template string for the regular expression engine if there is one.
+
+        Templates that only insert groups and literal text can be expanded by the engine itself,
+        which avoids calling back into Python for every match.
+        """
 
-        g_case = (None, None, -1)  # type: tuple[int | None, int | None, Any]
-        for group in self.group_slots:
-            if group[0] == index:
-                g_case = group[1]
-                break
-        return g_case
+        if use_format:
+            return None
+
+        parts = []  # type: list[str]
+        for l, group in zip(literals, table, strict=True):
+            if group is None:
+                text = l.decode('latin-1') if isinstance(l, bytes) else cast(str, l)
+                parts.append(text.replace('\\', '\\\\'))
+            elif group[1] is not None or group[2] is not None:
+                return None
+            else:
+                parts.append(f'\\g<{group[0]}>')
+        template = ''.join(parts)
+        return cast('AnyStr', template.encode('latin-1') if is_bytes else template)
+
+    @staticmethod
+    def _generate(
+        table: tuple[tuple[int, int | None, int | None, Any, Any] | None, ...],
+        literals: tuple[AnyStr | None, ...],
+        use_format: bool,
+        is_bytes: bool
+    ) -> tuple[
+        Callable[[Match[AnyStr] | None], AnyStr],
+        Callable[[Match[AnyStr] | None, Callable[[AnyStr], Any]], None]
+    ]:
+        """
+        Generate functions that expand a match with this specific template.
+
+        The first returns the expansion, the second writes its pieces to a writer.
+        """
+
+        namespace = {
+            'wrap': _wrap_capture,
+            'lower_first': _lower_first,
+            'upper_first': _upper_first
+        }  # type: dict[str, Any]
+        parts = []  # type: list[str]
+        for index, (l, group) in enumerate(zip(literals, table, strict=True)):
+            if group is None:
+                parts.append(repr(l))
+                continue
+            g_index, span_case, single_case, capture, fmt = group
+            if not use_format:
+                value = f'(g({g_index}) or sep)'
+            elif capture[1:] == ((_util.FMT_INDEX, None),):
+                value = f'(g({g_index}) or sep)'
+            else:
+                namespace[f'fmt{index}'] = fmt
+                value = f'fmt{index}(wrap(g({g_index})))'
+            if span_case is not None:
+                value = f'{value}.lower()' if span_case == _LOWER else f'{value}.upper()'
+            if single_case is not None:
+                value = f'lower_first({value})' if single_case == _LOWER else f'upper_first({value})'
+            parts.append(value)
+
+        prologue = (
+            '    if m is None:',
+            '        raise ValueError("Match is None!")',
+            '    sep = m.string[:0]',
+            f'    if not isinstance(sep, {"bytes" if is_bytes else "str"}):',
+            "        raise TypeError('Match string type does not match expander string type!')",
+            '    g = m.group',
+        )  # type: tuple[str, ...]
+        source = '\n'.join(
+            (
+                'def expand(m):',
+                *prologue,
+                f'    return sep.join([{", ".join(parts)}])',
+                'def expand_into(m, write):',
+                *prologue,
+                *[f'    write({part})' for part in parts]
+            )
+        )
+        exec(compile(source, '<backrefs template>', 'exec'), namespace)  # noqa: S102
+        return namespace['expand'], namespace['expand_into']
 
     def expand(self, m: Match[AnyStr] | None) -> AnyStr:
         """Using the template, expand the string."""
 
+        if self._expand is not None:
+            return self._expand(m)
+
+        text = []  # type: list[AnyStr]
+        return self._expand_pieces(m, text.append).join(text)
+
+    def expand_into(self, m: Match[AnyStr] | None, write: Callable[[AnyStr], Any]) -> None:
+        """Using the template, write the expansion piece by piece without joining it."""
+
+        if self._expand_into is not None:
+            self._expand_into(m, write)
+        else:
+            self._expand_pieces(m, write)
+
+    def _expand_pieces(self, m: Match[AnyStr] | None, write: Callable[[AnyStr], Any]) -> AnyStr:
+        """Write the pieces of the expansion and return an empty string of the match's type."""
+
         if m is None:
             raise ValueError("Match is None!")
 
         sep = m.string[:0]
         if not isinstance(sep, bytes if self._bytes else str):
             raise TypeError('Match string type does not match expander string type!')
-        text = []
         # Expand string
-        for x in range(0, len(self.literals)):
-            index = x
-            l = self.literals[x]
-            if l is None:
-                g_index = self._get_group_index(index)
-                span_case, single_case, capture = self._get_group_attributes(index)
+        for l, group in zip(self.literals, self._table, strict=True):
+            if group is not None:
+                g_index, span_case, single_case, _, fmt = group
                 if not self.use_format:
                     # Non format replace
                     try:
@@ -1517,12 +1834,7 @@ class ReplaceTemplate(_util.Immutable, Generic[AnyStr]):
                         obj = m.group(g_index)
                     except IndexError as e:  # pragma: no cover
                         raise IndexError(f"'{g_index}' is out of range!") from e
-                    l = _util.format_captures(
-                        [] if obj is None else [obj],
-                        capture,
-                        _util._to_bstr if isinstance(sep, bytes) else _util._to_str,
-                        sep
-                    )
+                    l = fmt([] if obj is None else [obj])
                 if span_case is not None:
                     if span_case == _LOWER:
                         l = l.lower()
@@ -1533,15 +1845,17 @@ class ReplaceTemplate(_util.Immutable, Generic[AnyStr]):
                         l = l[0:1].lower() + l[1:]
                     else:
                         l = l[0:1].upper() + l[1:]
-            text.append(l)
+            write(cast('AnyStr', l))
 
-        return sep.join(text)
+        return sep
 
 
 def _pickle(r):  # type: ignore[no-untyped-def]
     """Pickle."""
 
-    return ReplaceTemplate, (r.groups, r.group_slots, r.literals, r.pattern_hash, r.use_format, r._bytes)
+    return ReplaceTemplate, (
+        r.groups, r.group_slots, r.literals, r.pattern_hash, r.use_format, r._bytes, r.use_codegen
+    )
 
 
 _copyreg.pickle(ReplaceTemplate, _pickle)
@@ -13,7 +13,7 @@ try:  # pragma: no cover
     from regex.regex import _compile_replacement_helper  # type: ignore[import]
 except ImportError:  # pragma: no cover
     from regex._main import _compile_replacement_helper  # type: ignore[import]
-from typing import Generic, AnyStr, Any, cast
+from typing import Generic, AnyStr, Any, Callable, cast
 from ._bregex_typing import Pattern, Match
 
 _ASCII_LETTERS = frozenset(
@@ -40,6 +40,12 @@ _SCOPED_END = frozenset((':', ')'))
 
 _CURLY_BRACKETS_ORD = frozenset((0x7b, 0x7d))
 
+# Search patterns without any of the following cannot be altered by the search parser:
+# backrefs escapes, POSIX style properties, comments or a trailing `(` (which are validated), or flags
+# that toggle verbose or the version.
+_RE_SEARCH_EXTENDED = _regex.compile(r'\\[eRQE]|\[:|\((?:\?(?:[-\w]*[xV]|#|\Z)|\Z)', _regex.DOTALL)
+_RE_SEARCH_EXTENDED_BYTES = _regex.compile(_RE_SEARCH_EXTENDED.pattern.encode('ascii'), _regex.DOTALL)
+
 # Case upper or lower
 _UPPER = 1
 _LOWER = 2
@@ -74,12 +80,22 @@ class _SearchParser(Generic[AnyStr]):
     _line_break = r'(?>\r\n|[\n\v\f\r\x85\u2028\u2029])'
     _bytes_line_break = r'(?>\r\n|[\n\v\f\r\x85])'
 
+    # Runs of characters that need no special handling in a given context, so they can be skipped in one step.
+    _plain_quote = _regex.compile(r'[^\\]+')
+    _plain_comment = _regex.compile(r'[^\\\n]+')
+    _plain_class = _regex.compile(r'[^\\\[\]^]+')
+    _plain = (_regex.compile(r'[^\\(\[]+'), _regex.compile(r'[^\\(\[#]+'))
+    _plain_group = (_regex.compile(r'[^\\()\[]+'), _regex.compile(r'[^\\()\[#]+'))
+
     verbose: bool
     version: int
     global_flag_swap: dict[str, bool]
     temp_global_flag_swap: dict[str, bool]
     is_bytes: bool
     search: AnyStr
+    depth: int
+    version_sensitive: bool
+    verbose_sensitive: bool
 
     def __init__(self, search: AnyStr, re_verbose: bool = False, re_version: int = 0) -> None:
         """Initialize."""
@@ -127,6 +143,11 @@ class _SearchParser(Generic[AnyStr]):
             else:
                 current.append(t)
 
+            if not escaped:
+                run = i.match(self._plain_quote)
+                if run:
+                    (quoted if in_quotes else current).append(run)
+
         if in_quotes and escaped:
             quoted.append("\\")
         elif escaped:
@@ -155,6 +176,10 @@ class _SearchParser(Generic[AnyStr]):
                     current.append(t)
                 else:
                     current.append(t)
+                if not escaped:
+                    run = i.match(self._plain_comment)
+                    if run:
+                        current.append(run)
                 t = next(i)
         except StopIteration:
             pass
@@ -170,6 +195,7 @@ class _SearchParser(Generic[AnyStr]):
         enable = flags[0]
         disable = flags[1] if len(flags) > 1 else ''
 
+        version = self.version
         global_retry = False
         if (self.version == _regex.V1 or scoped) and 'x' in disable and self.verbose:
             self.verbose = False
@@ -189,7 +215,32 @@ class _SearchParser(Generic[AnyStr]):
             self.version = _regex.V1
             global_retry = True
         if global_retry:
-            raise GlobalRetryException('Global Retry')
+            swap_version = self.temp_global_flag_swap['version']
+            swap_verbose = self.temp_global_flag_swap['verbose']
+            if (
+                scoped or self.depth or
+                (swap_version and (self.version_sensitive or self.global_flag_swap['version'])) or
+                (swap_verbose and (self.verbose_sensitive or self.global_flag_swap['verbose']))
+            ):
+                raise GlobalRetryException('Global Retry')
+
+            # Nothing read so far would be read differently with the new flags,
+            # so they can be switched in place instead of parsing the pattern again.
+            # The flags are then applied again, as they would be when read again with the new flags.
+            if swap_version:
+                self.global_flag_swap['version'] = True
+            if swap_verbose:
+                self.global_flag_swap['verbose'] = True
+            self.temp_global_flag_swap = {
+                "version": False,
+                "verbose": False
+            }
+            self.flags(text, scoped)
+            return
+
+        # Flags that would act differently with the other version.
+        if 'V' in enable or (not scoped and ('x' in disable or ('x' in enable and version == _regex.V1))):
+            self.version_sensitive = True
 
     def reference(self, t: str, i: _util.StringIter, in_group: bool = False) -> list[str]:
         """Handle references."""
@@ -335,20 +386,27 @@ class _SearchParser(Generic[AnyStr]):
             if not scoped:
                 return [flags]
 
-        current = []  # type: list[str]
+        current = [t]
+        closed = False
+        self.depth += 1
         try:
-            while t != ')':
-                if not current:
-                    current.append(t)
-                else:
-                    current.extend(self.normal(t, i))
-
+            while True:
+                run = i.match(self._plain_group[self.verbose])
+                if run:
+                    current.append(run)
+                    if not self.verbose and '#' in run:
+                        self.verbose_sensitive = True
                 t = next(i)
+                if t == ')':
+                    closed = True
+                    break
+                current.extend(self.normal(t, i))
         except StopIteration:
             pass
+        self.depth -= 1
         self.verbose = verbose
 
-        if t == ")":
+        if closed:
             current.append(t)
         return current
 
@@ -380,6 +438,7 @@ class _SearchParser(Generic[AnyStr]):
                         current.append(posix)
                         pos = i.index - 2
                     else:
+                        self.version_sensitive = True
                         found += 1
                         sub_first = pos
                         current.append(t)
@@ -389,6 +448,7 @@ class _SearchParser(Generic[AnyStr]):
                         current.append(posix)
                         pos = i.index - 2
                     else:
+                        self.version_sensitive = True
                         current.append(t)
                 elif t == "^" and found == 1 and (pos == first + 1):
                     # Found ^ at start of first char set; adjust 1st char position
@@ -410,6 +470,11 @@ class _SearchParser(Generic[AnyStr]):
                 else:
                     current.append(t)
                 pos += 1
+                if not escaped:
+                    run = i.match(self._plain_class)
+                    if run:
+                        current.append(run)
+                        pos += len(run)
                 t = next(i)
         except StopIteration:
             pass
@@ -445,6 +510,11 @@ class _SearchParser(Generic[AnyStr]):
         current = []
         try:
             while True:
+                run = i.match(self._plain[self.verbose])
+                if run:
+                    current.append(run)
+                    if not self.verbose and '#' in run:
+                        self.verbose_sensitive = True
                 t = next(i)
                 current.extend(self.normal(t, i))
         except StopIteration:
@@ -471,6 +541,11 @@ class _SearchParser(Generic[AnyStr]):
         retry = True
         while retry:
             retry = False
+            # Track what would be read differently if a global flag changed, so that flags found
+            # at the top level can be switched in place when nothing before them is affected.
+            self.depth = 0
+            self.version_sensitive = False
+            self.verbose_sensitive = False
             try:
                 new_pattern = self.main_group(i)
             except GlobalRetryException as e:
@@ -498,21 +573,35 @@ class _SearchParser(Generic[AnyStr]):
         """Apply search template."""
 
         if isinstance(self.search, bytes):
+            if _RE_SEARCH_EXTENDED_BYTES.search(self.search) is None:
+                return self.search
             return self._parse(self.search.decode('latin-1')).encode('latin-1')
         else:
+            if _RE_SEARCH_EXTENDED.search(self.search) is None:
+                return self.search
             return self._parse(self.search)
 
 
 class _ReplaceParser(Generic[AnyStr]):
     """Pre-replace template."""
 
-    def __init__(self, pattern: Pattern[AnyStr], template: AnyStr, use_format: bool = False) -> None:
+    # Runs of characters that need no special handling in a case span, so they can be converted in one step.
+    _plain_span = (_regex.compile(r'[^\\]+'), _regex.compile(r'[^\\{}]+'))
+
+    def __init__(
+        self,
+        pattern: Pattern[AnyStr],
+        template: AnyStr,
+        use_format: bool = False,
+        use_codegen: bool = False
+    ) -> None:
         """Initialize."""
 
         self.pattern = pattern  # type: Pattern[AnyStr]
         self._original = template  # type: AnyStr
         self._template = template  # type: AnyStr
         self.use_format = use_format
+        self.use_codegen = use_codegen
         self.end_found = False
         self.group_slots = []  # type: list[tuple[int, tuple[int | None, int | None, Any]]]
         self.literal_slots = []  # type: list[str]
@@ -1075,6 +1164,9 @@ class _ReplaceParser(Generic[AnyStr]):
                         self.result.append(t)
                         raise
                 else:
+                    if self.is_bytes:
+                        # Only ASCII letters are converted, so a run converts the same as its characters do.
+                        t += i.match(self._plain_span[self.use_format])
                     self.result.append(self.convert_case(t, case))
                 if self.end_found or count > len(self.span_stack):
                     self.end_found = False
@@ -1088,13 +1180,9 @@ class _ReplaceParser(Generic[AnyStr]):
         """Convert case."""
 
         if self.is_bytes:
-            cased = []
-            for c in value:
-                if c in _ASCII_LETTERS:
-                    cased.append(c.lower() if case == _LOWER else c.upper())
-                else:
-                    cased.append(c)
-            return "".join(cased)
+            # Byte strings only convert ASCII letters.
+            b = value.encode('latin-1')
+            return (b.lower() if case == _LOWER else b.upper()).decode('latin-1')
         else:
             return value.lower() if case == _LOWER else value.upper()
 
@@ -1207,22 +1295,43 @@ class _ReplaceParser(Generic[AnyStr]):
             tuple(self.literals),
             hash(self.pattern),
             self.use_format,
-            self.is_bytes
+            self.is_bytes,
+            self.use_codegen
         )
 
 
+def _lower_first(value: AnyStr) -> AnyStr:
+    """Lowercase the first character."""
+
+    return value[0:1].lower() + value[1:]
+
+
+def _upper_first(value: AnyStr) -> AnyStr:
+    """Uppercase the first character."""
+
+    return value[0:1].upper() + value[1:]
+
+
 class ReplaceTemplate(_util.Immutable, Generic[AnyStr]):
     """Replacement template expander."""
 
-    __slots__ = ("groups", "group_slots", "literals", "pattern_hash", "use_format", "_hash", "_bytes")
+    __slots__ = (
+        "groups", "group_slots", "literals", "pattern_hash", "use_format", "use_codegen",
+        "_hash", "_bytes", "_table", "_expand", "_expand_into", "_template"
+    )
 
     groups: tuple[tuple[int, int], ...]
     group_slots: tuple[tuple[int, tuple[int | None, int | None, Any]], ...]
     literals: tuple[AnyStr | None, ...]
     pattern_hash: int
     use_format: bool
+    use_codegen: bool
     _hash: int
     _bytes: bool
+    _table: tuple[tuple[int, int | None, int | None, Any, Any] | None, ...]
+    _expand: Callable[[Match[AnyStr] | None], AnyStr] | None
+    _expand_into: Callable[[Match[AnyStr] | None, Callable[[AnyStr], Any]], None] | None
+    _template: AnyStr | None
 
     def __init__(
         self,
@@ -1231,22 +1340,30 @@ class ReplaceTemplate(_util.Immutable, Generic[AnyStr]):
         literals: tuple[AnyStr | None, ...],
         pattern_hash: int,
         use_format: bool,
-        is_bytes: bool
+        is_bytes: bool,
+        use_codegen: bool = False
     ) -> None:
         """Initialize."""
 
+        table = self._build_table(groups, group_slots, literals, use_format, is_bytes)
+        expand, expand_into = self._generate(table, literals, use_format, is_bytes) if use_codegen else (None, None)
         super().__init__(
             use_format=use_format,
+            use_codegen=use_codegen,
             groups=groups,
             group_slots=group_slots,
             literals=literals,
             pattern_hash=pattern_hash,
             _bytes=is_bytes,
+            _table=table,
+            _template=self._build_template(table, literals, use_format, is_bytes),
+            _expand=expand,
+            _expand_into=expand_into,
             _hash=hash(
                 (
                     type(self),
                     groups, group_slots, literals,
-                    pattern_hash, use_format, is_bytes
+                    pattern_hash, use_format, is_bytes, use_codegen
                 )
             )
         )
@@ -1254,6 +1371,8 @@ class ReplaceTemplate(_util.Immutable, Generic[AnyStr]):
     def __call__(self, m: Match[AnyStr] | None) -> AnyStr:
         """Call."""
 
+        if self._expand is not None:
+            return self._expand(m)
         return self.expand(m)
 
     def __hash__(self) -> int:
@@ -1271,6 +1390,7 @@ class ReplaceTemplate(_util.Immutable, Generic[AnyStr]):
             self.literals == other.literals and
             self.pattern_hash == other.pattern_hash and
             self.use_format == other.use_format and
+            self.use_codegen == other.use_codegen and
             self._bytes == other._bytes
         )
 
@@ -1284,54 +1404,176 @@ class ReplaceTemplate(_util.Immutable, Generic[AnyStr]):
             self.literals != other.literals or
             self.pattern_hash != other.pattern_hash or
             self.use_format != other.use_format or
+            self.use_codegen != other.use_codegen or
             self._bytes != other._bytes
         )
 
     def __repr__(self) -> str:  # pragma: no cover
         """Representation."""
 
-        return "{}.{}({!r}, {!r}, {!r}, {!r}, {!r})".format(
+        return "{}.{}({!r}, {!r}, {!r}, {!r}, {!r}, {!r}, {!r})".format(
             self.__module__, self.__class__.__name__,
             self.groups, self.group_slots, self.literals,
-            self.pattern_hash, self.use_format
+            self.pattern_hash, self.use_format, self._bytes, self.use_codegen
         )
 
-    def _get_group_index(self, index: int) -> int:
-        """Find and return the appropriate group index."""
+    @staticmethod
+    def _build_table(
+        groups: tuple[tuple[int, int], ...],
+        group_slots: tuple[tuple[int, tuple[int | None, int | None, Any]], ...],
+        literals: tuple[AnyStr | None, ...],
+        use_format: bool,
+        is_bytes: bool
+    ) -> tuple[tuple[int, int | None, int | None, Any, Any] | None, ...]:
+        """
+        Map each group slot to its group index and attributes so expansion can look them up directly.
+
+        The format operations of each slot are also compiled to a function that formats the captures.
+        """
+
+        g_index = {}  # type: dict[int, int]
+        for slot, group in groups:
+            g_index.setdefault(slot, group)
+        g_attributes = {}  # type: dict[int, tuple[int | None, int | None, Any]]
+        for slot, attributes in group_slots:
+            g_attributes.setdefault(slot, attributes)
+
+        table = []  # type: list[tuple[int, int | None, int | None, Any, Any] | None]
+        for slot, l in enumerate(literals):
+            if l is None:
+                span_case, single_case, capture = g_attributes.get(slot, (None, None, -1))
+                fmt = None  # type: Callable[[Any], Any] | None
+                if use_format:
+                    if is_bytes:
+                        fmt = _util.compile_format(capture, _util._to_bstr, b'')
+                    else:
+                        fmt = _util.compile_format(capture, _util._to_str, '')
+                table.append((g_index.get(slot, 0), span_case, single_case, capture, fmt))
+            else:
+                table.append(None)
+        return tuple(table)
+
+    @staticmethod
+    def _build_template(
+        table: tuple[tuple[int, int | None, int | None, Any, Any] | None, ...],
+        literals: tuple[AnyStr | None, ...],
+        use_format: bool,
+        is_bytes: bool
+    ) -> AnyStr | None:
+        """
+        Build an equivalent template string for the regular expression engine if there is one.
 
-        g_index = 0
-        for group in self.groups:
-            if group[0] == index:
-                g_index = group[1]
-                break
-        return g_index
+        Templates that only insert groups and literal text can be expanded by the engine itself,
+        which avoids calling back into Python for every match.
+        """
+
+        if use_format:
+            return None
+
+        parts = []  # type: list[str]
+        for l, group in zip(literals, table, strict=True):
+            if group is None:
+                text = l.decode('latin-1') if isinstance(l, bytes) else cast(str, l)
+                parts.append(text.replace('\\', '\\\\'))
+            elif group[1] is not None or group[2] is not None:
+                return None
+            else:
+                parts.append(f'\\g<{group[0]}>')
+        template = ''.join(parts)
+        return cast('AnyStr', template.encode('latin-1') if is_bytes else template)
+
+    @staticmethod
+    def _generate(
+        table: tuple[tuple[int, int | None, int | None, Any, Any] | None, ...],
+        literals: tuple[AnyStr | None, ...],
+        use_format: bool,
+        is_bytes: bool
+    ) -> tuple[
+        Callable[[Match[AnyStr] | None], AnyStr],
+        Callable[[Match[AnyStr] | None, Callable[[AnyStr], Any]], None]
+    ]:
+        """
+        Generate functions that expand a match with this specific template.
 
-    def _get_group_attributes(self, index: int) -> tuple[int | None, int | None, Any]:
-        """Find and return the appropriate group case."""
+        The first returns the expansion, the second writes its pieces to a writer.
+        """
 
-        g_case = (None, None, -1)  # type: tuple[int | None, int | None, Any]
-        for group in self.group_slots:
-            if group[0] == index:
-                g_case = group[1]
-                break
-        return g_case
+        namespace = {
+            'conv': _util._to_bstr if is_bytes else _util._to_str,
+            'lower_first': _lower_first,
+            'upper_first': _upper_first
+        }  # type: dict[str, Any]
+        parts = []  # type: list[str]
+        for index, (l, group) in enumerate(zip(literals, table, strict=True)):
+            if group is None:
+                parts.append(repr(l))
+                continue
+            g_index, span_case, single_case, capture, fmt = group
+            if not use_format:
+                value = f'(g({g_index}) or sep)'
+            elif capture[1:] == ((_util.FMT_INDEX, None),):
+                value = f'conv((c({g_index}) or [sep])[0])'
+            else:
+                namespace[f'fmt{index}'] = fmt
+                value = f'fmt{index}(c({g_index}))'
+            if span_case is not None:
+                value = f'{value}.lower()' if span_case == _LOWER else f'{value}.upper()'
+            if single_case is not None:
+                value = f'lower_first({value})' if single_case == _LOWER else f'upper_first({value})'
+            parts.append(value)
+
+        prologue = (
+            '    if m is None:',
+            '        raise ValueError("Match is None!")',
+            '    sep = m.re.pattern[:0]',
+            f'    if isinstance(sep, bytes) != {is_bytes}:',
+            "        raise TypeError('Match string type does not match expander string type!')",
+            '    g = m.group',
+            '    c = m.captures',
+        )  # type: tuple[str, ...]
+        source = '\n'.join(
+            (
+                'def expand(m):',
+                *prologue,
+                f'    return sep.join([{", ".join(parts)}])',
+                'def expand_into(m, write):',
+                *prologue,
+                *[f'    write({part})' for part in parts]
+            )
+        )
+        exec(compile(source, '<backrefs template>', 'exec'), namespace)  # noqa: S102
+        return namespace['expand'], namespace['expand_into']
 
     def expand(self, m: Match[AnyStr] | None) -> AnyStr:
         """Using the template, expand the string."""
 
+        if self._expand is not None:
+            return self._expand(m)
+
+        text = []  # type: list[AnyStr]
+        return self._expand_pieces(m, text.append).join(text)
+
+    def expand_into(self, m: Match[AnyStr] | None, write: Callable[[AnyStr], Any]) -> None:
+        """Using the template, write the expansion piece by piece without joining it."""
+
+        if self._expand_into is not None:
+            self._expand_into(m, write)
+        else:
+            self._expand_pieces(m, write)
+
+    def _expand_pieces(self, m: Match[AnyStr] | None, write: Callable[[AnyStr], Any]) -> AnyStr:
+        """Write the pieces of the expansion and return an empty string of the match's type."""
+
         if m is None:
             raise ValueError("Match is None!")
 
         sep = m.re.pattern[:0]  # type: AnyStr
         if isinstance(sep, bytes) != self._bytes:
             raise TypeError('Match string type does not match expander string type!')
-        text = []
         # Expand string
-        for index in range(0, len(self.literals)):
-            l = self.literals[index]  # type: AnyStr | None
-            if l is None:
-                g_index = self._get_group_index(index)
-                span_case, single_case, capture = self._get_group_attributes(index)
+        for l, group in zip(self.literals, self._table, strict=True):
+            if group is not None:
+                g_index, span_case, single_case, _, fmt = group
                 if not self.use_format:
                     # Non format replace
                     try:
@@ -1346,12 +1588,7 @@ class ReplaceTemplate(_util.Immutable, Generic[AnyStr]):
                         obj = cast('list[AnyStr]', m.captures(g_index))
                     except IndexError as e:  # pragma: no cover
                         raise IndexError(f"'{g_index}' is out of range!") from e
-                    l = _util.format_captures(
-                        obj,
-                        capture,
-                        _util._to_bstr if isinstance(sep, bytes) else _util._to_str,
-                        sep
-                    )
+                    l = fmt(obj)
                 if span_case is not None:
                     if span_case == _LOWER:
                         l = l.lower()
@@ -1362,15 +1599,17 @@ class ReplaceTemplate(_util.Immutable, Generic[AnyStr]):
                         l = l[0:1].lower() + l[1:]
                     else:
                         l = l[0:1].upper() + l[1:]
-            text.append(l)
+            write(cast('AnyStr', l))
 
-        return sep.join(text)
+        return sep
 
 
 def _pickle(r):  # type: ignore[no-untyped-def]
     """Pickle."""
 
-    return ReplaceTemplate, (r.groups, r.group_slots, r.literals, r.pattern_hash, r.use_format, r._bytes)
+    return ReplaceTemplate, (
+        r.groups, r.group_slots, r.literals, r.pattern_hash, r.use_format, r._bytes, r.use_codegen
+    )
 
 
 _copyreg.pickle(ReplaceTemplate, _pickle)
@@ -0,0 +1,474 @@
+"""
+Cache helpers.
+
+Licensed under MIT
+Copyright (c) 2011 - 2020 Isaac Muse <isaacmuse@gmail.com>
+"""
+from __future__ import annotations
+import os
+import sys
+import pickle
+import tempfile
+import threading
+import unicodedata
+import weakref
+from collections import OrderedDict
+from .__meta__ import __version__
+from typing import Any, NamedTuple, cast
+
+CACHE_LRU = 'lru'
+CACHE_LFU = 'lfu'
+
+_POLICIES = frozenset((CACHE_LRU, CACHE_LFU))
+
+# Version of the bundle file layout.
+_BUNDLE_FORMAT = 1
+
+
+def _signature(engine: str) -> tuple[Any, ...]:
+    """Describe the environment that preprocessed patterns are valid for."""
+
+    return (engine, __version__, unicodedata.unidata_version, sys.version_info[:2])
+
+
+def _write(path: str, data: Any) -> None:
+    """Atomically write pickled data to a file."""
+
+    fd, temp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp, path)
+    except BaseException:
+        try:
+            os.remove(temp)
+        except OSError:  # pragma: no cover
+            pass
+        raise
+
+
+def write_bundle(path: str | os.PathLike[str], engine: str, bundle: dict[str, Any]) -> None:
+    """Write a bundle of cached entries."""
+
+    _write(os.fspath(path), ((_BUNDLE_FORMAT,) + _signature(engine), bundle))
+
+
+def read_bundle(path: str | os.PathLike[str], engine: str) -> dict[str, Any]:
+    """Read a bundle of cached entries, ensuring it was created in a compatible environment."""
+
+    with open(path, 'rb') as f:
+        signature, bundle = pickle.load(f)
+    expected = (_BUNDLE_FORMAT,) + _signature(engine)
+    if signature != expected:
+        raise ValueError(
+            "Bundle was created for {!r}, but the current environment is {!r}!".format(signature, expected)
+        )
+    return cast('dict[str, Any]', bundle)
+
+
+class CacheInfo(NamedTuple):
+    """Cache statistics."""
+
+    hits: int
+    misses: int
+    evictions: int
+    maxsize: int | None
+    currsize: int
+    policy: str
+    parse_time: float
+    memory: int
+
+
+def _sizeof(obj: Any, seen: set[int]) -> int:
+    """Approximate the memory used by an object and the objects it holds."""
+
+    if id(obj) in seen or isinstance(obj, type):
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, int, float, weakref.ref)) or obj is None:
+        return size
+    if isinstance(obj, dict):
+        size += sum(_sizeof(k, seen) + _sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (tuple, list, set, frozenset)):
+        size += sum(_sizeof(o, seen) for o in obj)
+    else:
+        for cls in type(obj).__mro__:
+            for name in cls.__dict__.get('__slots__', ()):
+                size += _sizeof(getattr(obj, name, None), seen)
+    return size
+
+
+class Cache:
+    """
+    Thread safe, resizable cache with LRU or LFU eviction.
+
+    In addition to the usual hit and miss counters, the cache tracks how many entries have been evicted
+    and the total time spent creating the entries that were stored (as reported by the caller).
+    """
+
+    def __init__(self, maxsize: int | None = 500, policy: str = CACHE_LRU) -> None:
+        """Initialize."""
+
+        self._lock = threading.RLock()
+        self._maxsize = self._validate_size(maxsize)
+        self._policy = self._validate_policy(policy)
+        self._data = {}  # type: dict[Any, Any]
+        # LRU: key order from least to most recently used.
+        self._order = OrderedDict()  # type: OrderedDict[Any, None]
+        # LFU: key use counts and keys bucketed by count, each bucket ordered from least to most recently used.
+        self._counts = {}  # type: dict[Any, int]
+        self._buckets = {}  # type: dict[int, OrderedDict[Any, None]]
+        self._min_count = 0
+        self._reset_stats()
+
+    @staticmethod
+    def _validate_size(maxsize: int | None) -> int | None:
+        """Validate the cache size."""
+
+        if maxsize is not None and maxsize < 0:
+            raise ValueError("Cache size cannot be negative!")
+        return maxsize
+
+    @staticmethod
+    def _validate_policy(policy: str) -> str:
+        """Validate the cache policy."""
+
+        if policy not in _POLICIES:
+            raise ValueError(f"Unknown cache policy '{policy}'!")
+        return policy
+
+    def _reset_stats(self) -> None:
+        """Reset statistics."""
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._parse_time = 0.0
+
+    def _touch(self, key: Any) -> None:
+        """Record use of an existing key."""
+
+        if self._policy == CACHE_LRU:
+            self._order.move_to_end(key)
+        else:
+            count = self._counts[key]
+            bucket = self._buckets[count]
+            del bucket[key]
+            if not bucket:
+                del self._buckets[count]
+                if self._min_count == count:
+                    self._min_count = count + 1
+            self._counts[key] = count + 1
+            self._buckets.setdefault(count + 1, OrderedDict())[key] = None
+
+    def _track(self, key: Any) -> None:
+        """Track a new key."""
+
+        if self._policy == CACHE_LRU:
+            self._order[key] = None
+        else:
+            self._counts[key] = 1
+            self._buckets.setdefault(1, OrderedDict())[key] = None
+            self._min_count = 1
+
+    def _untrack(self, key: Any) -> None:
+        """Stop tracking a key."""
+
+        if self._policy == CACHE_LRU:
+            del self._order[key]
+        else:
+            count = self._counts.pop(key)
+            bucket = self._buckets[count]
+            del bucket[key]
+            if not bucket:
+                del self._buckets[count]
+                if self._min_count == count:
+                    self._min_count = min(self._buckets) if self._buckets else 0
+
+    def _evict(self, limit: int | None) -> None:
+        """Evict entries until there are no more than `limit` entries."""
+
+        if limit is None:
+            return
+        while len(self._data) > limit:
+            if self._policy == CACHE_LRU:
+                key = next(iter(self._order))
+            else:
+                key = next(iter(self._buckets[self._min_count]))
+            self._untrack(key)
+            del self._data[key]
+            self._removed(key)
+            self._evictions += 1
+
+    def _removed(self, key: Any) -> None:
+        """Handle removal of an entry."""
+
+    def _ordered_keys(self) -> list[Any]:
+        """Return keys from first to last to be evicted."""
+
+        if self._policy == CACHE_LRU:
+            return list(self._order)
+        return [k for count in sorted(self._buckets) for k in self._buckets[count]]
+
+    def get(self, key: Any) -> Any:
+        """Get an entry, or `None` if there is no such entry."""
+
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+                self._touch(key)
+            return value
+
+    def put(self, key: Any, value: Any, parse_time: float = 0.0) -> None:
+        """Store an entry along with the time it took to create it."""
+
+        with self._lock:
+            self._parse_time += parse_time
+            if self._maxsize == 0:
+                return
+            if key in self._data:
+                self._touch(key)
+            else:
+                # Make room before tracking so a new LFU entry is not immediately evicted.
+                if self._maxsize is not None:
+                    self._evict(self._maxsize - 1)
+                self._track(key)
+            self._data[key] = value
+
+    def discard(self, key: Any) -> None:
+        """Remove an entry if it exists."""
+
+        with self._lock:
+            if key in self._data:
+                self._untrack(key)
+                del self._data[key]
+                self._removed(key)
+
+    def clear(self) -> None:
+        """Remove all entries and reset statistics."""
+
+        with self._lock:
+            self._data.clear()
+            self._order.clear()
+            self._counts.clear()
+            self._buckets.clear()
+            self._min_count = 0
+            self._reset_stats()
+
+    def resize(self, maxsize: int | None) -> None:
+        """Change the maximum size (`None` for unbounded), evicting entries if required."""
+
+        with self._lock:
+            self._maxsize = self._validate_size(maxsize)
+            self._evict(self._maxsize)
+
+    def set_policy(self, policy: str) -> None:
+        """Change the eviction policy, keeping the current entries."""
+
+        with self._lock:
+            policy = self._validate_policy(policy)
+            if policy == self._policy:
+                return
+            keys = self._ordered_keys()
+            self._order.clear()
+            self._counts.clear()
+            self._buckets.clear()
+            self._min_count = 0
+            self._policy = policy
+            for key in keys:
+                self._track(key)
+
+    def info(self) -> CacheInfo:
+        """Return cache statistics."""
+
+        with self._lock:
+            return CacheInfo(
+                self._hits,
+                self._misses,
+                self._evictions,
+                self._maxsize,
+                len(self._data),
+                self._policy,
+                self._parse_time,
+                _sizeof(self._data, set())
+            )
+
+    def __len__(self) -> int:
+        """Number of entries."""
+
+        return len(self._data)
+
+    def items(self) -> list[tuple[Any, Any]]:
+        """Return a snapshot of the entries."""
+
+        with self._lock:
+            return list(self._data.items())
+
+    def __contains__(self, key: Any) -> bool:
+        """Check whether there is an entry without affecting statistics or eviction order."""
+
+        return key in self._data
+
+
+class PatternCache(Cache):
+    """
+    Cache keyed on tuples whose first member is a compiled pattern.
+
+    Patterns are only referenced weakly, and entries are dropped once their pattern is garbage collected.
+    """
+
+    def __init__(self, maxsize: int | None = 500, policy: str = CACHE_LRU) -> None:
+        """Initialize."""
+
+        super().__init__(maxsize, policy)
+        # Keyed by the identity of each entry's reference, as live references to the same pattern compare equal.
+        self._refs = {}  # type: dict[int, Any]
+        self._collected = []  # type: list[weakref.ref[Any]]
+
+    def _on_collect(self, ref: weakref.ref[Any]) -> None:
+        """Queue entries of a collected pattern for removal."""
+
+        # This can run in the middle of any operation, even one holding the lock in this thread,
+        # so just record the reference and let the next operation clean up.
+        self._collected.append(ref)
+
+    def _prune(self) -> None:
+        """Remove entries whose patterns have been collected."""
+
+        while self._collected:
+            key = self._refs.get(id(self._collected.pop()))
+            if key is not None:
+                self.discard(key)
+
+    def _removed(self, key: Any) -> None:
+        """Handle removal of an entry."""
+
+        self._refs.pop(id(key[0]), None)
+
+    def get(self, key: Any) -> Any:
+        """Get an entry, or `None` if there is no such entry."""
+
+        with self._lock:
+            self._prune()
+            return super().get((weakref.ref(key[0]),) + key[1:])
+
+    def put(self, key: Any, value: Any, parse_time: float = 0.0) -> None:
+        """Store an entry along with the time it took to create it."""
+
+        with self._lock:
+            self._prune()
+            ref = weakref.ref(key[0], self._on_collect)
+            key = (ref,) + key[1:]
+            if key in self._data:
+                # The existing entry keeps the reference to the pattern it was created with.
+                super().put(key, value, parse_time)
+                return
+            self._refs[id(ref)] = key
+            super().put(key, value, parse_time)
+            if key not in self._data:
+                # The cache is disabled.
+                del self._refs[id(ref)]
+
+    def clear(self) -> None:
+        """Remove all entries and reset statistics."""
+
+        with self._lock:
+            super().clear()
+            self._refs.clear()
+            del self._collected[:]
+
+    def info(self) -> CacheInfo:
+        """Return cache statistics."""
+
+        with self._lock:
+            self._prune()
+            return super().info()
+
+    def items(self) -> list[tuple[Any, Any]]:
+        """Return a snapshot of the entries with patterns that are still alive."""
+
+        with self._lock:
+            self._prune()
+            entries = []
+            for key, value in super().items():
+                pattern = key[0]()
+                if pattern is not None:
+                    entries.append(((pattern,) + key[1:], value))
+            return entries
+
+    def __len__(self) -> int:
+        """Number of entries."""
+
+        with self._lock:
+            self._prune()
+            return super().__len__()
+
+
+class DiskCache:
+    """
+    Persistent store of preprocessed search patterns.
+
+    Entries are kept in a single pickled file along with a signature. The file is not read
+    until the first lookup, and if the signature does not match the running environment
+    (backrefs version, Unicode version, etc.), the stored entries are ignored.
+    """
+
+    def __init__(self, path: str | os.PathLike[str], engine: str) -> None:
+        """Initialize."""
+
+        self.path = os.fspath(path)
+        self.signature = _signature(engine)
+        self._entries = None  # type: dict[Any, Any] | None
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def _read(self) -> dict[Any, Any]:
+        """Read entries from disk, discarding them if they are from a different environment."""
+
+        try:
+            with open(self.path, 'rb') as f:
+                signature, entries = pickle.load(f)
+        except Exception:
+            return {}
+        if signature != self.signature or not isinstance(entries, dict):
+            return {}
+        return entries
+
+    def _load(self) -> dict[Any, Any]:
+        """Load entries on first use."""
+
+        if self._entries is None:
+            self._entries = self._read()
+        return self._entries
+
+    def get(self, key: Any) -> Any:
+        """Get an entry, or `None` if there is no such entry."""
+
+        with self._lock:
+            return self._load().get(key)
+
+    def put(self, key: Any, value: Any) -> None:
+        """Store an entry."""
+
+        with self._lock:
+            self._load()[key] = value
+            self._dirty = True
+
+    def save(self) -> None:
+        """Write entries to disk if there are new ones."""
+
+        with self._lock:
+            if not self._dirty:
+                return
+
+            # Merge with whatever another process may have written in the meantime.
+            entries = self._read()
+            entries.update(self._load())
+
+            _write(self.path, (self.signature, entries))
+            self._entries = entries
+            self._dirty = False
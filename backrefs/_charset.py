@@ -0,0 +1,151 @@
+"""
+Set operations on character classes.
+
+Licensed under MIT
+Copyright (c) 2011 - 2020 Isaac Muse <isaacmuse@gmail.com>
+"""
+from __future__ import annotations
+import re
+import sys
+from array import array
+from functools import lru_cache
+
+if sys.version_info >= (3, 11):
+    import re._parser as _parser  # type: ignore[import]
+else:
+    import sre_parse as _parser
+
+# Class escapes that depend on the engine, by the category they are parsed to.
+CATEGORIES = {
+    _parser.CATEGORY_DIGIT: r'\d',
+    _parser.CATEGORY_NOT_DIGIT: r'\D',
+    _parser.CATEGORY_SPACE: r'\s',
+    _parser.CATEGORY_NOT_SPACE: r'\S',
+    _parser.CATEGORY_WORD: r'\w',
+    _parser.CATEGORY_NOT_WORD: r'\W'
+}
+
+# Highest character of byte string and Unicode patterns.
+MAXBYTE = 0xff
+MAXUNICODE = 0x10ffff
+
+
+@lru_cache(maxsize=None)
+def category(escape: str, is_bytes: bool, ascii: bool) -> tuple[tuple[int, int], ...]:  # noqa: A002
+    """Get the ranges of a class escape by matching it against every character."""
+
+    if is_bytes:
+        pattern = re.compile(f'[{escape}]+'.encode('ascii'))  # type: re.Pattern[bytes] | re.Pattern[str]
+        text = bytes(range(MAXBYTE + 1))  # type: bytes | str
+    else:
+        pattern = re.compile(f'[{escape}]+', re.ASCII if ascii else 0)
+        text = array('I', range(MAXUNICODE + 1)).tobytes().decode(
+            'utf-32-le' if sys.byteorder == 'little' else 'utf-32-be',
+            'surrogatepass'
+        )
+    return tuple((m.start(), m.end() - 1) for m in pattern.finditer(text))  # type: ignore[arg-type]
+
+
+def merge(ranges: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    """Sort ranges and merge the ones that overlap or touch."""
+
+    merged = []  # type: list[tuple[int, int]]
+    for first, last in sorted(ranges):
+        if merged and first <= merged[-1][1] + 1:
+            if last > merged[-1][1]:
+                merged[-1] = (merged[-1][0], last)
+        else:
+            merged.append((first, last))
+    return merged
+
+
+def intersect(a: list[tuple[int, int]], b: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    """Get the intersection of two lists of merged ranges."""
+
+    result = []
+    i = j = 0
+    while i < len(a) and j < len(b):
+        first = max(a[i][0], b[j][0])
+        last = min(a[i][1], b[j][1])
+        if first <= last:
+            result.append((first, last))
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return result
+
+
+def invert(ranges: list[tuple[int, int]], limit: int) -> list[tuple[int, int]]:
+    """Get the characters up to `limit` that are not in a list of merged ranges."""
+
+    result = []
+    start = 0
+    for first, last in ranges:
+        if first > start:
+            result.append((start, first - 1))
+        start = last + 1
+    if start <= limit:
+        result.append((start, limit))
+    return result
+
+
+def parse(body: str, is_bytes: bool, ascii: bool) -> list[tuple[int, int]]:  # noqa: A002
+    """Get the merged ranges of the contents of a character class, as understood by the engine."""
+
+    if not body:
+        return []
+    if body.startswith('^'):
+        body = '\\' + body
+
+    # Byte string patterns are parsed as bytes, so escapes follow the rules of byte string patterns.
+    pattern = f'[{body}]'
+    ranges = []  # type: list[tuple[int, int]]
+    limit = MAXBYTE if is_bytes else MAXUNICODE
+    for op, av in _parser.parse(pattern.encode('latin-1') if is_bytes else pattern).data:
+        if op is _parser.LITERAL:
+            ranges.append((av, av))
+        elif op is _parser.NOT_LITERAL:  # pragma: no cover
+            ranges.extend(invert([(av, av)], limit))
+        else:
+            for item, value in av:
+                if item is _parser.LITERAL:
+                    ranges.append((value, value))
+                elif item is _parser.RANGE:
+                    ranges.append(value)
+                elif item is _parser.CATEGORY:
+                    ranges.extend(category(CATEGORIES[value], is_bytes, ascii))
+    return merge(ranges)
+
+
+def evaluate(operands: list[str], operators: list[str], is_bytes: bool, ascii: bool) -> list[tuple[int, int]]:  # noqa: A002
+    r"""
+    Apply the set operators `&&` and `--` to the contents of character classes, from left to right.
+
+    Escapes like `\w` are evaluated as the engine sees them, with ASCII semantics if `ascii` is set.
+    """
+
+    limit = MAXBYTE if is_bytes else MAXUNICODE
+    result = parse(operands[0], is_bytes, ascii)
+    for operator, operand in zip(operators, operands[1:], strict=True):
+        ranges = parse(operand, is_bytes, ascii)
+        result = intersect(result, ranges if operator == '&&' else invert(ranges, limit))
+    return result
+
+
+def fmt(value: int) -> str:
+    """Format a character for a character class, escaping all but ASCII letters and digits."""
+
+    if value < 0x80 and chr(value).isalnum():
+        return chr(value)
+    if value <= 0xff:
+        return f'\\x{value:02x}'
+    if value <= 0xffff:
+        return f'\\u{value:04x}'
+    return f'\\U{value:08x}'
+
+
+def to_class(ranges: list[tuple[int, int]]) -> str:
+    """Format ranges as the contents of a character class."""
+
+    return ''.join([fmt(first) if first == last else f'{fmt(first)}-{fmt(last)}' for first, last in ranges])
@@ -0,0 +1,76 @@
+"""
+Combine many search patterns into one.
+
+Licensed under MIT
+Copyright (c) 2011 - 2020 Isaac Muse <isaacmuse@gmail.com>
+"""
+from __future__ import annotations
+from typing import AnyStr, Callable, Match, Pattern
+
+# Prefix of the group names that mark which rule matched, rules' own group names get their marker's name as a prefix.
+RULE_PREFIX = '_rule'
+
+
+def rename(
+    pattern: AnyStr,
+    rule: int,
+    offset: int,
+    tokens: Pattern[str],
+    escape: Callable[[int], str]
+) -> AnyStr:
+    """
+    Renumber and rename the groups of a rule's preprocessed pattern so it can be combined with other rules.
+
+    `tokens` finds the parts of the pattern that need attention. In each match, a `num*` group holds a group
+    number that is shifted by `offset`, an `esc` group holds the number of a backreference escape that is
+    rewritten with `escape`, a `name*` group holds a group name that gets the rule's prefix, and an `error`
+    group marks syntax that cannot be part of a combined pattern. Anything else is kept as is.
+    """
+
+    is_bytes = isinstance(pattern, bytes)
+    text = pattern.decode('latin-1') if isinstance(pattern, bytes) else pattern
+    prefix = f'{RULE_PREFIX}{rule}_'
+
+    def replace(m: Match[str]) -> str:
+        """Replace a token."""
+
+        for key, value in m.groupdict().items():
+            if value is None:
+                continue
+            if key == 'error':
+                raise ValueError(f'Rules of a combined pattern cannot use {value!r}!')
+            if key == 'esc':
+                return escape(int(value) + offset)
+            if key.startswith('num'):
+                value = str(int(value) + offset)
+            elif key.startswith('name'):
+                value = prefix + value
+            else:  # pragma: no cover
+                continue
+            start = m.start()
+            token = m.group(0)
+            return token[:m.start(key) - start] + value + token[m.end(key) - start:]
+        return m.group(0)
+
+    text = tokens.sub(replace, text)
+    return text.encode('latin-1') if is_bytes else text  # type: ignore[return-value]
+
+
+def wrap(patterns: list[AnyStr], verbose: bool) -> AnyStr:
+    """
+    Join renamed rule patterns as alternatives, each followed by an empty named group that marks the rule as matched.
+
+    A marker only costs anything once its rule has matched, and as the last group to close, it is the match's
+    `lastindex`. Verbose patterns end with a line break so a trailing comment does not swallow the end of the rule.
+    """
+
+    end = '\n)' if verbose else ')'
+    sep = patterns[0][:0]
+    if isinstance(sep, bytes):
+        return sep.join(
+            [
+                f'{"|" if i else ""}(?:'.encode('ascii') + p + f'{end}(?P<{RULE_PREFIX}{i}>)'.encode('ascii')
+                for i, p in enumerate(patterns)
+            ]
+        )
+    return sep.join([f'{"|" if i else ""}(?:{p}{end}(?P<{RULE_PREFIX}{i}>)' for i, p in enumerate(patterns)])
@@ -0,0 +1,186 @@
+"""
+Parallel substitution and searching.
+
+Licensed under MIT
+Copyright (c) 2011 - 2020 Isaac Muse <isaacmuse@gmail.com>
+"""
+from __future__ import annotations
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, AnyStr, Callable, Iterator
+from ._stream import expander
+
+# Default size of the pieces an input is split into.
+CHUNK_SIZE = 1 << 20
+
+# Task of a worker process, set once by the pool initializer.
+_task = None  # type: Callable[[Any], Any] | None
+
+
+def split(string: AnyStr, chunk_size: int, splitter: Any = None) -> list[tuple[int, int]]:
+    """
+    Split a string into the spans of pieces of at least `chunk_size` characters.
+
+    Each piece ends at the first boundary at or after `chunk_size` characters, which is after a line break,
+    or after a match of `splitter` if one is given. The last piece holds whatever remains.
+    """
+
+    if chunk_size < 1:
+        raise ValueError('The chunk size must be at least 1!')
+
+    newline = '\n' if isinstance(string, str) else b'\n'
+    spans = []
+    start = 0
+    end = len(string)
+    while start + chunk_size < end:
+        target = start + chunk_size
+        if splitter is None:
+            cut = string.find(newline, target - 1) + 1  # type: ignore[arg-type]
+        else:
+            m = splitter.search(string, target)
+            cut = 0 if m is None else m.end()
+        if not cut:
+            break
+        spans.append((start, cut))
+        start = cut
+    spans.append((start, end))
+    return spans
+
+
+def _init(task: Callable[[Any], Any]) -> None:
+    """Set the task of a worker process."""
+
+    global _task
+    _task = task
+
+
+def _run(piece: Any) -> Any:
+    """Run the task of a worker process on a piece."""
+
+    return _task(piece)  # type: ignore[misc]
+
+
+def _map(
+    task: Callable[[Any], Any],
+    string: AnyStr,
+    spans: list[tuple[int, int]],
+    workers: int | None,
+    threads: bool
+) -> list[Any]:
+    """
+    Apply the task to each piece in a pool and return the results in order.
+
+    `workers` defaults to the CPU count, and the pieces are processed in this process if it is `1` or less.
+    A piece is given to the task as a string, the start and end of the piece in it, and whether it is the last
+    piece. Threads share the whole string, so the text before a piece is seen as in a normal search. Worker
+    processes are sent each piece with the piece before it as context instead, and receive the task once when
+    they start.
+    """
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    last = len(spans) - 1
+    if workers <= 1 or len(spans) <= 1:
+        return [task((string, start, end, i == last)) for i, (start, end) in enumerate(spans)]
+
+    workers = min(workers, len(spans))
+    if threads:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(task, [(string, start, end, i == last) for i, (start, end) in enumerate(spans)]))
+    pieces = []
+    context = 0
+    for i, (start, end) in enumerate(spans):
+        pieces.append((string[context:end], start - context, end - context, i == last))
+        context = start
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init, initargs=(task,)) as executor:
+        return list(executor.map(_run, pieces, chunksize=max(1, len(pieces) // (workers * 4))))
+
+
+def _finditer(pattern: Any, piece: tuple[AnyStr, int, int, bool], **kwargs: Any) -> Iterator[Any]:
+    """
+    Find the matches between the start and end of a piece.
+
+    An empty match at the end of a piece is left to the next piece, which finds it at its start.
+    """
+
+    string, start, end, last = piece
+    for m in pattern.finditer(string, start, end, **kwargs):
+        if m.start() == end and not last:
+            break
+        yield m
+
+
+def _subn(
+    pattern: Any,
+    replace: AnyStr | Callable[..., AnyStr],
+    piece: tuple[AnyStr, int, int, bool],
+    **kwargs: Any
+) -> tuple[AnyStr, int]:
+    """Substitute the matches in a piece."""
+
+    string, start, end = piece[:3]
+    expand = expander(replace)
+    parts = []
+    count = 0
+    for m in _finditer(pattern, piece, **kwargs):
+        parts.append(string[start:m.start()])
+        parts.append(expand(m))
+        start = m.end()
+        count += 1
+    parts.append(string[start:end])
+    return string[:0].join(parts), count
+
+
+def _findall(pattern: Any, piece: tuple[AnyStr, int, int, bool], **kwargs: Any) -> list[Any]:
+    """Find all matches in a piece, formatted like `findall`."""
+
+    empty = piece[0][:0]
+    if pattern.groups == 0:
+        return [m.group(0) for m in _finditer(pattern, piece, **kwargs)]
+    if pattern.groups == 1:
+        return [m.groups(empty)[0] for m in _finditer(pattern, piece, **kwargs)]
+    return [m.groups(empty) for m in _finditer(pattern, piece, **kwargs)]
+
+
+def subn(
+    pattern: Any,
+    replace: AnyStr | Callable[..., AnyStr],
+    string: AnyStr,
+    workers: int | None = None,
+    chunk_size: int = CHUNK_SIZE,
+    splitter: Any = None,
+    threads: bool = False,
+    **kwargs: Any
+) -> tuple[AnyStr, int]:
+    """Substitute the pieces of a string in a pool and join them, returning the result and number of replacements."""
+
+    results = _map(
+        partial(_subn, pattern, replace, **kwargs),
+        string,
+        split(string, chunk_size, splitter),
+        workers,
+        threads
+    )
+    return string[:0].join([r[0] for r in results]), sum(r[1] for r in results)
+
+
+def findall(
+    pattern: Any,
+    string: AnyStr,
+    workers: int | None = None,
+    chunk_size: int = CHUNK_SIZE,
+    splitter: Any = None,
+    threads: bool = False,
+    **kwargs: Any
+) -> list[Any]:
+    """Find all matches in the pieces of a string in a pool."""
+
+    results = _map(
+        partial(_findall, pattern, **kwargs),
+        string,
+        split(string, chunk_size, splitter),
+        workers,
+        threads
+    )
+    return [m for r in results for m in r]
@@ -0,0 +1,241 @@
+"""
+Streaming and memory mapped file substitution.
+
+Licensed under MIT
+Copyright (c) 2011 - 2020 Isaac Muse <isaacmuse@gmail.com>
+"""
+from __future__ import annotations
+import contextlib
+import mmap
+import os
+from typing import Any, AnyStr, Callable, ContextManager, Iterable, Iterator, IO
+
+# Default amount of new text to gather before searching it.
+CHUNK_SIZE = 65536
+# Default amount of text held back at the end of the buffer, and kept before it as context.
+OVERLAP = 4096
+
+
+def read_chunks(source: IO[AnyStr] | Iterable[AnyStr], size: int) -> Iterator[AnyStr]:
+    """Iterate the chunks of a readable file object or an iterable of chunks."""
+
+    read = getattr(source, 'read', None)
+    if read is None:
+        yield from source
+        return
+
+    while True:
+        chunk = read(size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def expander(replace: AnyStr | Callable[..., AnyStr]) -> Callable[..., AnyStr]:
+    """Get a function that returns the replacement for a match."""
+
+    if isinstance(replace, (str, bytes)):
+        template = replace
+        return lambda m: m.expand(template)  # type: ignore[no-any-return]
+    return replace
+
+
+def sub(
+    pattern: Any,
+    expand: Callable[..., AnyStr],
+    source: IO[AnyStr] | Iterable[AnyStr],
+    write: Callable[[AnyStr], Any],
+    count: int = 0,
+    chunk_size: int = CHUNK_SIZE,
+    overlap: int = OVERLAP,
+    lines: bool = False
+) -> int:
+    """
+    Replace matches in a stream of chunks and write the result, returning the number of replacements.
+
+    The stream is searched in pieces of at least `chunk_size` new characters. The last `overlap` characters of
+    the buffer are held back until more text arrives, so matches, including any lookahead, must not be longer
+    than `overlap`. A longer match is still found, but the buffer grows until it is complete. With `lines`,
+    each piece is cut after the last line break before the held back text instead, if there is one. In both
+    modes, up to `overlap` characters of already written text are kept before the piece for lookbehinds and
+    anchors.
+    """
+
+    if chunk_size < 1:
+        raise ValueError('The chunk size must be at least 1!')
+    if overlap < 1:
+        raise ValueError('The overlap must be at least 1!')
+
+    chunks = read_chunks(source, chunk_size)
+    buf = pattern.pattern[:0]  # type: AnyStr
+    newline = '\n' if isinstance(buf, str) else b'\n'
+    start = 0
+    total = 0
+    eof = False
+    while not eof:
+        chunk = next(chunks, None)
+        if chunk is None:
+            eof = True
+        else:
+            buf += chunk
+            if len(buf) - start < chunk_size + overlap:
+                continue
+
+        limit = len(buf)
+        if not eof:
+            limit -= overlap
+            if lines:
+                # Without a line break to cut at, cut as usual so the buffer does not grow without bound.
+                limit = buf.rfind(newline, start, limit) + 1 or limit  # type: ignore[arg-type]
+
+        # Matches that end at or after the limit may still change once more text is read,
+        # so they are left for the next piece along with the text that follows them.
+        text = []  # type: list[AnyStr]
+        pos = cut = start
+        empty = -1
+        for m in pattern.finditer(buf, start):
+            s, e = m.span()
+            if not eof and e >= limit:
+                cut = min(s, limit)
+                if empty == s:
+                    # An empty match directly before the next one must be redone with it.
+                    del text[-1]
+                    total -= 1
+                break
+            text.append(buf[pos:s])
+            text.append(expand(m))
+            pos = e
+            total += 1
+            empty = s if s == e else -1
+            if total == count:
+                text.append(buf[pos:])
+                write(buf[:0].join(text))
+                for chunk in chunks:
+                    write(chunk)
+                return total
+        else:
+            cut = limit
+
+        text.append(buf[pos:cut])
+        write(buf[:0].join(text))
+
+        # Keep some of the written text as context, at least one character so `^` does not match at the cut.
+        keep = max(0, min(cut - overlap, cut - 1))
+        buf = buf[keep:]
+        start = cut - keep
+
+    return total
+
+
+def map_file(pattern: Any, path: str | os.PathLike[str]) -> mmap.mmap | bytes:
+    """
+    Map a file into memory for reading with a byte string pattern.
+
+    The file itself is closed right away, the map stays valid until it is closed.
+    """
+
+    if not isinstance(pattern.pattern, bytes):
+        raise TypeError('Files can only be searched with byte string patterns!')
+
+    with open(path, 'rb') as f:
+        # Empty files cannot be mapped.
+        if not os.fstat(f.fileno()).st_size:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def closing(buf: mmap.mmap | bytes) -> ContextManager[Any]:
+    """Get a context that closes a map, if there is one."""
+
+    return buf if isinstance(buf, mmap.mmap) else contextlib.nullcontext(buf)
+
+
+def detach(m: Any) -> bool:
+    """Detach a match from the string it was found in, if the engine can, and return whether it did."""
+
+    detach_string = getattr(m, 'detach_string', None)
+    if detach_string is None:
+        return False
+    detach_string()
+    return True
+
+
+def finditer_file(pattern: Any, path: str | os.PathLike[str], *args: Any, **kwargs: Any) -> Iterator[Any]:
+    """
+    Iterate the matches in a memory mapped file, the map is closed once iteration ends.
+
+    Matches are detached from the map if the engine can, otherwise they must be used while iterating.
+    """
+
+    def iterate(buf: mmap.mmap | bytes) -> Iterator[Any]:
+        with closing(buf):
+            for m in pattern.finditer(buf, *args, **kwargs):
+                detach(m)
+                yield m
+
+    return iterate(map_file(pattern, path))
+
+
+def search_file(pattern: Any, path: str | os.PathLike[str], *args: Any, **kwargs: Any) -> Any:
+    """
+    Search a memory mapped file, the map is closed before returning.
+
+    If the engine cannot detach a match from the map, the map is left open for the match instead.
+    """
+
+    with contextlib.ExitStack() as stack:
+        m = pattern.search(stack.enter_context(closing(map_file(pattern, path))), *args, **kwargs)
+        if m is not None and not detach(m):
+            # The match needs the map, which is closed once the match is no longer referenced.
+            stack.pop_all()
+        return m
+
+
+def sub_file(
+    pattern: Any,
+    expand_into: Callable[[Any, Callable[[Any], Any]], Any],
+    src: str | os.PathLike[str],
+    dest: str | os.PathLike[str],
+    count: int = 0
+) -> int:
+    """Replace matches in a memory mapped file and write the result to another file, returning the replacement count."""
+
+    if os.path.exists(dest) and os.path.samefile(src, dest):
+        raise ValueError('The source and destination must be different files!')
+
+    with closing(map_file(pattern, src)) as buf, open(dest, 'wb') as f:
+        return sub_into(pattern, expand_into, buf, f.write, count)
+
+
+def writer(expand: Callable[..., AnyStr]) -> Callable[[Any, Callable[[AnyStr], Any]], Any]:
+    """Get a function that writes the replacement for a match."""
+
+    return lambda m, write: write(expand(m))
+
+
+def sub_into(
+    pattern: Any,
+    expand_into: Callable[[Any, Callable[[Any], Any]], Any],
+    string: Any,
+    write: Callable[[Any], Any],
+    count: int = 0
+) -> int:
+    """
+    Replace matches in a string and write the result piece by piece, returning the number of replacements.
+
+    Text between matches in a byte string or buffer is written as slices of a memory view, so it is not copied.
+    """
+
+    view = string if isinstance(string, str) else memoryview(string)
+    total = pos = 0
+    for m in pattern.finditer(string):
+        s, e = m.span()
+        if s != pos:
+            write(view[pos:s])
+        expand_into(m, write)
+        pos = e
+        total += 1
+        if total == count:
+            break
+    write(view[pos:])
+    return total
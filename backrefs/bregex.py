@@ -15,12 +15,19 @@ Copyright (c) 2015 - 2020 Isaac Muse <isaacmuse@gmail.com>
 """
 from __future__ import annotations
 import regex as _regex  # type: ignore[import]
+import os as _os
+import atexit as _atexit
+from concurrent.futures import ProcessPoolExecutor as _ProcessPoolExecutor
 import copyreg as _copyreg
-from functools import lru_cache as _lru_cache
+from time import perf_counter as _perf_counter
 from . import util as _util
 from . import _bregex_parse
+from . import _cache
+from . import _stream
+from . import _parallel
+from . import _multisub
 from ._bregex_parse import ReplaceTemplate
-from typing import AnyStr, Callable, Any, Generic, Mapping, Iterator, cast
+from typing import AnyStr, Iterable, Callable, Any, Generic, Mapping, Iterator, IO, cast
 from ._bregex_typing import Pattern, Match
 
 __all__ = (
@@ -28,8 +35,11 @@ __all__ = (
     "findall", "finditer", "purge", "escape", "D", "DEBUG", "A", "ASCII", "B", "BESTMATCH",
     "E", "ENHANCEMATCH", "F", "FULLCASE", "I", "IGNORECASE", "L", "LOCALE", "M", "MULTILINE", "R", "REVERSE",
     "S", "DOTALL", "U", "UNICODE", "X", "VERBOSE", "V0", "VERSION0", "V1", "VERSION1", "W", "WORD",
-    "P", "POSIX", "DEFAULT_VERSION", "FORMAT", "compile", "compile_search", "compile_replace", "Bregex",
-    "ReplaceTemplate"
+    "P", "POSIX", "DEFAULT_VERSION", "FORMAT", "CODEGEN", "compile", "compile_search", "compile_replace", "Bregex",
+    "ReplaceTemplate", "set_disk_cache", "save_disk_cache",
+    "set_cache_size", "set_cache_policy", "cache_info", "CACHE_LRU", "CACHE_LFU",
+    "compile_many", "dump_bundle", "load_bundle", "sub_stream", "subf_stream",
+    "subn_parallel", "subfn_parallel", "findall_parallel", "MultiSub"
 )
 
 # Expose some common re flags and methods to
@@ -71,30 +81,83 @@ escape = _regex.escape
 
 # Replace flags
 FORMAT = 1
+CODEGEN = 2
 
 # Case upper or lower
 _UPPER = 1
 _LOWER = 2
 
-# Maximum size of the cache.
+# Cache eviction policies
+CACHE_LRU = _cache.CACHE_LRU
+CACHE_LFU = _cache.CACHE_LFU
+
+# Default maximum size of the caches.
 _MAXCACHE = 500
 
 _REGEX_TYPE = type(_regex.compile('', 0))
 
+_search_cache = _cache.Cache(_MAXCACHE)
+_replace_cache = _cache.PatternCache(_MAXCACHE)
+# Compiled `Bregex` objects, sized and configured along with the search cache.
+_compile_cache = _cache.Cache(_MAXCACHE)
+
+# Optional persistent store of preprocessed search patterns.
+_disk_cache = None  # type: _cache.DiskCache | None
+
+# Parts of a preprocessed pattern that refer to groups, skipping over escapes, character classes, and comments.
+# The second pattern also skips verbose comments.
+_MULTISUB_TOKENS = tuple(
+    _regex.compile(
+        r'''
+        \\(?:[0-7]{3}|0[0-7]{0,2}|(?P<esc>[1-9][0-9]?)|g<(?:(?P<num1>[0-9]+)|(?P<name1>\w+))>|.) |
+        \[\^?\]?(?:\\.|\[:\^?\w+:\]|[^\\\]])*\] |
+        \(\?\#[^)]*\) |
+        \(\?P?<(?P<name2>\w+)> |
+        \(\?P[=>](?P<name3>\w+)\) |
+        \(\?&(?P<name4>\w+)\) |
+        \(\?(?P<num2>[1-9][0-9]*)\) |
+        \(\?[+-][0-9]+\) |
+        \(\?\((?:(?P<num3>[0-9]+)|(?!DEFINE\))(?P<name5>\w+))\) |
+        (?P<error>\(\?(?:R|0|(?:[abefiLmprsuwx]|V[01])+)\))
+        ''' + comments,
+        _regex.X | _regex.S | _regex.V0
+    ) for comments in ('', r'| \#[^\n]*')
+)
+
 
-@_lru_cache(maxsize=_MAXCACHE)
 def _cached_search_compile(
     pattern: AnyStr,
     re_verbose: bool,
-    re_version: bool,
+    re_version: int,
     pattern_type: type[AnyStr]
 ) -> AnyStr:
     """Cached search compile."""
 
-    return _bregex_parse._SearchParser(pattern, re_verbose, re_version).parse()
+    key = (pattern, re_verbose, re_version, pattern_type)
+    p = _search_cache.get(key)  # type: AnyStr | None
+    if p is not None:
+        return p
+
+    disk = _disk_cache
+    p = disk.get(key[:-1]) if disk is not None else None
+    if p is None:
+        p, elapsed = _parse_search(pattern, re_verbose, re_version)
+        if disk is not None:
+            disk.put(key[:-1], p)
+    else:
+        elapsed = 0.0
+    _search_cache.put(key, p, elapsed)
+    return p
+
+
+def _parse_search(pattern: AnyStr, re_verbose: bool, re_version: int) -> tuple[AnyStr, float]:
+    """Preprocess a search pattern and return it along with the time it took."""
+
+    start = _perf_counter()
+    p = _bregex_parse._SearchParser(pattern, re_verbose, re_version).parse()
+    return p, _perf_counter() - start
 
 
-@_lru_cache(maxsize=_MAXCACHE)
 def _cached_replace_compile(
     pattern: Pattern[AnyStr],
     repl: AnyStr,
@@ -103,24 +166,89 @@ def _cached_replace_compile(
 ) -> ReplaceTemplate[AnyStr]:
     """Cached replace compile."""
 
-    return _bregex_parse._ReplaceParser(pattern, repl, bool(flags & FORMAT)).parse()
+    key = (pattern, repl, flags, pattern_type)
+    template = _replace_cache.get(key)  # type: ReplaceTemplate[AnyStr] | None
+    if template is None:
+        start = _perf_counter()
+        template = _bregex_parse._ReplaceParser(
+            pattern, repl, bool(flags & FORMAT), bool(flags & CODEGEN)
+        ).parse()
+        _replace_cache.put(key, template, _perf_counter() - start)
+    return template
+
+
+def _get_cache(replace: bool) -> _cache.Cache:
+    """Get the search or replace cache."""
+
+    return _replace_cache if replace else _search_cache
+
+
+def _get_caches(replace: bool) -> tuple[_cache.Cache, ...]:
+    """Get the search or replace cache along with any caches configured with it."""
+
+    return (_replace_cache,) if replace else (_search_cache, _compile_cache)
 
 
 def _get_cache_size(replace: bool = False) -> int:
     """Get size of cache."""
 
-    if not replace:
-        size = _cached_search_compile.cache_info().currsize
-    else:
-        size = _cached_replace_compile.cache_info().currsize
-    return size
+    return len(_get_cache(replace))
 
 
 def _purge_cache() -> None:
     """Purge the cache."""
 
-    _cached_replace_compile.cache_clear()
-    _cached_search_compile.cache_clear()
+    _replace_cache.clear()
+    _search_cache.clear()
+    _compile_cache.clear()
+
+
+def set_cache_size(size: int | None, replace: bool = False) -> None:
+    """Set the maximum size of the search (or replace) cache, `None` for unbounded and `0` to disable it."""
+
+    for cache in _get_caches(replace):
+        cache.resize(size)
+
+
+def set_cache_policy(policy: str, replace: bool = False) -> None:
+    """Set the eviction policy of the search (or replace) cache: `CACHE_LRU` or `CACHE_LFU`."""
+
+    for cache in _get_caches(replace):
+        cache.set_policy(policy)
+
+
+def cache_info(replace: bool = False, compiled: bool = False) -> _cache.CacheInfo:
+    """Get statistics of the search (or replace) cache, or of the cache of compiled objects if `compiled` is set."""
+
+    if compiled:
+        if replace:
+            raise ValueError("Cannot get statistics of the replace and compile caches at once!")
+        return _compile_cache.info()
+    return _get_cache(replace).info()
+
+
+def set_disk_cache(path: str | _os.PathLike[str] | None) -> None:
+    """
+    Persist preprocessed search patterns to the given file.
+
+    Entries are loaded lazily on first use and written back on exit or via `save_disk_cache`.
+    Pass `None` to stop using the file.
+    """
+
+    global _disk_cache
+
+    save_disk_cache()
+    _disk_cache = _cache.DiskCache(path, 'bregex') if path is not None else None
+
+
+def save_disk_cache() -> None:
+    """Write any new preprocessed search patterns to the disk cache."""
+
+    if _disk_cache is not None:
+        _disk_cache.save()
+
+
+_atexit.register(save_disk_cache)
 
 
 def _is_replace(obj: Any) -> bool:
@@ -129,6 +257,31 @@ def _is_replace(obj: Any) -> bool:
     return isinstance(obj, ReplaceTemplate)
 
 
+def _engine_replace(pattern: Pattern[AnyStr], repl: AnyStr | Callable[..., AnyStr]) -> AnyStr | Callable[..., AnyStr]:
+    """
+    Get the equivalent template string of a replace template that the engine can expand by itself.
+
+    Templates that refer to groups the pattern does not have are expanded by the replace template,
+    which reports them the same way for every match.
+    """
+
+    if isinstance(repl, ReplaceTemplate):
+        template = repl._template  # type: AnyStr | None
+        if template is not None and all(group <= pattern.groups for _, group in repl.groups):
+            return template
+    return repl
+
+
+def _expand_into(
+    repl: AnyStr | Callable[..., AnyStr]
+) -> Callable[[Match[AnyStr], Callable[[AnyStr], Any]], Any]:
+    """Get a function that writes the replacement for a match straight into a writer."""
+
+    if isinstance(repl, ReplaceTemplate):
+        return repl.expand_into
+    return _stream.writer(_stream.expander(repl))
+
+
 def _apply_replace_backrefs(
     m: Match[AnyStr] | None,
     repl: ReplaceTemplate[AnyStr] | AnyStr,
@@ -144,6 +297,18 @@ def _apply_replace_backrefs(
     return _bregex_parse._ReplaceParser(m.re, repl, bool(flags & FORMAT)).parse().expand(m)
 
 
+def _search_options(flags: int) -> tuple[bool, int]:
+    """Get the verbose and version options for the search parser from the flags."""
+
+    if flags & V0:
+        re_version = V0
+    elif flags & V1:
+        re_version = V1
+    else:
+        re_version = 0
+    return bool(VERBOSE & flags), re_version
+
+
 def _apply_search_backrefs(
     pattern: AnyStr | Pattern[AnyStr] | Bregex[AnyStr],
     flags: int = 0
@@ -151,16 +316,10 @@ def _apply_search_backrefs(
     """Apply the search backrefs to the search pattern."""
 
     if isinstance(pattern, (str, bytes)):
-        re_verbose = VERBOSE & flags
-        if flags & V0:
-            re_version = V0
-        elif flags & V1:
-            re_version = V1
-        else:
-            re_version = 0
+        re_verbose, re_version = _search_options(flags)
         if not (flags & DEBUG):
             p = _cached_search_compile(
-                pattern, re_verbose, re_version, type(pattern)
+                cast(AnyStr, pattern), re_verbose, re_version, cast('type[AnyStr]', type(pattern))
             )  # type: AnyStr | Pattern[AnyStr]
         else:  # pragma: no cover
             p = _bregex_parse._SearchParser(cast(AnyStr, pattern), re_verbose, re_version).parse()
@@ -384,7 +543,10 @@ class Bregex(_util.Immutable, Generic[AnyStr]):
     ) -> AnyStr:
         """Apply `sub`."""
 
-        return cast(AnyStr, self._pattern.sub(self._auto_compile(repl), string, *args, **kwargs))
+        return cast(
+            AnyStr,
+            self._pattern.sub(_engine_replace(self._pattern, self._auto_compile(repl)), string, *args, **kwargs)
+        )
 
     def subf(
         self,
@@ -406,7 +568,10 @@ class Bregex(_util.Immutable, Generic[AnyStr]):
     ) -> tuple[AnyStr, int]:
         """Apply `subn` with format style replace."""
 
-        return cast('tuple[AnyStr, int]', self._pattern.subn(self._auto_compile(repl), string, *args, **kwargs))
+        return cast(
+            'tuple[AnyStr, int]',
+            self._pattern.subn(_engine_replace(self._pattern, self._auto_compile(repl)), string, *args, **kwargs)
+        )
 
     def subfn(
         self,
@@ -419,6 +584,216 @@ class Bregex(_util.Immutable, Generic[AnyStr]):
 
         return cast('tuple[AnyStr, int]', self._pattern.subfn(self._auto_compile(repl, True), string, *args, **kwargs))
 
+    def sub_stream(
+        self,
+        repl: AnyStr | Callable[..., AnyStr],
+        source: IO[AnyStr] | Iterable[AnyStr],
+        sink: IO[AnyStr],
+        count: int = 0,
+        chunk_size: int = _stream.CHUNK_SIZE,
+        overlap: int = _stream.OVERLAP,
+        lines: bool = False
+    ) -> int:
+        """Apply `sub_stream`."""
+
+        return _stream_sub(
+            self._pattern, _engine_replace(self._pattern, self._auto_compile(repl)),
+            source, sink, count, chunk_size, overlap, lines
+        )
+
+    def subf_stream(
+        self,
+        repl: AnyStr | Callable[..., AnyStr],
+        source: IO[AnyStr] | Iterable[AnyStr],
+        sink: IO[AnyStr],
+        count: int = 0,
+        chunk_size: int = _stream.CHUNK_SIZE,
+        overlap: int = _stream.OVERLAP,
+        lines: bool = False
+    ) -> int:
+        """Apply `subf_stream`."""
+
+        return _stream_sub(
+            self._pattern, self._auto_compile(repl, True), source, sink, count, chunk_size, overlap, lines
+        )
+
+    def sub_into(
+        self,
+        writer: IO[AnyStr],
+        repl: AnyStr | Callable[..., AnyStr],
+        string: AnyStr,
+        count: int = 0
+    ) -> int:
+        """Apply `sub`, writing the result to `writer` piece by piece, and return the number of replacements."""
+
+        if self._pattern.flags & REVERSE:
+            raise ValueError("Cannot substitute into a writer with a reverse pattern!")
+        return _stream.sub_into(self._pattern, _expand_into(self._auto_compile(repl)), string, writer.write, count)
+
+    def subf_into(
+        self,
+        writer: IO[AnyStr],
+        repl: AnyStr | Callable[..., AnyStr],
+        string: AnyStr,
+        count: int = 0
+    ) -> int:
+        """Apply `sub_into` with format style replace."""
+
+        if self._pattern.flags & REVERSE:
+            raise ValueError("Cannot substitute into a writer with a reverse pattern!")
+        return _stream.sub_into(
+            self._pattern, _expand_into(self._auto_compile(repl, True)), string, writer.write, count
+        )
+
+    def finditer_file(
+        self,
+        path: str | _os.PathLike[str],
+        *args: Any,
+        **kwargs: Any
+    ) -> Iterator[Match[bytes]]:
+        """Apply `finditer` to a file through a memory map, match positions are file offsets."""
+
+        return _stream.finditer_file(self._pattern, path, *args, **kwargs)
+
+    def search_file(
+        self,
+        path: str | _os.PathLike[str],
+        *args: Any,
+        **kwargs: Any
+    ) -> Match[bytes] | None:
+        """Apply `search` to a file through a memory map, match positions are file offsets."""
+
+        return cast('Match[bytes] | None', _stream.search_file(self._pattern, path, *args, **kwargs))
+
+    def sub_file(
+        self,
+        repl: AnyStr | Callable[..., AnyStr],
+        src: str | _os.PathLike[str],
+        dest: str | _os.PathLike[str],
+        count: int = 0
+    ) -> int:
+        """Apply `sub` to a file through a memory map and write the result to `dest`."""
+
+        if self._pattern.flags & REVERSE:
+            raise ValueError("Cannot substitute a file with a reverse pattern!")
+        return _stream.sub_file(
+            self._pattern, _expand_into(self._auto_compile(repl)), src, dest, count
+        )
+
+
+class MultiSub(_util.Immutable, Generic[AnyStr]):
+    """
+    Replace the matches of many patterns in one pass.
+
+    The rule patterns are combined into one alternation, each rule followed by a named group that marks it as matched,
+    and the group references of each rule's `ReplaceTemplate` are renumbered to match. At each position, rules are
+    tried in order.
+    """
+
+    __slots__ = ("pattern", "_expand", "_hash")
+
+    pattern: Pattern[AnyStr]
+    _expand: Callable[[Match[AnyStr]], AnyStr]
+    _hash: int
+
+    def __init__(
+        self,
+        rules: Mapping[AnyStr | Pattern[AnyStr] | Bregex[AnyStr], AnyStr | Callable[..., AnyStr]],
+        flags: int = 0
+    ) -> None:
+        """
+        Initialize.
+
+        Rules map search patterns to replace templates, compiled replace templates (format or not),
+        or functions, which are passed the match of their own pattern.
+        """
+
+        patterns = []  # type: list[Pattern[AnyStr]]
+        replaces = []  # type: list[Callable[..., AnyStr]]
+        for pattern, repl in rules.items():
+            p = _get_search_pattern(pattern, flags)
+            if patterns and p.flags != patterns[0].flags:
+                raise ValueError("All rules must be compiled with the same flags!")
+            if p.flags & REVERSE:
+                raise ValueError("Cannot combine reverse patterns!")
+            patterns.append(p)
+            replaces.append(compile_replace(p, repl) if isinstance(repl, (str, bytes, ReplaceTemplate)) else repl)
+        if not patterns:
+            raise ValueError("No rules to combine!")
+
+        renamed = []  # type: list[AnyStr]
+        tokens = _MULTISUB_TOKENS[bool(patterns[0].flags & VERBOSE)]
+        offset = 0
+        for rule, p in enumerate(patterns):
+            renamed.append(_multisub.rename(p.pattern, rule, offset, tokens, _multisub_escape))
+            offset += p.groups + 1
+        combined = cast(
+            'Pattern[AnyStr]',
+            _regex.compile(_multisub.wrap(renamed, bool(patterns[0].flags & VERBOSE)), patterns[0].flags)
+        )
+
+        # Expanders are looked up by the index of each rule's marker group.
+        table = [None] * (combined.groups + 1)  # type: list[Callable[..., AnyStr] | None]
+        offset = 0
+        for p, replace in zip(patterns, replaces, strict=True):
+            if isinstance(replace, ReplaceTemplate):
+                # Out of range groups would refer to the groups of other rules in the combined pattern.
+                for _, group in replace.groups:
+                    if group > p.groups:
+                        raise IndexError(f"'{group}' is out of range!")
+                replace = ReplaceTemplate(
+                    tuple((slot, group + offset if group else 0) for slot, group in replace.groups),
+                    replace.group_slots,
+                    replace.literals,
+                    hash(combined),
+                    replace.use_format,
+                    replace._bytes,
+                    replace.use_codegen
+                )
+            else:
+                replace = _multisub_call(p, replace)
+            offset += p.groups + 1
+            table[offset] = replace
+
+        super().__init__(
+            pattern=combined,
+            _expand=lambda m: table[m.lastindex](m),  # type: ignore[index, misc]
+            _hash=hash((type(self), combined))
+        )
+
+    def __hash__(self) -> int:
+        """Hash."""
+
+        return self._hash
+
+    def __repr__(self) -> str:  # pragma: no cover
+        """Representation."""
+
+        return f'{self.__module__}.{self.__class__.__name__}({self.pattern!r})'
+
+    def sub(self, string: AnyStr, count: int = 0) -> AnyStr:
+        """Apply the rules to the string."""
+
+        return cast(AnyStr, self.pattern.sub(self._expand, string, count))
+
+    def subn(self, string: AnyStr, count: int = 0) -> tuple[AnyStr, int]:
+        """Apply the rules to the string and also return the number of replacements."""
+
+        return cast('tuple[AnyStr, int]', self.pattern.subn(self._expand, string, count))
+
+
+def _multisub_escape(group: int) -> str:
+    """Write a renumbered backreference."""
+
+    return f'\\g<{group}>'
+
+
+def _multisub_call(pattern: Pattern[AnyStr], func: Callable[..., AnyStr]) -> Callable[[Match[AnyStr]], AnyStr]:
+    """Call a replace function with the match of its own pattern at the same position."""
+
+    return lambda m: func(pattern.match(m.string, m.start()))
+
+
 
 def compile(  # noqa A001
     pattern: AnyStr | Pattern[AnyStr] | Bregex[AnyStr],
@@ -438,6 +813,15 @@ def compile(  # noqa A001
         if auto_compile is None:
             auto_compile = True
 
+        if isinstance(pattern, (str, bytes)) and not kwargs and not (flags & DEBUG):
+            key = (pattern, flags, auto_compile, type(pattern))
+            obj = _compile_cache.get(key)  # type: Bregex[AnyStr] | None
+            if obj is None:
+                start = _perf_counter()
+                obj = Bregex(compile_search(pattern, flags), auto_compile)
+                _compile_cache.put(key, obj, _perf_counter() - start)
+            return obj
+
         return Bregex(compile_search(pattern, flags, **kwargs), auto_compile)
 
 
@@ -451,6 +835,92 @@ def compile_search(
     return cast(Pattern[AnyStr], _regex.compile(_apply_search_backrefs(pattern, flags), flags, **kwargs))
 
 
+def compile_many(
+    patterns: Iterable[AnyStr],
+    flags: int = 0,
+    workers: int | None = None,
+    auto_compile: bool | None = None,
+    **kwargs: Any
+) -> list[Bregex[AnyStr]]:
+    """
+    Compile many patterns, preprocessing them in a process pool.
+
+    Preprocessed patterns are stored in the search cache (and the disk cache if enabled) of this process,
+    so later calls to `compile` and friends with the same patterns and flags will not preprocess them again.
+    `workers` defaults to the CPU count, and patterns are preprocessed in this process if it is `1` or less.
+    """
+
+    patterns = list(patterns)
+    if flags & DEBUG:
+        return [compile(pattern, flags, auto_compile, **kwargs) for pattern in patterns]
+
+    if auto_compile is None:
+        auto_compile = True
+    re_verbose, re_version = _search_options(flags)
+    disk = _disk_cache
+    compiled = {}  # type: dict[AnyStr, Bregex[AnyStr]]
+    parsed = {}  # type: dict[AnyStr, AnyStr]
+    pending = []
+    for pattern in dict.fromkeys(patterns):
+        obj = None  # type: Bregex[AnyStr] | None
+        if not kwargs:
+            obj = _compile_cache.get((pattern, flags, auto_compile, type(pattern)))
+        if obj is not None:
+            compiled[pattern] = obj
+            continue
+        key = (pattern, re_verbose, re_version, type(pattern))
+        p = _search_cache.get(key)  # type: AnyStr | None
+        if p is None and disk is not None:
+            p = disk.get(key[:-1])
+            if p is not None:
+                _search_cache.put(key, p)
+        if p is None:
+            pending.append(pattern)
+        else:
+            parsed[pattern] = p
+
+    if workers is None:
+        workers = _os.cpu_count() or 1
+    if workers > 1 and len(pending) > 1:
+        with _ProcessPoolExecutor(max_workers=min(workers, len(pending))) as executor:
+            results = list(
+                executor.map(
+                    _parse_search,
+                    pending,
+                    [re_verbose] * len(pending),
+                    [re_version] * len(pending),
+                    chunksize=max(1, len(pending) // (workers * 4))
+                )
+            )
+    else:
+        results = [_parse_search(pattern, re_verbose, re_version) for pattern in pending]
+    for pattern, (p, elapsed) in zip(pending, results, strict=True):
+        key = (pattern, re_verbose, re_version, type(pattern))
+        _search_cache.put(key, p, elapsed)
+        if disk is not None:
+            disk.put(key[:-1], p)
+        parsed[pattern] = p
+
+    # Build the objects from the preprocessed patterns directly, as there may be more than the search cache holds.
+    for pattern, p in parsed.items():
+        obj = Bregex(cast(Pattern[AnyStr], _regex.compile(p, flags, **kwargs)), auto_compile)
+        if not kwargs:
+            _compile_cache.put((pattern, flags, auto_compile, type(pattern)), obj)
+        compiled[pattern] = obj
+    return [compiled[pattern] for pattern in patterns]
+
+
+def _get_search_pattern(
+    pattern: AnyStr | Pattern[AnyStr] | Bregex[AnyStr],
+    flags: int = 0
+) -> Pattern[AnyStr]:
+    """Get the compiled search pattern, reusing cached `Bregex` objects for string patterns."""
+
+    if isinstance(pattern, (str, bytes)) and not (flags & DEBUG):
+        return compile(pattern, flags)._pattern
+    return compile_search(pattern, flags)
+
+
 def compile_replace(
     pattern: Pattern[AnyStr],
     repl: AnyStr | Callable[..., AnyStr],
@@ -463,7 +933,9 @@ def compile_replace(
             if not (pattern.flags & DEBUG):
                 call = _cached_replace_compile(pattern, repl, flags, type(repl))
             else:  # pragma: no cover
-                call = _bregex_parse._ReplaceParser(pattern, repl, bool(flags & FORMAT)).parse()
+                call = _bregex_parse._ReplaceParser(
+                    pattern, repl, bool(flags & FORMAT), bool(flags & CODEGEN)
+                ).parse()
         elif isinstance(repl, ReplaceTemplate):
             if flags:
                 raise ValueError("Cannot process flags argument with a ReplaceTemplate!")
@@ -484,6 +956,59 @@ def purge() -> None:
     _regex.purge()
 
 
+def dump_bundle(path: str | _os.PathLike[str]) -> None:
+    """
+    Write the currently cached patterns and replace templates to a bundle file.
+
+    Search patterns are stored preprocessed, compiled objects as their expanded pattern and flags,
+    and replace templates as their slot tables, so `load_bundle` does not need to parse anything.
+    """
+
+    bundle = {
+        'search': _search_cache.items(),
+        'compile': [(key, obj.pattern, obj.flags) for key, obj in _compile_cache.items()],
+        'replace': [
+            (
+                key[0].pattern, key[0].flags, key[1:],
+                (t.groups, t.group_slots, t.literals, t.use_format, t._bytes, t.use_codegen)
+            ) for key, t in _replace_cache.items()
+        ]
+    }
+    _cache.write_bundle(path, 'bregex', bundle)
+
+
+def load_bundle(path: str | _os.PathLike[str]) -> list[Bregex[Any]]:
+    """
+    Load a bundle file created by `dump_bundle` into the caches.
+
+    The bundle must have been created with the same version of Backrefs, Unicode, and Python,
+    otherwise a `ValueError` is raised. The compiled objects are returned, and as the replace cache
+    only references patterns weakly, they should be kept for their replace templates to stay cached.
+    """
+
+    bundle = _cache.read_bundle(path, 'bregex')
+
+    for key, p in bundle['search']:
+        _search_cache.put(key, p)
+
+    patterns = {}  # type: dict[tuple[Any, int], Pattern[Any]]
+    loaded = []  # type: list[Bregex[Any]]
+    for key, text, flags in bundle['compile']:
+        pattern = cast(Pattern[Any], _regex.compile(text, key[1]))
+        patterns[(text, flags)] = pattern
+        obj = Bregex(pattern, key[2])
+        _compile_cache.put(key, obj)
+        loaded.append(obj)
+
+    for text, flags, rest, (groups, group_slots, literals, use_format, is_bytes, use_codegen) in bundle['replace']:
+        pattern = patterns.get((text, flags)) or cast(Pattern[Any], _regex.compile(text, flags))
+        # Pattern hashes differ between processes, so they must be recomputed.
+        template = ReplaceTemplate(groups, group_slots, literals, hash(pattern), use_format, is_bytes, use_codegen)
+        _replace_cache.put((pattern,) + rest, template)
+
+    return loaded
+
+
 def expand(m: Match[AnyStr] | None, repl: ReplaceTemplate[AnyStr] | AnyStr) -> AnyStr:
     """Expand the string using the replace pattern or function."""
 
@@ -507,6 +1032,8 @@ def prefixmatch(
 ) -> Match[AnyStr] | None:
     """Wrapper for `match`."""
 
+    if not args and not kwargs:
+        return cast('Match[AnyStr] | None', _get_search_pattern(pattern, flags).match(string))
     return cast(
         'Match[AnyStr] | None',
         _regex.match(_apply_search_backrefs(pattern, flags), string, flags, *args, **kwargs)
@@ -525,6 +1052,8 @@ def fullmatch(
 ) -> Match[AnyStr] | None:
     """Wrapper for `fullmatch`."""
 
+    if not args and not kwargs:
+        return cast('Match[AnyStr] | None', _get_search_pattern(pattern, flags).fullmatch(string))
     return cast(
         'Match[AnyStr] | None',
         _regex.fullmatch(_apply_search_backrefs(pattern, flags), string, flags, *args, **kwargs)
@@ -540,6 +1069,8 @@ def search(
 ) -> Match[AnyStr] | None:
     """Wrapper for `search`."""
 
+    if not args and not kwargs:
+        return cast('Match[AnyStr] | None', _get_search_pattern(pattern, flags).search(string))
     return cast(
         'Match[AnyStr] | None',
         _regex.search(_apply_search_backrefs(pattern, flags), string, flags, *args, **kwargs)
@@ -562,15 +1093,13 @@ def sub(
     if is_replace and cast(ReplaceTemplate[AnyStr], repl).use_format:
         raise ValueError("Compiled replace cannot be a format object!")
 
-    pattern = compile_search(pattern, flags)
+    pattern = _get_search_pattern(pattern, flags)
+    replace = _engine_replace(pattern, compile_replace(pattern, repl)) if is_replace or is_string else repl
+    if not args and not kwargs:
+        return cast(AnyStr, pattern.sub(replace, string, count))
     return cast(
         AnyStr,
-        _regex.sub(
-            pattern, (compile_replace(pattern, repl) if is_replace or is_string else repl), string,
-            count,
-            0,
-            *args, **kwargs
-        )
+        _regex.sub(pattern, replace, string, count, 0, *args, **kwargs)
     )
 
 
@@ -590,16 +1119,14 @@ def subf(
     if is_replace and not cast(ReplaceTemplate[AnyStr], repl).use_format:
         raise ValueError("Compiled replace is not a format object!")
 
-    pattern = compile_search(pattern, flags)
+    pattern = _get_search_pattern(pattern, flags)
     rflags = FORMAT if is_string else 0
+    replace = compile_replace(pattern, repl, flags=rflags) if is_replace or is_string else repl
+    if not args and not kwargs:
+        return cast(AnyStr, pattern.sub(replace, string, count))
     return cast(
         AnyStr,
-        _regex.sub(
-            pattern, (compile_replace(pattern, repl, flags=rflags) if is_replace or is_string else repl), string,
-            count,
-            0,
-            *args, **kwargs
-        )
+        _regex.sub(pattern, replace, string, count, 0, *args, **kwargs)
     )
 
 
@@ -619,15 +1146,13 @@ def subn(
     if is_replace and cast(ReplaceTemplate[AnyStr], repl).use_format:
         raise ValueError("Compiled replace cannot be a format object!")
 
-    pattern = compile_search(pattern, flags)
+    pattern = _get_search_pattern(pattern, flags)
+    replace = _engine_replace(pattern, compile_replace(pattern, repl)) if is_replace or is_string else repl
+    if not args and not kwargs:
+        return cast('tuple[AnyStr, int]', pattern.subn(replace, string, count))
     return cast(
         'tuple[AnyStr, int]',
-        _regex.subn(
-            pattern, (compile_replace(pattern, repl) if is_replace or is_string else repl), string,
-            count,
-            0,
-            *args, **kwargs
-        )
+        _regex.subn(pattern, replace, string, count, 0, *args, **kwargs)
     )
 
 
@@ -647,16 +1172,161 @@ def subfn(
     if is_replace and not cast(ReplaceTemplate[AnyStr], repl).use_format:
         raise ValueError("Compiled replace is not a format object!")
 
-    pattern = compile_search(pattern, flags)
+    pattern = _get_search_pattern(pattern, flags)
     rflags = FORMAT if is_string else 0
+    replace = compile_replace(pattern, repl, flags=rflags) if is_replace or is_string else repl
+    if not args and not kwargs:
+        return cast('tuple[AnyStr, int]', pattern.subn(replace, string, count))
     return cast(
         'tuple[AnyStr, int]',
-        _regex.subn(
-            pattern, (compile_replace(pattern, repl, flags=rflags) if is_replace or is_string else repl), string,
-            count,
-            0,
-            *args, **kwargs
-        )
+        _regex.subn(pattern, replace, string, count, 0, *args, **kwargs)
+    )
+
+
+def _stream_sub(
+    pattern: Pattern[AnyStr],
+    replace: AnyStr | Callable[..., AnyStr],
+    source: IO[AnyStr] | Iterable[AnyStr],
+    sink: IO[AnyStr],
+    count: int,
+    chunk_size: int,
+    overlap: int,
+    lines: bool
+) -> int:
+    """Stream the replacement through the chunked substitution."""
+
+    if pattern.flags & REVERSE:
+        raise ValueError("Cannot stream a reverse pattern!")
+    return _stream.sub(
+        pattern, _stream.expander(replace), source, sink.write, count, chunk_size, overlap, lines
+    )
+
+
+def sub_stream(
+    pattern: AnyStr | Pattern[AnyStr] | Bregex[AnyStr],
+    repl: AnyStr | Callable[..., AnyStr],
+    source: IO[AnyStr] | Iterable[AnyStr],
+    sink: IO[AnyStr],
+    count: int = 0,
+    flags: int = 0,
+    chunk_size: int = _stream.CHUNK_SIZE,
+    overlap: int = _stream.OVERLAP,
+    lines: bool = False
+) -> int:
+    """Wrapper for `sub` over a readable file object or an iterable of chunks, writing the result to `sink`."""
+
+    is_replace = _is_replace(repl)
+    is_string = isinstance(repl, (str, bytes))
+    if is_replace and cast(ReplaceTemplate[AnyStr], repl).use_format:
+        raise ValueError("Compiled replace cannot be a format object!")
+
+    pattern = _get_search_pattern(pattern, flags)
+    replace = _engine_replace(pattern, compile_replace(pattern, repl)) if is_replace or is_string else repl
+    return _stream_sub(pattern, replace, source, sink, count, chunk_size, overlap, lines)
+
+
+def subf_stream(
+    pattern: AnyStr | Pattern[AnyStr] | Bregex[AnyStr],
+    repl: AnyStr | Callable[..., AnyStr],
+    source: IO[AnyStr] | Iterable[AnyStr],
+    sink: IO[AnyStr],
+    count: int = 0,
+    flags: int = 0,
+    chunk_size: int = _stream.CHUNK_SIZE,
+    overlap: int = _stream.OVERLAP,
+    lines: bool = False
+) -> int:
+    """Wrapper for `subf` over a readable file object or an iterable of chunks, writing the result to `sink`."""
+
+    is_replace = _is_replace(repl)
+    is_string = isinstance(repl, (str, bytes))
+    if is_replace and not cast(ReplaceTemplate[AnyStr], repl).use_format:
+        raise ValueError("Compiled replace is not a format object!")
+
+    pattern = _get_search_pattern(pattern, flags)
+    rflags = FORMAT if is_string else 0
+    replace = compile_replace(pattern, repl, flags=rflags) if is_replace or is_string else repl
+    return _stream_sub(pattern, replace, source, sink, count, chunk_size, overlap, lines)
+
+
+def _parallel_options(pattern: Pattern[AnyStr], threads: bool) -> dict[str, Any]:
+    """Get the options that let threads match concurrently."""
+
+    if pattern.flags & REVERSE:
+        raise ValueError("Cannot split the search of a reverse pattern!")
+    return {'concurrent': True} if threads else {}
+
+
+def subn_parallel(
+    pattern: AnyStr | Pattern[AnyStr] | Bregex[AnyStr],
+    repl: AnyStr | Callable[..., AnyStr],
+    string: AnyStr,
+    flags: int = 0,
+    workers: int | None = None,
+    chunk_size: int = _parallel.CHUNK_SIZE,
+    splitter: AnyStr | Pattern[AnyStr] | Bregex[AnyStr] | None = None,
+    threads: bool = False
+) -> tuple[AnyStr, int]:
+    """
+    Wrapper for `subn` on pieces of the string split at line breaks, or after matches of `splitter`, in a pool.
+
+    With `threads`, a thread pool is used and the pieces are matched with `concurrent` enabled.
+    """
+
+    is_replace = _is_replace(repl)
+    is_string = isinstance(repl, (str, bytes))
+    if is_replace and cast(ReplaceTemplate[AnyStr], repl).use_format:
+        raise ValueError("Compiled replace cannot be a format object!")
+
+    pattern = _get_search_pattern(pattern, flags)
+    replace = _engine_replace(pattern, compile_replace(pattern, repl)) if is_replace or is_string else repl
+    return _parallel.subn(
+        pattern, replace, string, workers, chunk_size, None if splitter is None else _get_search_pattern(splitter),
+        threads, **_parallel_options(pattern, threads)
+    )
+
+
+def subfn_parallel(
+    pattern: AnyStr | Pattern[AnyStr] | Bregex[AnyStr],
+    repl: AnyStr | Callable[..., AnyStr],
+    string: AnyStr,
+    flags: int = 0,
+    workers: int | None = None,
+    chunk_size: int = _parallel.CHUNK_SIZE,
+    splitter: AnyStr | Pattern[AnyStr] | Bregex[AnyStr] | None = None,
+    threads: bool = False
+) -> tuple[AnyStr, int]:
+    """Wrapper for `subn_parallel` with format style replace."""
+
+    is_replace = _is_replace(repl)
+    is_string = isinstance(repl, (str, bytes))
+    if is_replace and not cast(ReplaceTemplate[AnyStr], repl).use_format:
+        raise ValueError("Compiled replace is not a format object!")
+
+    pattern = _get_search_pattern(pattern, flags)
+    rflags = FORMAT if is_string else 0
+    replace = compile_replace(pattern, repl, flags=rflags) if is_replace or is_string else repl
+    return _parallel.subn(
+        pattern, replace, string, workers, chunk_size, None if splitter is None else _get_search_pattern(splitter),
+        threads, **_parallel_options(pattern, threads)
+    )
+
+
+def findall_parallel(
+    pattern: AnyStr | Pattern[AnyStr] | Bregex[AnyStr],
+    string: AnyStr,
+    flags: int = 0,
+    workers: int | None = None,
+    chunk_size: int = _parallel.CHUNK_SIZE,
+    splitter: AnyStr | Pattern[AnyStr] | Bregex[AnyStr] | None = None,
+    threads: bool = False
+) -> list[AnyStr] | list[tuple[AnyStr, ...]]:
+    """Wrapper for `findall` on pieces of the string split like `subn_parallel` in a pool."""
+
+    pattern = _get_search_pattern(pattern, flags)
+    return _parallel.findall(
+        pattern, string, workers, chunk_size, None if splitter is None else _get_search_pattern(splitter),
+        threads, **_parallel_options(pattern, threads)
     )
 
 
@@ -670,6 +1340,8 @@ def split(
 ) -> list[AnyStr]:
     """Wrapper for `split`."""
 
+    if not args and not kwargs:
+        return cast('list[AnyStr]', _get_search_pattern(pattern, flags).split(string, maxsplit))
     return cast(
         'list[AnyStr]',
         _regex.split(_apply_search_backrefs(pattern, flags), string, maxsplit, flags, *args, **kwargs)
@@ -686,6 +1358,8 @@ def splititer(
 ) -> Iterator[AnyStr]:
     """Wrapper for `splititer`."""
 
+    if not args and not kwargs:
+        return cast(Iterator[AnyStr], _get_search_pattern(pattern, flags).splititer(string, maxsplit))
     return cast(
         Iterator[AnyStr],
         _regex.splititer(_apply_search_backrefs(pattern, flags), string, maxsplit, flags, *args, **kwargs)
@@ -701,6 +1375,8 @@ def findall(
 ) -> list[AnyStr] | list[tuple[AnyStr, ...]]:
     """Wrapper for `findall`."""
 
+    if not args and not kwargs:
+        return cast('list[AnyStr] | list[tuple[AnyStr, ...]]', _get_search_pattern(pattern, flags).findall(string))
     return cast(
         'list[AnyStr] | list[tuple[AnyStr, ...]]',
         _regex.findall(_apply_search_backrefs(pattern, flags), string, flags, *args, **kwargs)
@@ -716,9 +1392,11 @@ def finditer(
 ) -> Iterator[Match[AnyStr]]:
     """Wrapper for `finditer`."""
 
+    if not args and not kwargs:
+        return cast(Iterator[Match[AnyStr]], _get_search_pattern(pattern, flags).finditer(string))
     return cast(
         Iterator[Match[AnyStr]],
-        _regex.finditer(_apply_search_backrefs(pattern, flags), string, *args, **kwargs)
+        _regex.finditer(_apply_search_backrefs(pattern, flags), string, flags, *args, **kwargs)
     )
 
 
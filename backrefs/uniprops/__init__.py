@@ -1,5 +1,12 @@
 """Unicode Properties."""
 from __future__ import annotations
+import re as _re
+import sys as _sys
+from array import array as _array
+from bisect import bisect_right as _bisect_right
+from functools import lru_cache as _lru_cache
+from typing import Iterable as _Iterable
+from . import _packed
 from .unidata import alias
 
 UNICODE_RANGE = '\u0000-\U0010ffff'
@@ -9,6 +16,43 @@ MODE_NORMAL = 0
 MODE_ASCII = 1
 MODE_UNICODE = 2
 
+_MAXCACHE = 2048
+
+# Characters outside the BMP.
+_ASTRAL = _re.compile('[\U00010000-\U0010ffff]')
+
+# Encoding that writes a string of characters below `0xd800` as native 16 bit integers.
+_UTF16 = 'utf-16-le' if _sys.byteorder == 'little' else 'utf-16-be'
+
+# Tables of the properties that map each character to at most one value, by property name.
+# The general category is built from its subcategories instead.
+_PARTITIONS = {
+    'age': ('age', 'unicode_age'),
+    'bidiclass': ('bidiclass', 'unicode_bidi_classes'),
+    'bidipairedbrackettype': ('bidipairedbrackettype', 'unicode_bidi_paired_bracket_type'),
+    'block': ('block', 'unicode_blocks'),
+    'canonicalcombiningclass': ('canonicalcombiningclass', 'unicode_canonical_combining_class'),
+    'decompositiontype': ('decompositiontype', 'unicode_decomposition_type'),
+    'eastasianwidth': ('eastasianwidth', 'unicode_east_asian_width'),
+    'graphemeclusterbreak': ('graphemeclusterbreak', 'unicode_grapheme_cluster_break'),
+    'hangulsyllabletype': ('hangulsyllabletype', 'unicode_hangul_syllable_type'),
+    'indicpositionalcategory': ('indicpositionalcategory', 'unicode_indic_positional_category'),
+    'indicsyllabiccategory': ('indicsyllabiccategory', 'unicode_indic_syllabic_category'),
+    'joininggroup': ('joininggroup', 'unicode_joining_group'),
+    'joiningtype': ('joiningtype', 'unicode_joining_type'),
+    'linebreak': ('linebreak', 'unicode_line_break'),
+    'nfcquickcheck': ('quickcheck', 'unicode_nfc_quick_check'),
+    'nfdquickcheck': ('quickcheck', 'unicode_nfd_quick_check'),
+    'nfkcquickcheck': ('quickcheck', 'unicode_nfkc_quick_check'),
+    'nfkdquickcheck': ('quickcheck', 'unicode_nfkd_quick_check'),
+    'numerictype': ('numerictype', 'unicode_numeric_type'),
+    'numericvalue': ('numericvalue', 'unicode_numeric_values'),
+    'script': ('script', 'unicode_scripts'),
+    'sentencebreak': ('sentencebreak', 'unicode_sentence_break'),
+    'verticalorientation': ('verticalorientation', 'unicode_vertical_orientation'),
+    'wordbreak': ('wordbreak', 'unicode_word_break')
+}
+
 
 def fmt_string(value: str, is_bytes: bool) -> str:
     """Format for bytes string."""
@@ -22,7 +66,7 @@ def fmt_string(value: str, is_bytes: bool) -> str:
 def get_gc_property(value: str, mode: int = MODE_UNICODE) -> str:
     """Get `GC` property."""
 
-    from .unidata import generalcategory as prop_table
+    prop_table = _packed.load('generalcategory')
 
     obj = prop_table.ascii_properties if mode != MODE_UNICODE else prop_table.unicode_properties
 
@@ -57,7 +101,7 @@ def get_gc_property(value: str, mode: int = MODE_UNICODE) -> str:
 def get_binary_property(value: str, mode: int = MODE_UNICODE) -> str:
     """Get `BINARY` property."""
 
-    from .unidata import binary as prop_table
+    prop_table = _packed.load('binary')
 
     obj = prop_table.ascii_binary if mode != MODE_UNICODE else prop_table.unicode_binary
 
@@ -73,7 +117,7 @@ def get_binary_property(value: str, mode: int = MODE_UNICODE) -> str:
 def get_canonical_combining_class_property(value: str, mode: int = MODE_UNICODE) -> str:
     """Get `CANONICAL COMBINING CLASS` property."""
 
-    from .unidata import canonicalcombiningclass as prop_table
+    prop_table = _packed.load('canonicalcombiningclass')
 
     if mode != MODE_UNICODE:
         obj = prop_table.ascii_canonical_combining_class
@@ -92,7 +136,7 @@ def get_canonical_combining_class_property(value: str, mode: int = MODE_UNICODE)
 def get_east_asian_width_property(value: str, mode: int = MODE_UNICODE) -> str:
     """Get `EAST ASIAN WIDTH` property."""
 
-    from .unidata import eastasianwidth as prop_table
+    prop_table = _packed.load('eastasianwidth')
 
     obj = prop_table.ascii_east_asian_width if mode != MODE_UNICODE else prop_table.unicode_east_asian_width
 
@@ -108,7 +152,7 @@ def get_east_asian_width_property(value: str, mode: int = MODE_UNICODE) -> str:
 def get_grapheme_cluster_break_property(value: str, mode: int = MODE_UNICODE) -> str:
     """Get `GRAPHEME CLUSTER BREAK` property."""
 
-    from .unidata import graphemeclusterbreak as prop_table
+    prop_table = _packed.load('graphemeclusterbreak')
 
     obj = prop_table.ascii_grapheme_cluster_break if mode != MODE_UNICODE else prop_table.unicode_grapheme_cluster_break
 
@@ -124,7 +168,7 @@ def get_grapheme_cluster_break_property(value: str, mode: int = MODE_UNICODE) ->
 def get_line_break_property(value: str, mode: int = MODE_UNICODE) -> str:
     """Get `LINE BREAK` property."""
 
-    from .unidata import linebreak as prop_table
+    prop_table = _packed.load('linebreak')
 
     obj = prop_table.ascii_line_break if mode != MODE_UNICODE else prop_table.unicode_line_break
 
@@ -140,7 +184,7 @@ def get_line_break_property(value: str, mode: int = MODE_UNICODE) -> str:
 def get_sentence_break_property(value: str, mode: int = MODE_UNICODE) -> str:
     """Get `SENTENCE BREAK` property."""
 
-    from .unidata import sentencebreak as prop_table
+    prop_table = _packed.load('sentencebreak')
 
     obj = prop_table.ascii_sentence_break if mode != MODE_UNICODE else prop_table.unicode_sentence_break
 
@@ -156,7 +200,7 @@ def get_sentence_break_property(value: str, mode: int = MODE_UNICODE) -> str:
 def get_word_break_property(value: str, mode: int = MODE_UNICODE) -> str:
     """Get `WORD BREAK` property."""
 
-    from .unidata import wordbreak as prop_table
+    prop_table = _packed.load('wordbreak')
 
     obj = prop_table.ascii_word_break if mode != MODE_UNICODE else prop_table.unicode_word_break
 
@@ -172,7 +216,7 @@ def get_word_break_property(value: str, mode: int = MODE_UNICODE) -> str:
 def get_hangul_syllable_type_property(value: str, mode: int = MODE_UNICODE) -> str:
     """Get `HANGUL SYLLABLE TYPE` property."""
 
-    from .unidata import hangulsyllabletype as prop_table
+    prop_table = _packed.load('hangulsyllabletype')
 
     obj = prop_table.ascii_hangul_syllable_type if mode != MODE_UNICODE else prop_table.unicode_hangul_syllable_type
 
@@ -188,7 +232,7 @@ def get_hangul_syllable_type_property(value: str, mode: int = MODE_UNICODE) -> s
 def get_indic_positional_category_property(value: str, mode: int = MODE_UNICODE) -> str:
     """Get `INDIC POSITIONAL/MATRA CATEGORY` property."""
 
-    from .unidata import indicpositionalcategory as prop_table
+    prop_table = _packed.load('indicpositionalcategory')
 
     if mode != MODE_UNICODE:
         obj = prop_table.ascii_indic_positional_category
@@ -208,7 +252,7 @@ def get_indic_positional_category_property(value: str, mode: int = MODE_UNICODE)
 def get_indic_syllabic_category_property(value: str, mode: int = MODE_UNICODE) -> str:
     """Get `INDIC SYLLABIC CATEGORY` property."""
 
-    from .unidata import indicsyllabiccategory as prop_table
+    prop_table = _packed.load('indicsyllabiccategory')
 
     if mode != MODE_UNICODE:
         obj = prop_table.ascii_indic_syllabic_category
@@ -227,7 +271,7 @@ def get_indic_syllabic_category_property(value: str, mode: int = MODE_UNICODE) -
 def get_decomposition_type_property(value: str, mode: int = MODE_UNICODE) -> str:
     """Get `DECOMPOSITION TYPE` property."""
 
-    from .unidata import decompositiontype as prop_table
+    prop_table = _packed.load('decompositiontype')
 
     obj = prop_table.ascii_decomposition_type if mode != MODE_UNICODE else prop_table.unicode_decomposition_type
 
@@ -243,7 +287,7 @@ def get_decomposition_type_property(value: str, mode: int = MODE_UNICODE) -> str
 def get_nfc_quick_check_property(value: str, mode: int = MODE_UNICODE) -> str:
     """Get `NFC QUICK CHECK` property."""
 
-    from .unidata import quickcheck as prop_table
+    prop_table = _packed.load('quickcheck')
 
     obj = prop_table.ascii_nfc_quick_check if mode != MODE_UNICODE else prop_table.unicode_nfc_quick_check
 
@@ -259,7 +303,7 @@ def get_nfc_quick_check_property(value: str, mode: int = MODE_UNICODE) -> str:
 def get_nfd_quick_check_property(value: str, mode: int = MODE_UNICODE) -> str:
     """Get `NFD QUICK CHECK` property."""
 
-    from .unidata import quickcheck as prop_table
+    prop_table = _packed.load('quickcheck')
 
     obj = prop_table.ascii_nfd_quick_check if mode != MODE_UNICODE else prop_table.unicode_nfd_quick_check
 
@@ -275,7 +319,7 @@ def get_nfd_quick_check_property(value: str, mode: int = MODE_UNICODE) -> str:
 def get_nfkc_quick_check_property(value: str, mode: int = MODE_UNICODE) -> str:
     """Get `NFKC QUICK CHECK` property."""
 
-    from .unidata import quickcheck as prop_table
+    prop_table = _packed.load('quickcheck')
 
     obj = prop_table.ascii_nfkc_quick_check if mode != MODE_UNICODE else prop_table.unicode_nfkc_quick_check
 
@@ -291,7 +335,7 @@ def get_nfkc_quick_check_property(value: str, mode: int = MODE_UNICODE) -> str:
 def get_nfkd_quick_check_property(value: str, mode: int = MODE_UNICODE) -> str:
     """Get `NFKD QUICK CHECK` property."""
 
-    from .unidata import quickcheck as prop_table
+    prop_table = _packed.load('quickcheck')
 
     obj = prop_table.ascii_nfkd_quick_check if mode != MODE_UNICODE else prop_table.unicode_nfkd_quick_check
 
@@ -307,7 +351,7 @@ def get_nfkd_quick_check_property(value: str, mode: int = MODE_UNICODE) -> str:
 def get_numeric_type_property(value: str, mode: int = MODE_UNICODE) -> str:
     """Get `NUMERIC TYPE` property."""
 
-    from .unidata import numerictype as prop_table
+    prop_table = _packed.load('numerictype')
 
     obj = prop_table.ascii_numeric_type if mode != MODE_UNICODE else prop_table.unicode_numeric_type
 
@@ -323,7 +367,7 @@ def get_numeric_type_property(value: str, mode: int = MODE_UNICODE) -> str:
 def get_numeric_value_property(value: str, mode: int = MODE_UNICODE) -> str:
     """Get `NUMERIC VALUE` property."""
 
-    from .unidata import numericvalue as prop_table
+    prop_table = _packed.load('numericvalue')
 
     obj = prop_table.ascii_numeric_values if mode != MODE_UNICODE else prop_table.unicode_numeric_values
 
@@ -339,7 +383,7 @@ def get_numeric_value_property(value: str, mode: int = MODE_UNICODE) -> str:
 def get_age_property(value: str, mode: int = MODE_UNICODE) -> str:
     """Get `AGE` property."""
 
-    from .unidata import age as prop_table
+    prop_table = _packed.load('age')
 
     obj = prop_table.ascii_age if mode != MODE_UNICODE else prop_table.unicode_age
 
@@ -355,7 +399,7 @@ def get_age_property(value: str, mode: int = MODE_UNICODE) -> str:
 def get_joining_type_property(value: str, mode: int = MODE_UNICODE) -> str:
     """Get `JOINING TYPE` property."""
 
-    from .unidata import joiningtype as prop_table
+    prop_table = _packed.load('joiningtype')
 
     obj = prop_table.ascii_joining_type if mode != MODE_UNICODE else prop_table.unicode_joining_type
 
@@ -371,7 +415,7 @@ def get_joining_type_property(value: str, mode: int = MODE_UNICODE) -> str:
 def get_joining_group_property(value: str, mode: int = MODE_UNICODE) -> str:
     """Get `JOINING GROUP` property."""
 
-    from .unidata import joininggroup as prop_table
+    prop_table = _packed.load('joininggroup')
 
     obj = prop_table.ascii_joining_group if mode != MODE_UNICODE else prop_table.unicode_joining_group
 
@@ -387,7 +431,7 @@ def get_joining_group_property(value: str, mode: int = MODE_UNICODE) -> str:
 def get_script_property(value: str, mode: int = MODE_UNICODE) -> str:
     """Get `SC` property."""
 
-    from .unidata import script as prop_table
+    prop_table = _packed.load('script')
 
     obj = prop_table.ascii_scripts if mode != MODE_UNICODE else prop_table.unicode_scripts
 
@@ -403,7 +447,7 @@ def get_script_property(value: str, mode: int = MODE_UNICODE) -> str:
 def get_script_extension_property(value: str, mode: int = MODE_UNICODE) -> str:
     """Get `SCX` property."""
 
-    from .unidata import scriptextensions as prop_table
+    prop_table = _packed.load('scriptextensions')
 
     obj = prop_table.ascii_script_extensions if mode != MODE_UNICODE else prop_table.unicode_script_extensions
 
@@ -419,7 +463,7 @@ def get_script_extension_property(value: str, mode: int = MODE_UNICODE) -> str:
 def get_block_property(value: str, mode: int = MODE_UNICODE) -> str:
     """Get `BLK` property."""
 
-    from .unidata import block as prop_table
+    prop_table = _packed.load('block')
 
     obj = prop_table.ascii_blocks if mode != MODE_UNICODE else prop_table.unicode_blocks
 
@@ -435,7 +479,7 @@ def get_block_property(value: str, mode: int = MODE_UNICODE) -> str:
 def get_bidi_property(value: str, mode: int = MODE_UNICODE) -> str:
     """Get `BC` property."""
 
-    from .unidata import bidiclass as prop_table
+    prop_table = _packed.load('bidiclass')
 
     obj = prop_table.ascii_bidi_classes if mode != MODE_UNICODE else prop_table.unicode_bidi_classes
 
@@ -451,7 +495,7 @@ def get_bidi_property(value: str, mode: int = MODE_UNICODE) -> str:
 def get_bidi_paired_bracket_type_property(value: str, mode: int = MODE_UNICODE) -> str:
     """Get `BPT` property."""
 
-    from .unidata import bidipairedbrackettype as prop_table
+    prop_table = _packed.load('bidipairedbrackettype')
 
     if mode != MODE_UNICODE:
         obj = prop_table.ascii_bidi_paired_bracket_type
@@ -470,7 +514,7 @@ def get_bidi_paired_bracket_type_property(value: str, mode: int = MODE_UNICODE)
 def get_vertical_orientation_property(value: str, mode: int = MODE_UNICODE) -> str:
     """Get `VO` property."""
 
-    from .unidata import verticalorientation as prop_table
+    prop_table = _packed.load('verticalorientation')
 
     if mode != MODE_UNICODE:
         obj = prop_table.ascii_vertical_orientation
@@ -489,8 +533,7 @@ def get_vertical_orientation_property(value: str, mode: int = MODE_UNICODE) -> s
 def get_is_property(value: str, mode: int = MODE_UNICODE) -> str:
     """Get shortcut for `SC` or `Binary` property."""
 
-    from .unidata import scriptextensions as scx
-    from .unidata import binary
+    scx = _packed.load('scriptextensions')
 
     if value.startswith('^'):
         prefix = value[1:3]
@@ -505,13 +548,14 @@ def get_is_property(value: str, mode: int = MODE_UNICODE) -> str:
         raise ValueError("Does not start with 'is'!")
 
     script_obj = scx.ascii_script_extensions if mode != MODE_UNICODE else scx.unicode_script_extensions
-    bin_obj = binary.ascii_binary if mode != MODE_UNICODE else binary.unicode_binary
 
     value = negate + alias.unicode_alias['script'].get(temp, temp)
 
     if value not in script_obj:
+        # Only load the binary table if the name is not a script.
+        binary = _packed.load('binary')
         value = negate + alias.unicode_alias['binary'].get(temp, temp)
-        obj = bin_obj
+        obj = binary.ascii_binary if mode != MODE_UNICODE else binary.unicode_binary
     else:
         obj = script_obj
 
@@ -521,7 +565,7 @@ def get_is_property(value: str, mode: int = MODE_UNICODE) -> str:
 def get_in_property(value: str, mode: int = MODE_UNICODE) -> str:
     """Get shortcut for `Block` property."""
 
-    from .unidata import block as prop_table
+    prop_table = _packed.load('block')
 
     if value.startswith('^'):
         prefix = value[1:3]
@@ -544,13 +588,29 @@ def get_in_property(value: str, mode: int = MODE_UNICODE) -> str:
 def _is_binary(name: str) -> bool:
     """Check if name is an enum (not a binary) property."""
 
-    from .unidata import binary as prop_table
+    prop_table = _packed.load('binary')
 
     return name in prop_table.unicode_binary or name in alias.unicode_alias['binary']
 
 
+# Getters of the kinds of properties that can be used without a property name, by their name in the name index.
+_NAMED_PROPERTIES = {
+    'generalcategory': get_gc_property,
+    'scriptextensions': get_script_extension_property,
+    'binary': get_binary_property,
+    'block': get_block_property,
+    'is': get_is_property,
+    'in': get_in_property
+}
+
+
+@_lru_cache(maxsize=_MAXCACHE)
 def get_unicode_property(prop: str, value: str | None = None, mode: int = MODE_UNICODE) -> str:
-    """Retrieve the Unicode category from the table."""
+    """
+    Retrieve the Unicode category from the table.
+
+    Results are cached, so a property that is used repeatedly is only resolved once per mode.
+    """
 
     if value is not None:
 
@@ -632,6 +692,22 @@ def get_unicode_property(prop: str, value: str | None = None, mode: int = MODE_U
         except Exception as e:
             raise ValueError(f"'{prop}={value}' does not appear to be a valid property") from e
 
+    # Resolve the property that owns the name first, so only its table is loaded.
+    names = getattr(alias, 'unicode_names', None)  # type: dict[str, str] | None
+    if names is None:
+        return _find_property(prop, mode)
+    owner = names.get(prop[1:] if prop.startswith('^') else prop)
+    try:
+        if owner is not None:
+            return _NAMED_PROPERTIES[owner](prop, mode)
+    except Exception as e:
+        raise ValueError(f"'{prop}' does not appear to be a valid property") from e
+    raise ValueError(f"'{prop}' does not appear to be a valid property")
+
+
+def _find_property(prop: str, mode: int = MODE_UNICODE) -> str:
+    """Find a property by trying each kind of property that can be used without a property name in turn."""
+
     try:
         return get_gc_property(prop, mode)
     except Exception:
@@ -663,3 +739,165 @@ def get_unicode_property(prop: str, value: str | None = None, mode: int = MODE_U
         pass
 
     raise ValueError(f"'{prop}' does not appear to be a valid property")
+
+
+def _normalize(name: str) -> str:
+    """Normalize a property name or value, case and `[ -_]` are ignored as they are in patterns."""
+
+    return name.lower().replace(' ', '').replace('-', '').replace('_', '')
+
+
+def _parse_ranges(value: str) -> list[tuple[int, int]]:
+    """Parse a range string into a list of first and last code points."""
+
+    ranges = []
+    i = 0
+    end = len(value)
+    while i < end:
+        if value[i] == '\\':
+            i += 1
+        first = last = ord(value[i])
+        i += 1
+        if i < end and value[i] == '-':
+            i += 1
+            if value[i] == '\\':
+                i += 1
+            last = ord(value[i])
+            i += 1
+        ranges.append((first, last))
+    return ranges
+
+
+@_lru_cache(maxsize=_MAXCACHE)
+def _get_ranges(prop: str, value: str | None) -> tuple[list[int], list[int]]:
+    """Get the sorted and merged first and last code points of a property's ranges."""
+
+    firsts = []  # type: list[int]
+    lasts = []  # type: list[int]
+    for first, last in sorted(_parse_ranges(get_unicode_property(prop, value))):
+        if lasts and first <= lasts[-1] + 1:
+            lasts[-1] = max(lasts[-1], last)
+        else:
+            firsts.append(first)
+            lasts.append(last)
+    return firsts, lasts
+
+
+@_lru_cache(maxsize=None)
+def _get_partition(prop: str) -> tuple[list[int], list[int], list[str]]:
+    """Get the sorted first and last code points of each range of a property's values, and the range's value."""
+
+    name = alias.unicode_alias['_'].get(prop, prop)
+    if name == 'generalcategory':
+        table = _packed.load('generalcategory').unicode_properties
+        values = {
+            p1 + p2: v for p1, sub in table.items() for p2, v in sub.items()
+            if len(p2) == 1 and p2 != '^' and p1 + p2 != 'lc'
+        }
+    elif name in _PARTITIONS:
+        module, attr = _PARTITIONS[name]
+        values = {k: v for k, v in getattr(_packed.load(module), attr).items() if not k.startswith('^')}
+    else:
+        raise ValueError(f"'{prop}' is not a property that maps each character to one value")
+
+    spans = sorted((first, last, key) for key, v in values.items() for first, last in _parse_ranges(v))
+    return [s[0] for s in spans], [s[1] for s in spans], [s[2] for s in spans]
+
+
+def contains(prop: str, value: str | None, cp: int | str) -> bool:
+    r"""
+    Check if a code point, or a character, has a property.
+
+    `prop` and `value` are given as they are in `\p{prop=value}`, or `value` is `None` for a property given without
+    a name as in `\p{prop}`. As in patterns, `prop` can be negated with `^`, and case and `[ -_]` are ignored.
+    """
+
+    firsts, lasts = _get_ranges(_normalize(prop), None if value is None else _normalize(value))
+    c = cp if isinstance(cp, int) else ord(cp)
+    i = _bisect_right(firsts, c) - 1
+    return i >= 0 and c <= lasts[i]
+
+
+def value_of(prop: str, cp: int | str) -> str | None:
+    """
+    Get the value of a property for a code point, or a character.
+
+    The property must map each character to at most one value, such as `script` or `line_break`, and the value's
+    canonical name, as used in the property tables, is returned. `None` is returned for characters without a value.
+    """
+
+    firsts, lasts, values = _get_partition(_normalize(prop))
+    c = cp if isinstance(cp, int) else ord(cp)
+    i = _bisect_right(firsts, c) - 1
+    return values[i] if i >= 0 and c <= lasts[i] else None
+
+
+def classify(text: str, prop: str) -> list[str | None]:
+    """Get the value of a property for each character of a string, see `value_of`."""
+
+    firsts, lasts, values = _get_partition(_normalize(prop))
+    return [
+        values[i] if (i := _bisect_right(firsts, c) - 1) >= 0 and c <= lasts[i] else None
+        for c in map(ord, text)
+    ]
+
+
+@_lru_cache(maxsize=None)
+def _get_lookup(prop: str) -> tuple[tuple[str | None, ...], dict[str, str], str]:
+    """
+    Get the names of a property's values, the code of each value, and a table of the codes of the BMP's code points.
+
+    Codes are characters whose code point is the index of the value's name, `None` is first for characters without a
+    value. The table can be passed to `str.translate`.
+    """
+
+    firsts, lasts, values = _get_partition(prop)
+    names = (None, *sorted(set(values)))  # type: tuple[str | None, ...]
+    codes = {name: chr(i) for i, name in enumerate(names) if name is not None}
+    table = ['\x00'] * 0x10000
+    for first, last, value in zip(firsts, lasts, values, strict=True):
+        if first > 0xffff:
+            break
+        end = min(last, 0xffff) + 1
+        table[first:end] = codes[value] * (end - first)
+    return names, codes, ''.join(table)
+
+
+def classify_many(
+    strings: _Iterable[str],
+    prop: str
+) -> tuple[tuple[str | None, ...], list[bytes] | list[_array[int]]]:
+    """
+    Get the value of a property for each character of many strings, see `value_of`.
+
+    Returns the names of the property's values, with `None` first for characters without a value, and the values of each
+    string's characters as indexes into the names. Indexes are `bytes` if there are no more than 256 names, and
+    `array('H')` otherwise. Characters in the BMP are looked up in a table, others with a binary search.
+    """
+
+    norm = _normalize(prop)
+    names, codes, table = _get_lookup(norm)
+    firsts, lasts, values = _get_partition(norm)
+    wide = len(names) > 256
+
+    def astral(m: _re.Match[str]) -> str:
+        """Get the code of a character outside the BMP."""
+
+        c = ord(m.group(0))
+        i = _bisect_right(firsts, c) - 1
+        return codes[values[i]] if i >= 0 and c <= lasts[i] else '\x00'
+
+    narrow = []  # type: list[bytes]
+    wide_results = []  # type: list[_array[int]]
+    for string in strings:
+        text = string.translate(table)
+        # Only characters outside the BMP are left as they were.
+        if max(text, default='\x00') > '\uffff':
+            text = _ASTRAL.sub(astral, text)
+        if wide:
+            codes_array = _array('H')
+            codes_array.frombytes(text.encode(_UTF16))
+            wide_results.append(codes_array)
+        else:
+            narrow.append(text.encode('latin-1'))
+    return names, wide_results if wide else narrow
@@ -0,0 +1,154 @@
+"""
+Packed Unicode property tables.
+
+`tools/unipropgen.py` writes the range tables of the generated modules to one binary file. It is read through a memory
+map, and the range strings are only rendered when they are looked up, so the modules do not need to be imported.
+
+Licensed under MIT
+Copyright (c) 2011 - 2020 Isaac Muse <isaacmuse@gmail.com>
+"""
+from __future__ import annotations
+import json
+import mmap
+import os
+import struct
+from importlib import import_module
+from typing import Any, Iterator, Mapping
+
+# A header of magic, format version, padding, index size, and the offset of the ranges, then the index,
+# then one index of each table, then the code point ranges as pairs of little endian 32 bit integers.
+# The index maps each module's tables to the offset and size of their own index, which maps keys to ranges.
+# Indexes are JSON. Keep in sync with `tools/unipropgen.py`.
+PATH = os.path.join(os.path.dirname(__file__), 'unidata', 'unidata.bin')
+MAGIC = b'BRUP'
+VERSION = 1
+HEADER = struct.Struct('<4sHHII')
+
+# Characters that are escaped in range strings.
+ESCAPES = frozenset('-&[\\]^|~')
+
+_data = None  # type: tuple[mmap.mmap, dict[str, dict[str, list[int]]], int, int] | bool | None
+_modules = {}  # type: dict[str, Any]
+
+
+def _open() -> tuple[mmap.mmap, dict[str, dict[str, list[int]]], int, int] | None:
+    """
+    Map the packed tables and read their index, or return `None` if there are no usable packed tables.
+
+    Returns the map, the index, and the offsets of the tables' indexes and of the ranges.
+    """
+
+    global _data
+
+    if _data is None:
+        try:
+            with open(PATH, 'rb') as f:
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            _data = False
+        else:
+            magic, version, _, size, base = HEADER.unpack_from(buf)
+            if magic == MAGIC and version == VERSION:
+                start = HEADER.size + size
+                _data = (buf, json.loads(buf[HEADER.size:start]), start, base)
+            else:
+                _data = False
+    return _data or None  # type: ignore[return-value]
+
+
+def _fmt(value: int) -> str:
+    """Format a code point for a range string."""
+
+    c = chr(value)
+    return '\\' + c if c in ESCAPES else c
+
+
+def render(buf: mmap.mmap, base: int, offset: int, count: int) -> str:
+    """Render `count` ranges starting at range `offset` as a range string."""
+
+    values = struct.unpack_from(f'<{count * 2}I', buf, base + offset * 8)
+    return ''.join(
+        [
+            _fmt(first) if first == last else f'{_fmt(first)}-{_fmt(last)}'
+            for first, last in zip(values[::2], values[1::2], strict=True)
+        ]
+    )
+
+
+class Table(Mapping[str, Any]):
+    """A read only table of range strings, or of nested tables, that renders its values on lookup."""
+
+    __slots__ = ('_buf', '_index', '_base')
+
+    def __init__(self, buf: mmap.mmap, index: dict[str, Any], base: int) -> None:
+        """Initialize."""
+
+        self._buf = buf
+        self._index = index
+        self._base = base
+
+    def __getitem__(self, key: str) -> Any:
+        """Get a range string or nested table."""
+
+        entry = self._index[key]
+        if isinstance(entry, dict):
+            return Table(self._buf, entry, self._base)
+        return render(self._buf, self._base, *entry)
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate the keys."""
+
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        """Get the number of keys."""
+
+        return len(self._index)
+
+
+class Tables:
+    """The packed tables of a module, each table's index is only read when the table is first used."""
+
+    __slots__ = ('_buf', '_index', '_start', '_base', '_tables')
+
+    def __init__(self, buf: mmap.mmap, index: dict[str, list[int]], start: int, base: int) -> None:
+        """Initialize."""
+
+        self._buf = buf
+        self._index = index
+        self._start = start
+        self._base = base
+        self._tables = {}  # type: dict[str, Table]
+
+    def __getattr__(self, name: str) -> Table:
+        """Get a table by name."""
+
+        table = self._tables.get(name)
+        if table is None:
+            try:
+                offset, size = self._index[name]
+            except KeyError:
+                raise AttributeError(name) from None
+            offset += self._start
+            table = Table(self._buf, json.loads(self._buf[offset:offset + size]), self._base)
+            self._tables[name] = table
+        return table
+
+
+def load(name: str) -> Any:
+    """
+    Get the tables of a generated module by name.
+
+    Tables are read from the packed file when it is available and holds the module, otherwise the module is imported.
+    """
+
+    module = _modules.get(name)
+    if module is None:
+        data = _open()
+        if data is None or name not in data[1]:
+            module = import_module(f'.unidata.{name}', __package__)
+        else:
+            buf, index, start, base = data
+            module = Tables(buf, index[name], start, base)
+        _modules[name] = module
+    return module
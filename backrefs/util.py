@@ -5,9 +5,10 @@ Licensed under MIT
 Copyright (c) 2015 - 2020 Isaac Muse <isaacmuse@gmail.com>
 """
 from __future__ import annotations
+import operator
 import warnings
 import sys
-from typing import Any, Callable, AnyStr
+from typing import Any, Callable, AnyStr, Pattern
 
 PY311 = (3, 11) <= sys.version_info
 PY312 = (3, 12) <= sys.version_info
@@ -36,7 +37,13 @@ class StringIter:
     def __next__(self) -> str:
         """Python 3 iterator compatible next."""
 
-        return self.iternext()
+        try:
+            char = self._string[self._index]
+            self._index += 1
+        except IndexError as e:
+            raise StopIteration from e
+
+        return char
 
     @property
     def index(self) -> int:
@@ -52,6 +59,15 @@ class StringIter:
 
         self._index -= count
 
+    def match(self, pattern: Pattern[str]) -> str:
+        """Consume and return the text matched by the pattern at the current index."""
+
+        m = pattern.match(self._string, self._index)
+        if m is None:
+            return ''
+        self._index = m.end()
+        return m.group(0)
+
     def iternext(self) -> str:
         """Iterate through characters of the string."""
 
@@ -136,6 +152,81 @@ def format_captures(
     return converter(capture)
 
 
+def _assert_string_spec(capture: Any) -> Any:
+    """Reject objects that do not support the 's' format type."""
+
+    # Integers and floats don't have an explicit 's' format type.
+    if isinstance(capture, int):  # pragma: no cover
+        raise ValueError("Unknown format code 's' for object of type 'int'")
+    if isinstance(capture, float):  # pragma: no cover
+        raise ValueError("Unknown format code 's' for object of type 'float'")
+    return capture
+
+
+def compile_format(
+    formatting: tuple[tuple[int, Any], ...],
+    converter: Callable[[Any], AnyStr],
+    default: AnyStr
+) -> Callable[[list[AnyStr]], AnyStr]:
+    """
+    Compile the format operations of a replace group into a function that formats a set of captures.
+
+    The result is equivalent to `format_captures`, but the operations are only interpreted once.
+    """
+
+    ops = []  # type: list[Callable[[Any], Any]]
+    for fmt_type, value in formatting[1:]:
+        if fmt_type == FMT_ATTR:
+            # Attribute
+            ops.append(operator.attrgetter(value))
+        elif fmt_type == FMT_INDEX:
+            # Index
+            if value is not None:
+                ops.append(operator.itemgetter(value))
+            else:
+                ops.append(lambda capture: capture[0] if capture else default)
+        elif fmt_type == FMT_CONV:
+            # Conversion
+            if value == 'a':
+                ops.append(ascii)
+            elif value == 'r':
+                ops.append(repr)
+            elif value == 's':
+                # If the object is not string or byte string already
+                ops.append(str)
+        elif fmt_type == FMT_SPEC:
+            if value[3] and value[3] == 's':
+                ops.append(_assert_string_spec)
+
+            # Ensure object is a byte string
+            ops.append(converter)
+
+            spec_type = value[1]
+            if spec_type == '^':
+                ops.append(operator.methodcaller('center', value[2], value[0]))
+            elif spec_type == ">":
+                ops.append(operator.methodcaller('rjust', value[2], value[0]))
+            else:
+                ops.append(operator.methodcaller('ljust', value[2], value[0]))
+
+    if not ops:
+        return converter
+    if len(ops) == 1:
+        op = ops[0]
+        return lambda captures: converter(op(captures))
+
+    def apply(captures: list[AnyStr]) -> AnyStr:
+        """Apply the format operations."""
+
+        capture = captures  # type: Any
+        for op in ops:
+            capture = op(capture)
+        # Make sure the final object is a byte string
+        return converter(capture)
+
+    return apply
+
+
 class Immutable:
     """Immutable."""
 
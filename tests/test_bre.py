@@ -2,12 +2,21 @@
 """Test `bre` lib."""
 import unittest
 from backrefs import bre
+from backrefs import _stream
 import re
 import sys
 import pytest
 import random
 from backrefs import _bre_parse
 import copy
+from backrefs import util
+import gc
+import weakref
+import os
+import pickle
+import tempfile
+import io
+from unittest import mock
 
 PY39_PLUS = (3, 9) <= sys.version_info
 PY311_PLUS = (3, 11) <= sys.version_info
@@ -150,6 +159,70 @@ class TestSearchTemplate(unittest.TestCase):
 
         self.assertTrue(bre.compile(r'[[:^xdigit:]]').match('i') is not None)
 
+    def test_set_operations(self):
+        """Test intersection and difference of character classes."""
+
+        self.assertEqual(
+            bre.findall(r'[\p{L}&&\p{Greek}]+', 'ab\u03b1\u03b21\u03a9', bre.SETOPS),
+            ['\u03b1\u03b2', '\u03a9']
+        )
+        self.assertEqual(bre.findall(r'[\p{L}--\p{Lu}]+', 'ABcd\xc9\xe9', bre.SETOPS), ['cd', '\xe9'])
+        self.assertEqual(bre.findall(r'[a-z--aeiou]+', 'hello', bre.SETOPS), ['h', 'll'])
+        self.assertEqual(bre.findall(r'[^a-z--aeiou]+', 'aebcd', bre.SETOPS), ['ae'])
+        self.assertEqual(bre.findall(r'[\w--\d]+', 'ab12\xe9', bre.SETOPS), ['ab', '\xe9'])
+        self.assertEqual(bre.findall(r'(?a)[\w--\d]+', 'ab12\xe9', bre.SETOPS), ['ab'])
+        self.assertEqual(bre.findall(br'[\w--\d]+', b'ab12\xe9', bre.SETOPS), [b'ab'])
+        self.assertEqual(bre.findall(r'[\p{L}&&\p{Greek}&&[:^upper:]]', '\u03b1\u03a9', bre.SETOPS), ['\u03b1'])
+        self.assertEqual(bre.findall(r'[\p{L}--a-z--A-Z]', 'aZ\xe9', bre.SETOPS), ['\xe9'])
+        self.assertEqual(bre.findall(r'(?i)[a-z--aeiou]+', 'hEllo', bre.SETOPS), ['h', 'll'])
+
+        # A hyphen that ends an operand is not escaped again before a property in the next one.
+        self.assertEqual(bre.findall(r'[\-&&\P{L}]', '-\\a', bre.SETOPS), ['-'])
+        self.assertEqual(bre.findall(r'[\---\p{L}]', '-\\a', bre.SETOPS), ['-'])
+        self.assertEqual(bre.findall(r'[\-&&[:punct:]]', '-\\a', bre.SETOPS), ['-'])
+
+        # Empty results match nothing, or everything when negated.
+        self.assertIsNone(bre.search(r'[a&&b]', 'ab', bre.SETOPS))
+        self.assertIsNotNone(bre.search(r'[^a&&b]', 'a', bre.SETOPS))
+
+        # Operators without an operand on both sides are literal.
+        self.assertEqual(bre.compile_search(r'[\--\-]', bre.SETOPS).pattern, r'[\--\-]')
+        with pytest.warns(FutureWarning):
+            self.assertEqual(bre.findall(r'[a&&]', 'a&', bre.SETOPS), ['a', '&'])
+        self.assertEqual(bre.findall(r'[--a]', '-a', bre.SETOPS), ['-', 'a'])
+
+    def test_set_operations_opt_in(self):
+        """Test that set operators keep their legacy meaning unless enabled."""
+
+        text = '+,-./!ab&'
+        with pytest.warns(FutureWarning):
+            self.assertEqual(bre.findall(r'[+--/]', text), ['+', ',', '-', '/'])
+        with pytest.warns(FutureWarning):
+            self.assertEqual(bre.findall(r'[!--/]+', text), ['+,-', '/!', '&'])
+        with pytest.warns(FutureWarning):
+            self.assertEqual(bre.findall(r'[a&&b]', text), ['a', 'b', '&'])
+        self.assertEqual(
+            bre.compile_search(r'[\p{Greek}--\p{Lu}]').pattern,
+            bre.compile_search(r'[\p{Greek}\--\p{Lu}]').pattern
+        )
+
+        # With set operations, the same patterns are evaluated.
+        self.assertEqual(bre.findall(r'[+--/]', text, bre.SETOPS), ['+'])
+        self.assertIsNone(bre.search(r'[a&&b]', text, bre.SETOPS))
+        self.assertEqual(bre.compile(r'[a-z--aeiou]', bre.SETOPS).flags, bre.compile(r'[a-z]').flags)
+
+        # A class that is not closed keeps its operators.
+        self.assertEqual(_bre_parse._SearchParser('[a&&b--c', re_setops=True).parse(), '[a&&b--c')
+
+    def test_set_operations_bytes_escapes(self):
+        """Test that operands of byte string patterns follow the escape rules of byte string patterns."""
+
+        self.assertEqual(bre.findall(rb'[\x41-\x43&&B-Z]', b'ABC', bre.SETOPS), [b'B', b'C'])
+        with pytest.raises(re.error):
+            bre.compile(rb'[\u0041&&A]', bre.SETOPS)
+        with pytest.raises(re.error):
+            bre.compile(rb'[\U00000041--B]', bre.SETOPS)
+
     def test_posix_property_bad_syntax(self):
         """Test that we ignore an incomplete POSIX syntax."""
 
@@ -235,6 +308,296 @@ class TestSearchTemplate(unittest.TestCase):
         self.assertEqual(bre._get_cache_size(True), 0)
         self.assertEqual(len(re._cache), 0)
 
+    def test_cache_info(self):
+        """Test cache statistics and resizing."""
+
+        bre.purge()
+        try:
+            bre.compile_search(r'\p{Greek}')
+            bre.compile_search(r'\p{Greek}')
+            info = bre.cache_info()
+            self.assertEqual((info.hits, info.misses, info.evictions, info.currsize), (1, 1, 0, 1))
+            self.assertEqual(info.policy, bre.CACHE_LRU)
+            self.assertTrue(info.parse_time > 0)
+
+            bre.set_cache_size(2)
+            for pattern in ('a', 'b', 'c'):
+                bre.compile_search(pattern)
+            info = bre.cache_info()
+            self.assertEqual((info.maxsize, info.currsize, info.evictions), (2, 2, 2))
+
+            bre.set_cache_size(0)
+            self.assertEqual(bre._get_cache_size(), 0)
+            bre.compile_search('d')
+            self.assertEqual(bre._get_cache_size(), 0)
+
+            bre.compile(r'(\w+)').sub(r'\C\1', 'test')
+            self.assertEqual(bre.cache_info(True).currsize, 1)
+
+            with pytest.raises(ValueError):
+                bre.set_cache_size(-1)
+            with pytest.raises(ValueError):
+                bre.set_cache_policy('fifo')
+        finally:
+            bre.set_cache_size(bre._MAXCACHE)
+            bre.purge()
+
+    def test_cache_lfu(self):
+        """Test least frequently used cache policy."""
+
+        bre.purge()
+        try:
+            bre.set_cache_policy(bre.CACHE_LFU)
+            bre.set_cache_size(2)
+            for pattern in ('a', 'a', 'a', 'b', 'c'):
+                bre.compile_search(pattern)
+            self.assertEqual(bre.cache_info().evictions, 1)
+
+            # `b` was used least and evicted, `a` and `c` remain.
+            hits = bre.cache_info().hits
+            bre.compile_search('a')
+            bre.compile_search('c')
+            self.assertEqual(bre.cache_info().hits, hits + 2)
+            bre.compile_search('b')
+            self.assertEqual(bre.cache_info().hits, hits + 2)
+
+            # Switching policies keeps entries.
+            bre.set_cache_policy(bre.CACHE_LRU)
+            self.assertEqual(bre.cache_info().currsize, 2)
+        finally:
+            bre.set_cache_policy(bre.CACHE_LRU)
+            bre.set_cache_size(bre._MAXCACHE)
+            bre.purge()
+
+    def test_compile_cache(self):
+        """Test that compiled objects are cached."""
+
+        bre.purge()
+        try:
+            pattern = bre.compile(r'\p{Greek}+')
+            self.assertTrue(bre.compile(r'\p{Greek}+') is pattern)
+            self.assertTrue(bre.compile(r'\p{Greek}+', bre.I) is not pattern)
+            self.assertTrue(bre.compile(r'\p{Greek}+', auto_compile=False) is not pattern)
+
+            # Module level helpers use the cached object instead of compiling again.
+            with mock.patch.object(bre, 'compile_search', side_effect=AssertionError):
+                self.assertEqual(bre.search(r'\p{Greek}+', 'abc αβγ').group(0), 'αβγ')
+                self.assertEqual(bre.sub(r'\p{Greek}+', r'\C\g<0>', 'abc αβγ'), 'abc ΑΒΓ')
+                self.assertEqual(bre.split(r'\p{Greek}+', 'a αβ b'), ['a ', ' b'])
+
+            info = bre.cache_info(compiled=True)
+            self.assertEqual((info.hits, info.misses, info.currsize), (4, 3, 3))
+            self.assertTrue(info.parse_time > 0)
+            with pytest.raises(ValueError):
+                bre.cache_info(True, compiled=True)
+
+            bre.purge()
+            self.assertTrue(bre.compile(r'\p{Greek}+') is not pattern)
+        finally:
+            bre.purge()
+
+    def test_replace_cache_weak(self):
+        """Test that the replace cache does not keep patterns alive."""
+
+        bre.purge()
+        try:
+            pattern = re.compile(r'(\w+)')
+            ref = weakref.ref(pattern)
+            replace = bre.compile_replace(pattern, r'\C\1')
+            self.assertTrue(bre.compile_replace(pattern, r'\C\1') is replace)
+            self.assertEqual(pattern.sub(replace, 'test'), 'TEST')
+            bre.compile_replace(pattern, r'\1')
+            bre.compile_replace(pattern, r'\L\1')
+            info = bre.cache_info(True)
+            self.assertEqual(info.currsize, 3)
+            self.assertTrue(info.memory > 0)
+
+            del pattern
+            re.purge()
+            gc.collect()
+            self.assertTrue(ref() is None)
+            self.assertEqual(bre.cache_info(True).currsize, 0)
+        finally:
+            bre.purge()
+
+    def test_compile_many(self):
+        """Test compiling many patterns with a process pool."""
+
+        patterns = [r'\p{Greek}+', r'\p{Cyrillic}+', r'[[:alpha:]]\R', r'\p{Greek}+', b'\\d+']
+        bre.purge()
+        try:
+            compiled = bre.compile_many(patterns, bre.I, workers=2)
+            self.assertEqual(len(compiled), len(patterns))
+            self.assertTrue(compiled[0] is compiled[3])
+            self.assertEqual(bre.cache_info().currsize, 4)
+            with mock.patch.object(_bre_parse._SearchParser, 'parse', side_effect=AssertionError):
+                for pattern, obj in zip(patterns, compiled, strict=True):
+                    self.assertTrue(bre.compile(pattern, bre.I) is obj)
+                    self.assertEqual(obj.flags & bre.I, bre.I)
+
+            bre.purge()
+            serial = bre.compile_many(patterns, bre.I, workers=1)
+            self.assertEqual([p.pattern for p in serial], [p.pattern for p in compiled])
+
+            # Patterns are not preprocessed again when there are more than the search cache holds.
+            bre.set_cache_size(2)
+            for workers in (1, 2):
+                bre.purge()
+                many = bre.compile_many(patterns, bre.I, workers=workers)
+                self.assertEqual([p.pattern for p in many], [p.pattern for p in compiled])
+                self.assertEqual(bre.cache_info().misses, 4)
+
+            with pytest.raises(ValueError):
+                bre.compile_many([r'\p{Greek}', r'\p{bad}'], workers=2)
+        finally:
+            bre.set_cache_size(bre._MAXCACHE)
+            bre.purge()
+
+    def test_bundle(self):
+        """Test exporting and importing a bundle of patterns and templates."""
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'patterns.bundle')
+            bre.purge()
+            try:
+                pattern = bre.compile(r'(\p{Greek}+) (?P<word>\w+)')
+                pattern.sub(r'\C\1\E \g<word>', 'αβγ test')
+                pattern.subf(r'{word} {1}', 'αβγ test')
+                bre.compile_search(r'[[:upper:]]')
+                bre.dump_bundle(path)
+
+                bre.purge()
+                with mock.patch.object(_bre_parse._SearchParser, 'parse', side_effect=AssertionError), \
+                        mock.patch.object(_bre_parse._ReplaceParser, 'parse', side_effect=AssertionError):
+                    loaded = bre.load_bundle(path)
+                    self.assertEqual([(p.pattern, p.flags) for p in loaded], [(pattern.pattern, pattern.flags)])
+                    self.assertTrue(bre.compile(r'(\p{Greek}+) (?P<word>\w+)') is loaded[0])
+                    self.assertEqual(loaded[0].sub(r'\C\1\E \g<word>', 'αβγ test'), 'ΑΒΓ test')
+                    self.assertEqual(loaded[0].subf(r'{word} {1}', 'αβγ test'), 'test αβγ')
+                    replace = bre.compile_replace(loaded[0]._pattern, r'\C\1\E \g<word>')
+                    self.assertEqual(replace.pattern_hash, hash(loaded[0]._pattern))
+                    bre.compile_search(r'[[:upper:]]')
+            finally:
+                bre.purge()
+
+    def test_bundle_mismatch(self):
+        """Test that bundles from a different environment are rejected."""
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'patterns.bundle')
+            with open(path, 'wb') as f:
+                pickle.dump(((1, 'bre', '0.0.0', '0.0.0', (0, 0)), {'search': [], 'compile': [], 'replace': []}), f)
+            with pytest.raises(ValueError):
+                bre.load_bundle(path)
+
+    def test_plain_pattern_fast_path(self):
+        """Test that patterns without extended syntax are returned as is."""
+
+        with mock.patch.object(_bre_parse._SearchParser, 'main_group', side_effect=AssertionError):
+            self.assertEqual(_bre_parse._SearchParser(r'(?i:\w+) [a-z]+').parse(), r'(?i:\w+) [a-z]+')
+            self.assertEqual(_bre_parse._SearchParser(rb'(\d+)\s*[^\]]').parse(), rb'(\d+)\s*[^\]]')
+
+    def test_plain_pattern_fast_path_differential(self):
+        """Test that the fast path matches the full parser on random patterns."""
+
+        def outcome(func, *args):
+            try:
+                return func(*args)
+            except Exception as e:
+                return type(e)
+
+        rng = random.Random(0)
+        alphabet = '\\[]()?#:^-apLxu{}\nRQE V10emiPNXcls'
+        for _ in range(1500):
+            text = ''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 16)))
+            for verbose in (False, True):
+                for option in (None, True, False):
+                    parser = _bre_parse._SearchParser(text, verbose, option)
+                    self.assertEqual(outcome(parser.parse), outcome(parser._parse, text), repr(text))
+
+    def test_run_scanning_differential(self):
+        """Test that skipping runs of plain characters gives the same result as stepping over each character."""
+
+        def outcome(text, verbose, option, setops, is_bytes):
+            search = text.encode('latin-1') if is_bytes else text
+            try:
+                return _bre_parse._SearchParser(search, verbose, option, setops)._parse(text)
+            except Exception as e:
+                return type(e)
+
+        def char_by_char(*args):
+            never = re.compile('(?!)')
+            with mock.patch.multiple(
+                _bre_parse._SearchParser,
+                _plain_quote=never,
+                _plain_comment=never,
+                _plain_class=(never, never),
+                _plain=(never, never),
+                _plain_group=(never, never)
+            ):
+                return outcome(*args)
+
+        patterns = [
+            'ab\\Q(a)#"\'\\E[^-a]c',
+            'a # c(\n)b\\(d',
+            '(?x)a#[\n(b) \\# e',
+            '[a-z\\]\\[#(]-\\p{L}]x',
+            '(?-x:a #b)#c\n(d',
+            '"a\\Q\\\\E"\\Q[(#\n',
+            '\\Qa\\E\\Q',
+            '[a-z&&b-y--c][\\p{L}--a&&'
+        ]
+        rng = random.Random(0)
+        alphabet = '\\[]()#"\'\n aQEpL{}^-&?x:ecR'
+        patterns.extend(''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 20))) for _ in range(1000))
+        for text in patterns:
+            for verbose in (False, True):
+                for option in (None, True, False):
+                    for setops in (False, True):
+                        for is_bytes in (False, True):
+                            args = (text, verbose, option, setops, is_bytes)
+                            self.assertEqual(outcome(*args), char_by_char(*args), repr(args))
+
+    def test_disk_cache(self):
+        """Test that preprocessed patterns are persisted and reloaded from disk."""
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'search.cache')
+            try:
+                bre.purge()
+                bre.set_disk_cache(path)
+                pattern = bre.compile_search(r'\p{Greek}\R')
+                bre.save_disk_cache()
+                self.assertTrue(os.path.exists(path))
+
+                bre.purge()
+                bre.set_disk_cache(path)
+                with mock.patch.object(_bre_parse._SearchParser, 'parse', side_effect=AssertionError):
+                    self.assertEqual(bre.compile_search(r'\p{Greek}\R').pattern, pattern.pattern)
+            finally:
+                bre.set_disk_cache(None)
+                bre.purge()
+
+    def test_disk_cache_mismatch(self):
+        """Test that entries from a different environment are discarded."""
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'search.cache')
+            with open(path, 'wb') as f:
+                pickle.dump((('bre', '0.0.0', '0.0.0', (0, 0)), {(r'\R', 0, 0): 'bad'}), f)
+            try:
+                bre.purge()
+                bre.set_disk_cache(path)
+                self.assertTrue(bre.compile_search(r'\R').pattern != 'bad')
+                bre.save_disk_cache()
+                with open(path, 'rb') as f:
+                    signature, entries = pickle.load(f)
+                self.assertEqual(signature[0], 'bre')
+                self.assertTrue('bad' not in entries.values())
+            finally:
+                bre.set_disk_cache(None)
+                bre.purge()
+
     def test_infinite_loop_catch(self):
         """Test infinite loop catch."""
 
@@ -244,6 +607,35 @@ class TestSearchTemplate(unittest.TestCase):
         with pytest.raises(_bre_parse.LoopException):
             bre.compile_search(r'(?-x:(?x))', re.VERBOSE)
 
+    def test_global_flags_resolve_once(self):
+        """Test that properties are only resolved in the pass that settles on the global flags."""
+
+        get = _bre_parse._uniprops.get_unicode_property
+        with mock.patch.object(_bre_parse._uniprops, 'get_unicode_property', side_effect=get) as m:
+            pattern = _bre_parse._SearchParser(r'\p{Greek} [\p{Lu}] (?a)(?x)').parse()
+        self.assertEqual(m.call_count, 2)
+        self.assertEqual(pattern, _bre_parse._SearchParser(r'\p{Greek} [\p{Lu}] (?a)(?x)', True, False).parse())
+
+        # Flags that change nothing do not cause an extra pass.
+        with mock.patch.object(_bre_parse._uniprops, 'get_unicode_property', side_effect=get) as m:
+            _bre_parse._SearchParser(r'\p{Greek}(?x)', True).parse()
+        self.assertEqual(m.call_count, 1)
+
+    def test_global_flags_errors(self):
+        """Test that errors found while settling global flags are reported as usual."""
+
+        with pytest.raises(SyntaxError, match="Invalid Unicode property character"):
+            bre.compile_search(r'\p{Greek(?x)')
+
+        with pytest.raises(SyntaxError, match="Missing or unmatched"):
+            bre.compile_search(r'(?x)\p{Greek')
+
+        with pytest.raises(SyntaxError, match="Unmatched"):
+            bre.compile_search(r'\N{LATIN SMALL LETTER A(?a)')
+
+        with pytest.raises(ValueError):
+            bre.compile_search(r'(?x)\p{NotAProperty}')
+
     def test_unicode_ascii_swap(self):
         """Test Unicode ASCII swapping."""
 
@@ -870,6 +1262,96 @@ class TestReplaceTemplate(unittest.TestCase):
 
         self.assertEqual(bre.compile(r'(test)|(what)').sub(r'\2', 'test'), '')
 
+    def test_engine_template(self):
+        """Test that plain templates are expanded by the regular expression engine."""
+
+        pattern = bre.compile(r'(\w+)@(?P<host>\w+)')
+        replace = pattern.compile(r'\g<host>\\\1\x41\E')
+        self.assertEqual(replace._template, '\\g<2>\\\\\\g<1>A')
+        self.assertTrue(pattern.compile(r'\C\1\E')._template is None)
+        self.assertTrue(pattern.compile(r'\c\1')._template is None)
+        self.assertTrue(pattern.compile(r'{1}', bre.FORMAT)._template is None)
+
+        with mock.patch.object(bre.ReplaceTemplate, 'expand', side_effect=AssertionError):
+            self.assertEqual(pattern.sub(replace, 'me@host'), 'host\\meA')
+            self.assertEqual(pattern.subn(replace, 'me@host'), ('host\\meA', 1))
+            self.assertEqual(bre.sub(r'(\w+)@(\w+)', r'\2\\\1', 'me@host'), 'host\\me')
+            self.assertEqual(bre.subn(r'(\w+)@(\w+)', r'\2\\\1', 'me@host'), ('host\\me', 1))
+
+        bpattern = bre.compile(br'(\w+)@(\w+)')
+        replace = bpattern.compile(br'\2\xff\\\1')
+        self.assertEqual(replace._template, b'\\g<2>\xff\\\\\\g<1>')
+        self.assertEqual(bpattern.sub(replace, b'me@host'), b'host\xff\\me')
+
+    def test_codegen(self):
+        """Test templates that expand with a generated function."""
+
+        pattern = bre.compile(r'(\w)(\w)?(?P<x>\w+)')
+        bpattern = bre.compile(br'(\w)(\w)?(?P<x>\w+)')
+        for obj, template, flags, string in (
+            (pattern, r'\3\c\1\L\g<x>\E-\2\\', 0, 'abc de f'),
+            (pattern, r'{x}\c{1!s}\L{2:>2}\E{0[0]}{{', bre.FORMAT, 'abc de f'),
+            (bpattern, br'\C\1\E\2', 0, b'abc de f')
+        ):
+            expected = obj.compile(template, flags)
+            replace = obj.compile(template, flags | bre.CODEGEN)
+            self.assertTrue(replace.use_codegen)
+            self.assertNotEqual(replace, expected)
+            self.assertEqual(replace.pattern_hash, expected.pattern_hash)
+            sub = obj.subf if flags else obj.sub
+            self.assertEqual(sub(replace, string), sub(expected, string))
+
+            copied = pickle.loads(pickle.dumps(replace))
+            self.assertEqual(copied, replace)
+            self.assertEqual(hash(copied), hash(replace))
+            self.assertEqual(sub(copied, string), sub(expected, string))
+
+        with self.assertRaises(TypeError):
+            bpattern.compile(br'\1', bre.CODEGEN)(bre.compile_search(r'(\w)').match('a'))
+
+        with self.assertRaises(ValueError):
+            bpattern.compile(br'\1', bre.CODEGEN).expand(None)
+
+    def test_compiled_format(self):
+        """Test that compiled format operations match interpreting them."""
+
+        pattern = bre.compile(r'(?P<lvl>\w+) (?P<mod>\w+)')
+        for template in (
+            r'[{lvl:^7}] {mod!r:>10}', r'{0[0]!a:_<4}{lvl.__class__.__name__}', r'{mod[-1]}{1!s}{2:*>3s}', r'{lvl!r:3}'
+        ):
+            replace = pattern.compile(template, bre.FORMAT)
+            m = pattern.match('INFO core')
+            for group, (_, (_, _, capture)) in zip(replace.groups, replace.group_slots, strict=True):
+                captures = [m.group(group[1])]
+                self.assertEqual(
+                    util.compile_format(capture, util._to_str, '')(captures),
+                    util.format_captures(captures, capture, util._to_str, '')
+                )
+            self.assertEqual(pattern.subf(replace, 'INFO core'), pattern.subf(template, 'INFO core'))
+
+    def test_bytes_span_case(self):
+        """Test that byte case spans only convert ASCII letters, and Unicode spans convert each character."""
+
+        pattern = bre.compile(br'(\w+)')
+        replace = pattern.compile(b'\\Cab\xe9\xff\xb5 cd\\1\\E-\\Lx\xc9Y\\x41\\E')
+        self.assertEqual(replace.literals[0], b'AB\xe9\xff\xb5 CD')
+        self.assertEqual(pattern.sub(replace, b'w'), b'AB\xe9\xff\xb5 CDW-x\xc9ya')
+
+        # Unicode templates convert each character on its own, so a final sigma is not a special case.
+        self.assertEqual(bre.sub('x', '\\L\u039f\u0394\u039f\u03a3\\E', 'x'), '\u03bf\u03b4\u03bf\u03c3')
+
+    def test_many_group_slots(self):
+        """Test expanding a template with many group references and case changes."""
+
+        pattern = bre.compile(r'(\w)(\w)(\w)')
+        replace = pattern.compile(r'\3\c\1\L\2\E-\C\1\3\E' * 5 + r'{\2}')
+        expected = 'cAb-AC' * 5 + '{b}'
+        self.assertEqual(pattern.sub(replace, 'abc'), expected)
+        self.assertEqual(pattern.sub(pickle.loads(pickle.dumps(replace)), 'abc'), expected)
+
+        replace = pattern.compile(r'{3}\c{1!s}\L{2:>2}\E' * 5, bre.FORMAT)
+        self.assertEqual(pattern.subf(replace, 'abc'), 'cA b' * 5)
+
     def test_hash(self):
         """Test hashing of replace."""
 
@@ -2427,6 +2909,254 @@ class TestConvenienceFunctions(unittest.TestCase):
             ('This is a test for subfn! This is a test for subfn!', 2)
         )
 
+    def test_sub_stream(self):
+        """Test that `sub_stream` matches `subn` regardless of how the input is chunked."""
+
+        text = 'xxbab\nxa\n' * 50 + 'ax'
+        for pattern, repl in ((r'(?m)^(\w)', r'[\C\1\E]'), (r'x*?', '-'), (r'(?<=b)a|\bx+', r'\g<0>!'), (r'$', '$')):
+            expected = bre.subn(pattern, repl, text)
+            for size in (1, 3, 7):
+                chunks = [text[i:i + size] for i in range(0, len(text), size)]
+                sink = io.StringIO()
+                count = bre.sub_stream(pattern, repl, chunks, sink, chunk_size=size, overlap=4)
+                self.assertEqual((sink.getvalue(), count), expected)
+
+        sink = io.StringIO()
+        self.assertEqual(bre.sub_stream(r'b', 'B', io.StringIO(text), sink, 3, chunk_size=2), 3)
+        self.assertEqual(sink.getvalue(), bre.sub(r'b', 'B', text, 3))
+
+        sink = io.BytesIO()
+        p = bre.compile(br'(\w)(\w)')
+        self.assertEqual(p.sub_stream(b'\\2\\1', io.BytesIO(text.encode()), sink, chunk_size=5), 151)
+        self.assertEqual(sink.getvalue(), p.sub(b'\\2\\1', text.encode()))
+
+    def test_sub_stream_lines(self):
+        """Test that `sub_stream` can search complete lines at a time."""
+
+        text = 'first line\nsecond line\n\nlast'
+        sink = io.StringIO()
+        self.assertEqual(
+            bre.sub_stream(
+                r'(?m)^(\w+)(.*)$', r'\2 \1', iter(text.splitlines(True)), sink, chunk_size=1, lines=True
+            ),
+            3
+        )
+        self.assertEqual(sink.getvalue(), ' line first\n line second\n\n last')
+
+        # Anchors and lookaheads at a line break see the text after it.
+        text = '\nb\n ba\n' * 5
+        for pattern in (r'b$', r'b(?=\na)', r'b\Z'):
+            expected = bre.subn(pattern, 'X', text)
+            for size in (1, 4):
+                chunks = [text[i:i + size] for i in range(0, len(text), size)]
+                sink = io.StringIO()
+                count = bre.sub_stream(pattern, 'X', chunks, sink, chunk_size=size, overlap=3, lines=True)
+                self.assertEqual((sink.getvalue(), count), expected)
+
+        # Without line breaks, the text is still written as it is read.
+        sink = io.StringIO()
+        lag = []
+
+        def source():
+            for i in range(100):
+                lag.append(i * 5 - len(sink.getvalue()))
+                yield 'abcde'
+
+        self.assertEqual(bre.sub_stream('c', 'C', source(), sink, chunk_size=10, overlap=4, lines=True), 100)
+        self.assertEqual(sink.getvalue(), 'abCde' * 100)
+        self.assertLess(max(lag), 20)
+
+    def test_subf_stream(self):
+        """Test that `subf_stream` works."""
+
+        text = 'This is a tset for subf! ' * 20
+        sink = io.StringIO()
+        p = bre.compile(r'(t)(s)(e)(t)')
+        replace = p.compile('{1}{3}{2}{4!r:>6}', bre.FORMAT)
+        self.assertEqual(p.subf_stream(replace, io.StringIO(text), sink, chunk_size=8, overlap=4), 20)
+        self.assertEqual(sink.getvalue(), p.subf(replace, text))
+
+        with pytest.raises(ValueError):
+            p.sub_stream(replace, [text], io.StringIO())
+
+        with pytest.raises(ValueError):
+            bre.sub_stream(r'a', '-', ['a'], io.StringIO(), overlap=0)
+
+    def test_file_search(self):
+        """Test searching files through a memory map."""
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'data.bin')
+            with open(path, 'wb') as f:
+                f.write(b'abc foo123 bar\nfoo9\xff\n')
+
+            p = bre.compile(br'foo(\d+)')
+            self.assertEqual(
+                [(m.span(), m.group(1)) for m in p.finditer_file(path)],
+                [((4, 10), b'123'), ((15, 19), b'9')]
+            )
+            m = p.search_file(path, 5)
+            self.assertEqual((m.start(), m.group(0)), (15, b'foo9'))
+            # Release the map so the file can be removed on Windows.
+            del m
+
+            empty = os.path.join(tmp, 'empty.bin')
+            open(empty, 'wb').close()
+            self.assertIsNone(p.search_file(empty))
+
+            with pytest.raises(TypeError):
+                bre.compile(r'foo').search_file(path)
+
+            # Maps are closed once iteration ends, or if nothing is found.
+            map_file = _stream.map_file
+            maps = []
+            with mock.patch.object(_stream, 'map_file', lambda *args: maps.append(map_file(*args)) or maps[-1]):
+                self.assertEqual([m.group(1) for m in p.finditer_file(path)], [b'123', b'9'])
+                self.assertIsNone(p.search_file(path, 16))
+            self.assertTrue(all(buf.closed for buf in maps))
+
+    def test_sub_file(self):
+        """Test substituting files through a memory map."""
+
+        with tempfile.TemporaryDirectory() as tmp:
+            src = os.path.join(tmp, 'src.bin')
+            dest = os.path.join(tmp, 'dest.bin')
+            data = b'abc foo123 bar\nfoo9\xff\n' * 10
+            with open(src, 'wb') as f:
+                f.write(data)
+
+            p = bre.compile(br'(?P<name>[a-z]+)(\d+)')
+            for repl, count in ((br'\C\g<name>\E=\2', 0), (br'[\1]', 3), (lambda m: m.group(2), 1)):
+                self.assertEqual(p.sub_file(repl, src, dest, count), p.subn(repl, data, count)[1])
+                with open(dest, 'rb') as f:
+                    self.assertEqual(f.read(), p.sub(repl, data, count))
+
+            map_file = _stream.map_file
+            maps = []
+            with mock.patch.object(_stream, 'map_file', lambda *args: maps.append(map_file(*args)) or maps[-1]):
+                p.sub_file(b'x', src, dest)
+            self.assertTrue(maps[0].closed)
+
+            # The source is not mapped if it cannot be written to.
+            with mock.patch.object(_stream, 'map_file', side_effect=AssertionError), pytest.raises(ValueError):
+                p.sub_file(b'x', src, src)
+
+    def test_sub_into(self):
+        """Test writing substitutions into a writer piece by piece."""
+
+        text = 'abc foo123 bar\nfoo9 ' * 5
+        p = bre.compile(r'(?P<name>[a-z]+)(\d+)')
+        for flags in (0, bre.CODEGEN):
+            for repl, count in ((r'\C\g<name>\E=\2', 0), (r'[\1]', 3), (lambda m: m.group(2), 1)):
+                if not callable(repl):
+                    repl = p.compile(repl, flags)
+                out = io.StringIO()
+                self.assertEqual(p.sub_into(out, repl, text, count), p.subn(repl, text, count)[1])
+                self.assertEqual(out.getvalue(), p.sub(repl, text, count))
+
+            out = io.BytesIO()
+            pb = bre.compile(br'(\w+)(\d)')
+            self.assertEqual(pb.sub_into(out, pb.compile(br'\C\1\E\2', flags), text.encode('ascii')), 10)
+            self.assertEqual(out.getvalue(), pb.sub(br'\C\1\E\2', text.encode('ascii')))
+
+            pieces = []  # type: list[str]
+            repl = p.compile(r'\2-\c\1', flags)
+            repl.expand_into(p.search('x foo7'), pieces.append)
+            self.assertEqual(''.join(pieces), '7-Foo')
+
+        out = io.StringIO()
+        self.assertEqual(p.subf_into(out, r'{2}{name!r}', text), 10)
+        self.assertEqual(out.getvalue(), p.subf(r'{2}{name!r}', text))
+
+    def test_subn_parallel(self):
+        """Test that `subn_parallel` splits the input and joins the results in order."""
+
+        text = 'This is a tset for subn!\n' * 20 + 'last tset'
+        expected = bre.subn(r'(t)(s)(e)(t)', r'\C\1\3\E\2\4', text)
+        self.assertEqual(
+            bre.subn_parallel(r'(t)(s)(e)(t)', r'\C\1\3\E\2\4', text, workers=2, chunk_size=30), expected
+        )
+        self.assertEqual(
+            bre.subn_parallel(r'(t)(s)(e)(t)', r'\C\1\3\E\2\4', text, workers=1, chunk_size=30), expected
+        )
+
+        p = bre.compile(r'(t)(s)(e)(t)')
+        replace = p.compile('{1}{3}{2}{4!r}', bre.FORMAT)
+        self.assertEqual(
+            bre.subfn_parallel(p, replace, text, workers=2, chunk_size=50, splitter=r'!\n'),
+            p.subfn(replace, text)
+        )
+        self.assertEqual(bre.subfn_parallel(b'(a)', b'{1}{1}', b'', workers=2), (b'', 0))
+
+        with pytest.raises(ValueError):
+            bre.subn_parallel(p, replace, text)
+
+        with pytest.raises(ValueError):
+            bre.subn_parallel(p, 'test', text, chunk_size=0)
+
+    def test_parallel_boundaries(self):
+        """Test that pieces are searched within the whole input, so the text before each piece is seen."""
+
+        text = 'a\na b\n' * 5
+        self.assertEqual(bre.subn(r'(?<=\n)a', 'x', text)[1], 9)
+        for pattern in (r'(?<=\n)a', r'^a', r'\Aa', r'\bb', r'\Bb', r'(?m)^', r'x*'):
+            expected = (bre.subn(pattern, '<\\g<0>>', text), bre.findall(pattern, text))
+            for workers in (1, 2):
+                self.assertEqual(
+                    (
+                        bre.subn_parallel(pattern, '<\\g<0>>', text, workers=workers, chunk_size=3),
+                        bre.findall_parallel(pattern, text, workers=workers, chunk_size=3)
+                    ),
+                    expected
+                )
+
+    def test_findall_parallel(self):
+        """Test that `findall_parallel` works."""
+
+        text = 'word 1\nword 22\n\nword 333 word 4444'
+        self.assertEqual(
+            bre.findall_parallel(r'(\w+) (\d+)', text, workers=2, chunk_size=3),
+            bre.findall(r'(\w+) (\d+)', text)
+        )
+        self.assertEqual(
+            bre.findall_parallel(r'\d+', text, splitter=r'\n\n', chunk_size=1), ['1', '22', '333', '4444']
+        )
+
+    def test_multisub(self):
+        """Test replacing the matches of many patterns in one pass."""
+
+        p = bre.compile(r'(q)(u)')
+        rules = {
+            r'(?P<w>cat)s?|dog': r'\C\g<w>\E',
+            r'(\d+)-(\d+)': r'\2-\1',
+            r'(a)(b)?\1': r'<\g<0>|\2>',
+            r'(?P<x>[xy])(?(x)z)(?P=x)': lambda m: m.group('x') * 3,
+            r'\p{Greek}+': r'[\g<0>]',
+            p: p.compile(r'{2!r}{1:>3}', bre.FORMAT)
+        }
+        multi = bre.MultiSub(rules)
+        text = 'cats dog 12-34 aba aa xzx yy αβγ qu'
+        self.assertEqual(multi.subn(text), ("CAT  34-12 <aba|b> <aa|> xxx yy [αβγ] 'u'  q", 8))
+        self.assertEqual(multi.sub(text, 2), 'CAT  12-34 aba aa xzx yy αβγ qu')
+
+        multi = bre.MultiSub({r' (a) \1  # (?P<n> [': 'A', r'[#] (b)': r'\1\1', r'(?P<n>c)': r'\g<n>!'}, bre.X)
+        self.assertEqual(multi.sub('aa #b c'), 'A bb c!')
+
+        multi = bre.MultiSub({br'(a)\1': br'\1', br'(?P<n>b)(?P=n)': b'c'})
+        self.assertEqual(multi.sub(b'aabb'), b'ac')
+
+    def test_multisub_errors(self):
+        """Test rules that cannot be combined."""
+
+        with pytest.raises(ValueError):
+            bre.MultiSub({})
+
+        with pytest.raises(ValueError):
+            bre.MultiSub({r'a': 'b', bre.compile(r'c', bre.I): 'd'})
+
+        with pytest.raises(ValueError):
+            bre.MultiSub({r'a': 'b', r'(?i)c': 'd'}, bre.I)
+
     def test_findall(self):
         """Test that `findall` works."""
 
@@ -2,11 +2,20 @@
 """Test bregex lib."""
 import unittest
 from backrefs import bregex
+from backrefs import _stream
 from backrefs import _bregex_parse
 import regex
 import pytest
 import random
 import copy
+from backrefs import util
+import gc
+import weakref
+import os
+import pickle
+import tempfile
+import io
+from unittest import mock
 import time
 import sys
 try:
@@ -144,6 +153,297 @@ class TestSearchTemplate(unittest.TestCase):
         self.assertEqual(bregex._get_cache_size(True), 0)
         self.assertEqual(len(_cache), 0)
 
+    def test_cache_info(self):
+        """Test cache statistics and resizing."""
+
+        bregex.purge()
+        try:
+            bregex.compile_search(r'\p{Greek}')
+            bregex.compile_search(r'\p{Greek}')
+            info = bregex.cache_info()
+            self.assertEqual((info.hits, info.misses, info.evictions, info.currsize), (1, 1, 0, 1))
+            self.assertEqual(info.policy, bregex.CACHE_LRU)
+            self.assertTrue(info.parse_time > 0)
+
+            bregex.set_cache_size(2)
+            for pattern in ('a', 'b', 'c'):
+                bregex.compile_search(pattern)
+            info = bregex.cache_info()
+            self.assertEqual((info.maxsize, info.currsize, info.evictions), (2, 2, 2))
+
+            bregex.set_cache_size(0)
+            self.assertEqual(bregex._get_cache_size(), 0)
+            bregex.compile_search('d')
+            self.assertEqual(bregex._get_cache_size(), 0)
+
+            bregex.compile(r'(\w+)').sub(r'\C\1', 'test')
+            self.assertEqual(bregex.cache_info(True).currsize, 1)
+
+            with pytest.raises(ValueError):
+                bregex.set_cache_size(-1)
+            with pytest.raises(ValueError):
+                bregex.set_cache_policy('fifo')
+        finally:
+            bregex.set_cache_size(bregex._MAXCACHE)
+            bregex.purge()
+
+    def test_cache_lfu(self):
+        """Test least frequently used cache policy."""
+
+        bregex.purge()
+        try:
+            bregex.set_cache_policy(bregex.CACHE_LFU)
+            bregex.set_cache_size(2)
+            for pattern in ('a', 'a', 'a', 'b', 'c'):
+                bregex.compile_search(pattern)
+            self.assertEqual(bregex.cache_info().evictions, 1)
+
+            # `b` was used least and evicted, `a` and `c` remain.
+            hits = bregex.cache_info().hits
+            bregex.compile_search('a')
+            bregex.compile_search('c')
+            self.assertEqual(bregex.cache_info().hits, hits + 2)
+            bregex.compile_search('b')
+            self.assertEqual(bregex.cache_info().hits, hits + 2)
+
+            # Switching policies keeps entries.
+            bregex.set_cache_policy(bregex.CACHE_LRU)
+            self.assertEqual(bregex.cache_info().currsize, 2)
+        finally:
+            bregex.set_cache_policy(bregex.CACHE_LRU)
+            bregex.set_cache_size(bregex._MAXCACHE)
+            bregex.purge()
+
+    def test_compile_cache(self):
+        """Test that compiled objects are cached."""
+
+        bregex.purge()
+        try:
+            pattern = bregex.compile(r'\p{Greek}+')
+            self.assertTrue(bregex.compile(r'\p{Greek}+') is pattern)
+            self.assertTrue(bregex.compile(r'\p{Greek}+', bregex.I) is not pattern)
+            self.assertTrue(bregex.compile(r'\p{Greek}+', auto_compile=False) is not pattern)
+
+            # Module level helpers use the cached object instead of compiling again.
+            with mock.patch.object(bregex, 'compile_search', side_effect=AssertionError):
+                self.assertEqual(bregex.search(r'\p{Greek}+', 'abc αβγ').group(0), 'αβγ')
+                self.assertEqual(bregex.sub(r'\p{Greek}+', r'\C\g<0>', 'abc αβγ'), 'abc ΑΒΓ')
+                self.assertEqual(bregex.split(r'\p{Greek}+', 'a αβ b'), ['a ', ' b'])
+
+            # Named lists are not cached.
+            self.assertTrue(bregex.compile(r'\L<x>', x=['a']) is not bregex.compile(r'\L<x>', x=['a']))
+
+            info = bregex.cache_info(compiled=True)
+            self.assertEqual((info.hits, info.misses, info.currsize), (4, 3, 3))
+            self.assertTrue(info.parse_time > 0)
+            with pytest.raises(ValueError):
+                bregex.cache_info(True, compiled=True)
+
+            bregex.purge()
+            self.assertTrue(bregex.compile(r'\p{Greek}+') is not pattern)
+        finally:
+            bregex.purge()
+
+    def test_replace_cache_weak(self):
+        """Test that the replace cache does not keep patterns alive."""
+
+        bregex.purge()
+        try:
+            pattern = regex.compile(r'(\w+)')
+            ref = weakref.ref(pattern)
+            replace = bregex.compile_replace(pattern, r'\C\1')
+            self.assertTrue(bregex.compile_replace(pattern, r'\C\1') is replace)
+            self.assertEqual(pattern.sub(replace, 'test'), 'TEST')
+            bregex.compile_replace(pattern, r'\1')
+            bregex.compile_replace(pattern, r'\L\1')
+            info = bregex.cache_info(True)
+            self.assertEqual(info.currsize, 3)
+            self.assertTrue(info.memory > 0)
+
+            del pattern
+            regex.purge()
+            gc.collect()
+            self.assertTrue(ref() is None)
+            self.assertEqual(bregex.cache_info(True).currsize, 0)
+        finally:
+            bregex.purge()
+
+    def test_compile_many(self):
+        """Test compiling many patterns with a process pool."""
+
+        patterns = [r'\p{Greek}+', r'\p{Cyrillic}+', r'[[:alpha:]]\R', r'\p{Greek}+', b'\\d+']
+        bregex.purge()
+        try:
+            compiled = bregex.compile_many(patterns, bregex.I, workers=2)
+            self.assertEqual(len(compiled), len(patterns))
+            self.assertTrue(compiled[0] is compiled[3])
+            self.assertEqual(bregex.cache_info().currsize, 4)
+            with mock.patch.object(_bregex_parse._SearchParser, 'parse', side_effect=AssertionError):
+                for pattern, obj in zip(patterns, compiled, strict=True):
+                    self.assertTrue(bregex.compile(pattern, bregex.I) is obj)
+                    self.assertEqual(obj.flags & bregex.I, bregex.I)
+
+            bregex.purge()
+            serial = bregex.compile_many(patterns, bregex.I, workers=1)
+            self.assertEqual([p.pattern for p in serial], [p.pattern for p in compiled])
+
+            # Patterns are not preprocessed again when there are more than the search cache holds.
+            bregex.set_cache_size(2)
+            for workers in (1, 2):
+                bregex.purge()
+                many = bregex.compile_many(patterns, bregex.I, workers=workers)
+                self.assertEqual([p.pattern for p in many], [p.pattern for p in compiled])
+                self.assertEqual(bregex.cache_info().misses, 4)
+
+            with pytest.raises(_regex_core.error):
+                bregex.compile_many([r'\p{Greek}', r'\p{bad}'], workers=2)
+        finally:
+            bregex.set_cache_size(bregex._MAXCACHE)
+            bregex.purge()
+
+    def test_bundle(self):
+        """Test exporting and importing a bundle of patterns and templates."""
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'patterns.bundle')
+            bregex.purge()
+            try:
+                pattern = bregex.compile(r'(\p{Greek}+) (?P<word>\w+)')
+                pattern.sub(r'\C\1\E \g<word>', 'αβγ test')
+                pattern.subf(r'{word} {1}', 'αβγ test')
+                bregex.compile_search(r'[[:upper:]]')
+                bregex.dump_bundle(path)
+
+                bregex.purge()
+                with mock.patch.object(_bregex_parse._SearchParser, 'parse', side_effect=AssertionError), \
+                        mock.patch.object(_bregex_parse._ReplaceParser, 'parse', side_effect=AssertionError):
+                    loaded = bregex.load_bundle(path)
+                    self.assertEqual([(p.pattern, p.flags) for p in loaded], [(pattern.pattern, pattern.flags)])
+                    self.assertTrue(bregex.compile(r'(\p{Greek}+) (?P<word>\w+)') is loaded[0])
+                    self.assertEqual(loaded[0].sub(r'\C\1\E \g<word>', 'αβγ test'), 'ΑΒΓ test')
+                    self.assertEqual(loaded[0].subf(r'{word} {1}', 'αβγ test'), 'test αβγ')
+                    replace = bregex.compile_replace(loaded[0]._pattern, r'\C\1\E \g<word>')
+                    self.assertEqual(replace.pattern_hash, hash(loaded[0]._pattern))
+                    bregex.compile_search(r'[[:upper:]]')
+            finally:
+                bregex.purge()
+
+    def test_bundle_mismatch(self):
+        """Test that bundles from a different environment are rejected."""
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'patterns.bundle')
+            with open(path, 'wb') as f:
+                pickle.dump(((1, 'bregex', '0.0.0', '0.0.0', (0, 0)), {'search': [], 'compile': [], 'replace': []}), f)
+            with pytest.raises(ValueError):
+                bregex.load_bundle(path)
+
+    def test_plain_pattern_fast_path(self):
+        """Test that patterns without extended syntax are returned as is."""
+
+        with mock.patch.object(_bregex_parse._SearchParser, 'main_group', side_effect=AssertionError):
+            self.assertEqual(_bregex_parse._SearchParser(r'(?i:\w+) [a-z]+').parse(), r'(?i:\w+) [a-z]+')
+            self.assertEqual(_bregex_parse._SearchParser(rb'(\d+)\s*[^\]]').parse(), rb'(\d+)\s*[^\]]')
+
+    def test_plain_pattern_fast_path_differential(self):
+        """Test that the fast path matches the full parser on random patterns."""
+
+        def outcome(func, *args):
+            try:
+                return func(*args)
+            except Exception as e:
+                return type(e)
+
+        rng = random.Random(0)
+        alphabet = '\\[]()?#:^-apLxu{}\nRQE V10emiPNXcls'
+        for _ in range(1500):
+            text = ''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 16)))
+            for verbose in (False, True):
+                for option in (0, bregex.V1):
+                    parser = _bregex_parse._SearchParser(text, verbose, option)
+                    self.assertEqual(outcome(parser.parse), outcome(parser._parse, text), repr(text))
+
+    def test_run_scanning_differential(self):
+        """Test that skipping runs of plain characters gives the same result as stepping over each character."""
+
+        def outcome(text, verbose, option, is_bytes):
+            search = text.encode('latin-1') if is_bytes else text
+            try:
+                return _bregex_parse._SearchParser(search, verbose, option)._parse(text)
+            except Exception as e:
+                return type(e)
+
+        def char_by_char(*args):
+            never = regex.compile('(?!)')
+            with mock.patch.multiple(
+                _bregex_parse._SearchParser,
+                _plain_quote=never,
+                _plain_comment=never,
+                _plain_class=never,
+                _plain=(never, never),
+                _plain_group=(never, never)
+            ):
+                return outcome(*args)
+
+        patterns = [
+            'ab\\Q(a)#"\'\\E[^-a]c',
+            'a # c(\n)b\\(d',
+            '(?x)a#[\n(b) \\# e',
+            '[a-z\\]\\[#(]-\\p{L}]x',
+            '(?-x:a #b)#c\n(d',
+            '"a\\Q\\\\E"\\Q[(#\n',
+            '\\Qa\\E\\Q'
+        ]
+        rng = random.Random(0)
+        alphabet = '\\[]()#"\'\n aQEpL{}^-?x:ecR'
+        patterns.extend(''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 20))) for _ in range(1000))
+        for text in patterns:
+            for verbose in (False, True):
+                for option in (0, bregex.V0, bregex.V1):
+                    for is_bytes in (False, True):
+                        args = (text, verbose, option, is_bytes)
+                        self.assertEqual(outcome(*args), char_by_char(*args), repr(args))
+
+    def test_disk_cache(self):
+        """Test that preprocessed patterns are persisted and reloaded from disk."""
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'search.cache')
+            try:
+                bregex.purge()
+                bregex.set_disk_cache(path)
+                pattern = bregex.compile_search(r'\p{Greek}\R')
+                bregex.save_disk_cache()
+                self.assertTrue(os.path.exists(path))
+
+                bregex.purge()
+                bregex.set_disk_cache(path)
+                with mock.patch.object(_bregex_parse._SearchParser, 'parse', side_effect=AssertionError):
+                    self.assertEqual(bregex.compile_search(r'\p{Greek}\R').pattern, pattern.pattern)
+            finally:
+                bregex.set_disk_cache(None)
+                bregex.purge()
+
+    def test_disk_cache_mismatch(self):
+        """Test that entries from a different environment are discarded."""
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'search.cache')
+            with open(path, 'wb') as f:
+                pickle.dump((('bregex', '0.0.0', '0.0.0', (0, 0)), {(r'\R', 0, 0): 'bad'}), f)
+            try:
+                bregex.purge()
+                bregex.set_disk_cache(path)
+                self.assertTrue(bregex.compile_search(r'\R').pattern != 'bad')
+                bregex.save_disk_cache()
+                with open(path, 'rb') as f:
+                    signature, entries = pickle.load(f)
+                self.assertEqual(signature[0], 'bregex')
+                self.assertTrue('bad' not in entries.values())
+            finally:
+                bregex.set_disk_cache(None)
+                bregex.purge()
+
     def test_infinite_loop_catch(self):
         """Test infinite loop catch."""
 
@@ -153,6 +453,53 @@ class TestSearchTemplate(unittest.TestCase):
         with pytest.raises(_bregex_parse.LoopException):
             bregex.compile_search(r'(?V1)(?V0)')
 
+    def test_global_flags_parse_once(self):
+        """Test that global flags at the top level are switched in place when nothing before them changes."""
+
+        main_group = _bregex_parse._SearchParser.main_group
+        for pattern, passes in (
+            (r'\p{Greek}' * 50 + r'(?V1)[[a-z]--[aeiou]]', 1),
+            (r'\R(a|b)[^a-c]' * 50 + r'(?x) # comment', 1),
+            (r'(?x)(?V1)[[a]]', 1),
+            (r'a#b(?x)', 2),
+            (r'[[a]](?V1)', 2),
+            (r'(a(?V1))', 2)
+        ):
+            with mock.patch.object(
+                _bregex_parse._SearchParser, 'main_group', autospec=True, side_effect=main_group
+            ) as m:
+                bregex.compile_search(pattern)
+            self.assertEqual(m.call_count, passes, pattern)
+
+    def test_global_flags_differential(self):
+        """Test that switching global flags in place gives the same result as parsing the pattern again."""
+
+        class Restart(_bregex_parse._SearchParser):
+            """Always parse the pattern again when a global flag changes."""
+
+            depth = property(lambda self: 1, lambda self, value: None)
+
+        def outcome(cls, text, verbose, version):
+            try:
+                return cls(text, verbose, version).parse()
+            except Exception as e:
+                return type(e)
+
+        rng = random.Random(0)
+        tokens = [
+            '(?V1)', '(?V0)', '(?x)', '(?-x)', '(?xV1)', '(?V1x-x)', '(?V1:', '(?x:', '(?-x:', '[[', ']', '[:alpha:]',
+            '#', '\n', '(', ')', 'a', ' ', '\\', '^', '--'
+        ]
+        for _ in range(3000):
+            text = ''.join(rng.choice(tokens) for _ in range(rng.randint(1, 10)))
+            for verbose in (False, True):
+                for version in (0, bregex.V0, bregex.V1):
+                    self.assertEqual(
+                        outcome(_bregex_parse._SearchParser, text, verbose, version),
+                        outcome(Restart, text, verbose, version),
+                        repr((text, verbose, version))
+                    )
+
     def test_comments_v0(self):
         """Test comments v0."""
 
@@ -615,6 +962,105 @@ class TestReplaceTemplate(unittest.TestCase):
 
         self.assertEqual(bregex.compile(r'(test)|(what)').sub(r'\2', 'test'), '')
 
+    def test_engine_template(self):
+        """Test that plain templates are expanded by the regular expression engine."""
+
+        pattern = bregex.compile(r'(\w+)@(?P<host>\w+)')
+        replace = pattern.compile(r'\g<host>\\\1\x41\E')
+        self.assertEqual(replace._template, '\\g<2>\\\\\\g<1>A')
+        self.assertTrue(pattern.compile(r'\C\1\E')._template is None)
+        self.assertTrue(pattern.compile(r'\c\1')._template is None)
+        self.assertTrue(pattern.compile(r'{1}', bregex.FORMAT)._template is None)
+
+        with mock.patch.object(bregex.ReplaceTemplate, 'expand', side_effect=AssertionError):
+            self.assertEqual(pattern.sub(replace, 'me@host'), 'host\\meA')
+            self.assertEqual(pattern.subn(replace, 'me@host'), ('host\\meA', 1))
+            self.assertEqual(bregex.sub(r'(\w+)@(\w+)', r'\2\\\1', 'me@host'), 'host\\me')
+            self.assertEqual(bregex.subn(r'(\w+)@(\w+)', r'\2\\\1', 'me@host'), ('host\\me', 1))
+
+        bpattern = bregex.compile(br'(\w+)@(\w+)')
+        replace = bpattern.compile(br'\2\xff\\\1')
+        self.assertEqual(replace._template, b'\\g<2>\xff\\\\\\g<1>')
+        self.assertEqual(bpattern.sub(replace, b'me@host'), b'host\xff\\me')
+
+        # Groups the pattern does not have are still reported by the template, and only if there is a match.
+        pattern = bregex.compile(r'(a)(b)(c)')
+        self.assertEqual(pattern.sub(r'\10', 'xyz'), 'xyz')
+        self.assertEqual(bregex.subn(r'(a)(b)(c)', r'\4', 'xyz'), ('xyz', 0))
+        with pytest.raises(IndexError):
+            pattern.sub(r'\10', 'abc')
+        with pytest.raises(IndexError):
+            bregex.sub(r'(a)(b)(c)', r'\4', 'abc')
+
+    def test_codegen(self):
+        """Test templates that expand with a generated function."""
+
+        pattern = bregex.compile(r'(\w)(\w)?(?P<x>\w+)')
+        bpattern = bregex.compile(br'(\w)(\w)?(?P<x>\w+)')
+        for obj, template, flags, string in (
+            (pattern, r'\3\c\1\L\g<x>\E-\2\\', 0, 'abc de f'),
+            (pattern, r'{x}\c{1!s}\L{2:>2}\E{0[0]}{{', bregex.FORMAT, 'abc de f'),
+            (bpattern, br'\C\1\E\2', 0, b'abc de f')
+        ):
+            expected = obj.compile(template, flags)
+            replace = obj.compile(template, flags | bregex.CODEGEN)
+            self.assertTrue(replace.use_codegen)
+            self.assertNotEqual(replace, expected)
+            self.assertEqual(replace.pattern_hash, expected.pattern_hash)
+            sub = obj.subf if flags else obj.sub
+            self.assertEqual(sub(replace, string), sub(expected, string))
+
+            copied = pickle.loads(pickle.dumps(replace))
+            self.assertEqual(copied, replace)
+            self.assertEqual(hash(copied), hash(replace))
+            self.assertEqual(sub(copied, string), sub(expected, string))
+
+        with self.assertRaises(TypeError):
+            bpattern.compile(br'\1', bregex.CODEGEN)(bregex.compile_search(r'(\w)').match('a'))
+
+        with self.assertRaises(ValueError):
+            bpattern.compile(br'\1', bregex.CODEGEN).expand(None)
+
+    def test_compiled_format(self):
+        """Test that compiled format operations match interpreting them."""
+
+        pattern = bregex.compile(r'(?P<lvl>\w+) (?P<mod>\w+)')
+        for template in (
+            r'[{lvl:^7}] {mod!r:>10}', r'{0[0]!a:_<4}{lvl.__class__.__name__}', r'{mod[-1]}{1!s}{2:*>3s}', r'{lvl!r:3}'
+        ):
+            replace = pattern.compile(template, bregex.FORMAT)
+            m = pattern.match('INFO core')
+            for group, (_, (_, _, capture)) in zip(replace.groups, replace.group_slots, strict=True):
+                captures = [m.group(group[1])]
+                self.assertEqual(
+                    util.compile_format(capture, util._to_str, '')(captures),
+                    util.format_captures(captures, capture, util._to_str, '')
+                )
+            self.assertEqual(pattern.subf(replace, 'INFO core'), pattern.subf(template, 'INFO core'))
+
+    def test_bytes_span_case(self):
+        """Test that byte case spans only convert ASCII letters, and Unicode spans convert each character."""
+
+        pattern = bregex.compile(br'(\w+)')
+        replace = pattern.compile(b'\\Cab\xe9\xff\xb5 cd\\1\\E-\\Lx\xc9Y\\x41\\E')
+        self.assertEqual(replace.literals[0], b'AB\xe9\xff\xb5 CD')
+        self.assertEqual(pattern.sub(replace, b'w'), b'AB\xe9\xff\xb5 CDW-x\xc9ya')
+
+        # Unicode templates convert each character on its own, so a final sigma is not a special case.
+        self.assertEqual(bregex.sub('x', '\\L\u039f\u0394\u039f\u03a3\\E', 'x'), '\u03bf\u03b4\u03bf\u03c3')
+
+    def test_many_group_slots(self):
+        """Test expanding a template with many group references and case changes."""
+
+        pattern = bregex.compile(r'(\w)(\w)(\w)')
+        replace = pattern.compile(r'\3\c\1\L\2\E-\C\1\3\E' * 5 + r'{\2}')
+        expected = 'cAb-AC' * 5 + '{b}'
+        self.assertEqual(pattern.sub(replace, 'abc'), expected)
+        self.assertEqual(pattern.sub(pickle.loads(pickle.dumps(replace)), 'abc'), expected)
+
+        replace = pattern.compile(r'{3}\c{1!s}\L{2:>2}\E' * 5, bregex.FORMAT)
+        self.assertEqual(pattern.subf(replace, 'abc'), 'cA b' * 5)
+
     def test_hash(self):
         """Test hashing of replace."""
 
@@ -2077,6 +2523,282 @@ class TestConvenienceFunctions(unittest.TestCase):
             ('This is a test for subfn! This is a test for subfn!', 2)
         )
 
+    def test_sub_stream(self):
+        """Test that `sub_stream` matches `subn` regardless of how the input is chunked."""
+
+        text = 'xxbab\nxa\n' * 50 + 'ax'
+        for pattern, repl in ((r'(?m)^(\w)', r'[\C\1\E]'), (r'x*?', '-'), (r'(?<=b)a|\bx+', r'\g<0>!'), (r'$', '$')):
+            expected = bregex.subn(pattern, repl, text)
+            for size in (1, 3, 7):
+                chunks = [text[i:i + size] for i in range(0, len(text), size)]
+                sink = io.StringIO()
+                count = bregex.sub_stream(pattern, repl, chunks, sink, chunk_size=size, overlap=4)
+                self.assertEqual((sink.getvalue(), count), expected)
+
+        sink = io.StringIO()
+        self.assertEqual(bregex.sub_stream(r'b', 'B', io.StringIO(text), sink, 3, chunk_size=2), 3)
+        self.assertEqual(sink.getvalue(), bregex.sub(r'b', 'B', text, 3))
+
+        sink = io.BytesIO()
+        p = bregex.compile(br'(\w)(\w)')
+        self.assertEqual(p.sub_stream(b'\\2\\1', io.BytesIO(text.encode()), sink, chunk_size=5), 151)
+        self.assertEqual(sink.getvalue(), p.sub(b'\\2\\1', text.encode()))
+
+    def test_sub_stream_lines(self):
+        """Test that `sub_stream` can search complete lines at a time."""
+
+        text = 'first line\nsecond line\n\nlast'
+        sink = io.StringIO()
+        self.assertEqual(
+            bregex.sub_stream(
+                r'(?m)^(\w+)(.*)$', r'\2 \1', iter(text.splitlines(True)), sink, chunk_size=1, lines=True
+            ),
+            3
+        )
+        self.assertEqual(sink.getvalue(), ' line first\n line second\n\n last')
+
+        # Anchors and lookaheads at a line break see the text after it.
+        text = '\nb\n ba\n' * 5
+        for pattern in (r'b$', r'b(?=\na)', r'b\Z'):
+            expected = bregex.subn(pattern, 'X', text)
+            for size in (1, 4):
+                chunks = [text[i:i + size] for i in range(0, len(text), size)]
+                sink = io.StringIO()
+                count = bregex.sub_stream(pattern, 'X', chunks, sink, chunk_size=size, overlap=3, lines=True)
+                self.assertEqual((sink.getvalue(), count), expected)
+
+        # Without line breaks, the text is still written as it is read.
+        sink = io.StringIO()
+        lag = []
+
+        def source():
+            for i in range(100):
+                lag.append(i * 5 - len(sink.getvalue()))
+                yield 'abcde'
+
+        self.assertEqual(bregex.sub_stream('c', 'C', source(), sink, chunk_size=10, overlap=4, lines=True), 100)
+        self.assertEqual(sink.getvalue(), 'abCde' * 100)
+        self.assertLess(max(lag), 20)
+
+    def test_subf_stream(self):
+        """Test that `subf_stream` works."""
+
+        text = 'This is a tset for subf! ' * 20
+        sink = io.StringIO()
+        p = bregex.compile(r'(t)(s)(e)(t)')
+        replace = p.compile('{1}{3}{2}{4!r:>6}', bregex.FORMAT)
+        self.assertEqual(p.subf_stream(replace, io.StringIO(text), sink, chunk_size=8, overlap=4), 20)
+        self.assertEqual(sink.getvalue(), p.subf(replace, text))
+
+        with pytest.raises(ValueError):
+            p.sub_stream(replace, [text], io.StringIO())
+
+        with pytest.raises(ValueError):
+            bregex.sub_stream(r'a', '-', ['a'], io.StringIO(), overlap=0)
+
+        with pytest.raises(ValueError):
+            bregex.sub_stream(r'(?r)a', '-', ['a'], io.StringIO())
+
+    def test_file_search(self):
+        """Test searching files through a memory map."""
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'data.bin')
+            with open(path, 'wb') as f:
+                f.write(b'abc foo123 bar\nfoo9\xff\n')
+
+            p = bregex.compile(br'foo(\d+)')
+            self.assertEqual(
+                [(m.span(), m.group(1)) for m in p.finditer_file(path)],
+                [((4, 10), b'123'), ((15, 19), b'9')]
+            )
+            m = p.search_file(path, 5)
+            self.assertEqual((m.start(), m.group(0)), (15, b'foo9'))
+            # Release the map so the file can be removed on Windows.
+            del m
+
+            empty = os.path.join(tmp, 'empty.bin')
+            open(empty, 'wb').close()
+            self.assertIsNone(p.search_file(empty))
+
+            with pytest.raises(TypeError):
+                bregex.compile(r'foo').search_file(path)
+
+            # Matches are detached from the map, so they can be used after it is closed.
+            map_file = _stream.map_file
+            maps = []
+            with mock.patch.object(_stream, 'map_file', lambda *args: maps.append(map_file(*args)) or maps[-1]):
+                found = list(p.finditer_file(path))
+                m = p.search_file(path)
+            self.assertEqual([x.group(1) for x in found] + [m.group(1)], [b'123', b'9', b'123'])
+            self.assertTrue(all(buf.closed for buf in maps))
+
+    def test_sub_file(self):
+        """Test substituting files through a memory map."""
+
+        with tempfile.TemporaryDirectory() as tmp:
+            src = os.path.join(tmp, 'src.bin')
+            dest = os.path.join(tmp, 'dest.bin')
+            data = b'abc foo123 bar\nfoo9\xff\n' * 10
+            with open(src, 'wb') as f:
+                f.write(data)
+
+            p = bregex.compile(br'(?P<name>[a-z]+)(\d+)')
+            for repl, count in ((br'\C\g<name>\E=\2', 0), (br'[\1]', 3), (lambda m: m.group(2), 1)):
+                self.assertEqual(p.sub_file(repl, src, dest, count), p.subn(repl, data, count)[1])
+                with open(dest, 'rb') as f:
+                    self.assertEqual(f.read(), p.sub(repl, data, count))
+
+            map_file = _stream.map_file
+            maps = []
+            with mock.patch.object(_stream, 'map_file', lambda *args: maps.append(map_file(*args)) or maps[-1]):
+                p.sub_file(b'x', src, dest)
+            self.assertTrue(maps[0].closed)
+
+            # The source is not mapped if it cannot be written to.
+            with mock.patch.object(_stream, 'map_file', side_effect=AssertionError), pytest.raises(ValueError):
+                p.sub_file(b'x', src, src)
+
+                with pytest.raises(ValueError):
+                    bregex.compile(br'(?r)a').sub_file(b'b', src, dest)
+
+    def test_sub_into(self):
+        """Test writing substitutions into a writer piece by piece."""
+
+        text = 'abc foo123 bar\nfoo9 ' * 5
+        p = bregex.compile(r'(?P<name>[a-z]+)(\d+)')
+        for flags in (0, bregex.CODEGEN):
+            for repl, count in ((r'\C\g<name>\E=\2', 0), (r'[\1]', 3), (lambda m: m.group(2), 1)):
+                if not callable(repl):
+                    repl = p.compile(repl, flags)
+                out = io.StringIO()
+                self.assertEqual(p.sub_into(out, repl, text, count), p.subn(repl, text, count)[1])
+                self.assertEqual(out.getvalue(), p.sub(repl, text, count))
+
+            out = io.BytesIO()
+            pb = bregex.compile(br'(\w+)(\d)')
+            self.assertEqual(pb.sub_into(out, pb.compile(br'\C\1\E\2', flags), text.encode('ascii')), 10)
+            self.assertEqual(out.getvalue(), pb.sub(br'\C\1\E\2', text.encode('ascii')))
+
+            pieces = []  # type: list[str]
+            repl = p.compile(r'\2-\c\1', flags)
+            repl.expand_into(p.search('x foo7'), pieces.append)
+            self.assertEqual(''.join(pieces), '7-Foo')
+
+        out = io.StringIO()
+        self.assertEqual(p.subf_into(out, r'{2}{name!r}', text), 10)
+        self.assertEqual(out.getvalue(), p.subf(r'{2}{name!r}', text))
+
+        with pytest.raises(ValueError):
+            bregex.compile(r'(?r)a').sub_into(io.StringIO(), 'b', 'a')
+
+    def test_subn_parallel(self):
+        """Test that `subn_parallel` splits the input and joins the results in order."""
+
+        text = 'This is a tset for subn!\n' * 20 + 'last tset'
+        expected = bregex.subn(r'(t)(s)(e)(t)', r'\C\1\3\E\2\4', text)
+        self.assertEqual(
+            bregex.subn_parallel(r'(t)(s)(e)(t)', r'\C\1\3\E\2\4', text, workers=2, chunk_size=30), expected
+        )
+        self.assertEqual(
+            bregex.subn_parallel(r'(t)(s)(e)(t)', r'\C\1\3\E\2\4', text, workers=1, chunk_size=30), expected
+        )
+
+        p = bregex.compile(r'(t)(s)(e)(t)')
+        replace = p.compile('{1}{3}{2}{4!r}', bregex.FORMAT)
+        self.assertEqual(
+            bregex.subfn_parallel(p, replace, text, workers=2, chunk_size=50, splitter=r'!\n', threads=True),
+            p.subfn(replace, text)
+        )
+        self.assertEqual(bregex.subfn_parallel(b'(a)', b'{1}{1}', b'', workers=2), (b'', 0))
+
+        with pytest.raises(ValueError):
+            bregex.subn_parallel(p, replace, text)
+
+        with pytest.raises(ValueError):
+            bregex.subn_parallel(p, 'test', text, chunk_size=0)
+
+    def test_parallel_boundaries(self):
+        """Test that pieces are searched within the whole input, so the text before each piece is seen."""
+
+        text = 'a\na b\n' * 5
+        self.assertEqual(bregex.subn(r'(?<=\n)a', 'x', text)[1], 9)
+        for pattern in (r'(?<=\n)a', r'^a', r'\Aa', r'\bb', r'\Bb', r'(?m)^', r'x*'):
+            expected = (bregex.subn(pattern, '<\\g<0>>', text), bregex.findall(pattern, text))
+            for workers in (1, 2):
+                for threads in (False, True):
+                    self.assertEqual(
+                        (
+                            bregex.subn_parallel(
+                                pattern, '<\\g<0>>', text, workers=workers, chunk_size=3, threads=threads
+                            ),
+                            bregex.findall_parallel(pattern, text, workers=workers, chunk_size=3, threads=threads)
+                        ),
+                        expected
+                    )
+
+        with pytest.raises(ValueError):
+            bregex.subn_parallel(r'(?r)a', 'x', text)
+
+        with pytest.raises(ValueError):
+            bregex.findall_parallel(r'a', text, flags=bregex.REVERSE)
+
+    def test_findall_parallel(self):
+        """Test that `findall_parallel` works."""
+
+        text = 'word 1\nword 22\n\nword 333 word 4444'
+        self.assertEqual(
+            bregex.findall_parallel(r'(\w+) (\d+)', text, workers=2, chunk_size=3, threads=True),
+            bregex.findall(r'(\w+) (\d+)', text)
+        )
+        self.assertEqual(
+            bregex.findall_parallel(r'\d+', text, splitter=r'\n\n', chunk_size=1), ['1', '22', '333', '4444']
+        )
+
+    def test_multisub(self):
+        """Test replacing the matches of many patterns in one pass."""
+
+        p = bregex.compile(r'(q)(u)')
+        rules = {
+            r'(?P<w>cat)s?|dog': r'\C\g<w>\E',
+            r'(\d+)-(\d+)': r'\2-\1',
+            r'(a)(b)?\1': r'<\g<0>|\2>',
+            r'(?P<x>[xy])(?(x)z)\g<x>': lambda m: m.group('x') * 3,
+            r'\p{Greek}+': r'[\g<0>]',
+            p: p.compile(r'{2!r}{1:>3}', bregex.FORMAT)
+        }
+        multi = bregex.MultiSub(rules)
+        text = 'cats dog 12-34 aba aa xzx yy αβγ qu'
+        self.assertEqual(multi.subn(text), ("CAT  34-12 <aba|b> <aa|> xxx yy [αβγ] 'u'  q", 8))
+        self.assertEqual(multi.sub(text, 2), 'CAT  12-34 aba aa xzx yy αβγ qu')
+
+        multi = bregex.MultiSub({r' (a) \1  # (?P<n> [': 'A', r'[#] (b)': r'\1\1', r'(?P<n>c)': r'\g<n>!'}, bregex.X)
+        self.assertEqual(multi.sub('aa #b c'), 'A bb c!')
+
+        multi = bregex.MultiSub({br'(a)\1': br'\1', br'(?P<n>b)(?P=n)': b'c'})
+        self.assertEqual(multi.sub(b'aabb'), b'ac')
+
+    def test_multisub_errors(self):
+        """Test rules that cannot be combined."""
+
+        with pytest.raises(ValueError):
+            bregex.MultiSub({})
+
+        with pytest.raises(ValueError):
+            bregex.MultiSub({r'a': 'b', bregex.compile(r'c', bregex.I): 'd'})
+
+        with pytest.raises(ValueError):
+            bregex.MultiSub({r'a': 'b', r'(?R)c': 'd'}, bregex.I)
+
+        with pytest.raises(ValueError):
+            bregex.MultiSub({r'a': 'b', r'c': 'd'}, bregex.REVERSE)
+
+        with pytest.raises(IndexError):
+            bregex.MultiSub({r'(a)': r'\1', r'c+': r'\1'})
+
+        with pytest.raises(IndexError):
+            bregex.MultiSub({r'a': r'\C\1', r'(c)': 'd'})
+
     def test_findall(self):
         """Test that `findall` works."""
 
@@ -2107,6 +2829,13 @@ class TestConvenienceFunctions(unittest.TestCase):
 
         self.assertEqual(count, 6)
 
+    def test_finditer_flags(self):
+        """Test that `finditer` applies flags, also along with position arguments."""
+
+        self.assertEqual([m.span() for m in bregex.finditer(r'a', 'aA', bregex.I)], [(0, 1), (1, 2)])
+        self.assertEqual([m.span() for m in bregex.finditer(r'a', 'aA', bregex.I, 1)], [(1, 2)])
+        self.assertEqual([m.span() for m in bregex.finditer(r'a', 'aAa', bregex.I, pos=1, endpos=2)], [(1, 2)])
+
     def test_expand(self):
         """Test that `expand` works."""
 
@@ -17,3 +17,148 @@ class TestUniprops(unittest.TestCase):
 
         with self.assertRaises(ValueError):
             uniprops.get_unicode_property('^bad')
+
+    def test_cached_property(self):
+        """Test that repeated lookups are served from the cache."""
+
+        uniprops.get_unicode_property.cache_clear()
+        value = uniprops.get_unicode_property('^greek', None, uniprops.MODE_UNICODE)
+        self.assertIs(uniprops.get_unicode_property('^greek', None, uniprops.MODE_UNICODE), value)
+        self.assertEqual(uniprops.get_unicode_property.cache_info().hits, 1)
+        self.assertNotEqual(uniprops.get_unicode_property('^greek', None, uniprops.MODE_ASCII), value)
+        self.assertNotEqual(uniprops.get_unicode_property('greek', None, uniprops.MODE_UNICODE), value)
+        self.assertEqual(uniprops.get_unicode_property.cache_info().currsize, 3)
+
+    def test_cached_bad_property(self):
+        """Test that failed lookups are not cached."""
+
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                uniprops.get_unicode_property('bad')
+
+    def test_packed_tables(self):
+        """Test that the packed tables hold the same ranges as the generated modules."""
+
+        import importlib
+        from backrefs.uniprops import _packed
+
+        def unpack(table):
+            return {k: unpack(v) if isinstance(v, _packed.Table) else v for k, v in table.items()}
+
+        data = _packed._open()
+        self.assertIsNotNone(data)
+        for name, tables in data[1].items():
+            module = importlib.import_module(f'backrefs.uniprops.unidata.{name}')
+            packed = _packed.load(name)
+            self.assertNotEqual(packed, module)
+            for attr in tables:
+                self.assertEqual(unpack(getattr(packed, attr)), getattr(module, attr))
+
+        self.assertIs(_packed.load('alias'), importlib.import_module('backrefs.uniprops.unidata.alias'))
+
+    def test_name_index(self):
+        """Test that names without a property resolve as they do when each kind of property is tried in turn."""
+
+        from backrefs.uniprops.unidata import alias
+
+        for name in [*alias.unicode_names, 'bad', 'isbad', 'inbad', 'l^x', '^']:
+            for prop in (name, '^' + name):
+                try:
+                    expected = uniprops._find_property(prop)
+                except ValueError:
+                    expected = None
+                try:
+                    self.assertEqual(uniprops.get_unicode_property(prop), expected)
+                except ValueError:
+                    self.assertIsNone(expected)
+
+    def test_name_index_loads_one_table(self):
+        """Test that a name without a property only loads the table of the property that owns it."""
+
+        from backrefs.uniprops import _packed
+
+        for prop, loaded in (
+            ('bad', set()),
+            ('lu', {'generalcategory'}),
+            ('^greek', {'scriptextensions'}),
+            ('alpha', {'binary'}),
+            ('basiclatin', {'block'}),
+            ('isgreek', {'scriptextensions'}),
+            ('inbasiclatin', {'block'})
+        ):
+            uniprops.get_unicode_property.cache_clear()
+            _packed._modules.clear()
+            try:
+                uniprops.get_unicode_property(prop)
+            except ValueError:
+                pass
+            self.assertEqual(set(_packed._modules), loaded)
+
+    def test_contains(self):
+        """Test checking if a code point has a property."""
+
+        self.assertTrue(uniprops.contains('Script', 'Greek', '\u03b1'))
+        self.assertTrue(uniprops.contains('sc', 'grek', ord('\u03b1')))
+        self.assertFalse(uniprops.contains('^greek', None, '\u03b1'))
+        self.assertTrue(uniprops.contains('alpha', None, 'a'))
+        self.assertFalse(uniprops.contains('Alphabetic', 'no', 'a'))
+        self.assertTrue(uniprops.contains('L', None, 'a'))
+        self.assertFalse(uniprops.contains('L', None, '1'))
+        self.assertTrue(uniprops.contains('blk', 'basic_latin', 0))
+        self.assertFalse(uniprops.contains('blk', 'basic_latin', 0x10ffff))
+
+        with self.assertRaises(ValueError):
+            uniprops.contains('script', 'bad', 'a')
+
+    def test_value_of(self):
+        """Test getting the value of a property for a code point."""
+
+        self.assertEqual(uniprops.value_of('Script', '\u03b1'), 'greek')
+        self.assertEqual(uniprops.value_of('gc', 'A'), 'lu')
+        self.assertEqual(uniprops.value_of('gc', 0x10ffff), 'cn')
+        self.assertEqual(uniprops.value_of('Line_Break', ord(' ')), 'sp')
+        self.assertEqual(uniprops.value_of('bc', 'a'), 'l')
+        self.assertIsNone(uniprops.value_of('bc', 0x10ffff))
+
+        for prop in ('scx', 'alpha', 'bad'):
+            with self.assertRaises(ValueError):
+                uniprops.value_of(prop, 'a')
+
+    def test_classify(self):
+        """Test classifying each character of a string."""
+
+        self.assertEqual(uniprops.classify('a\u03b11 ', 'script'), ['latin', 'greek', 'common', 'common'])
+        self.assertEqual(uniprops.classify('aA1', 'General_Category'), ['ll', 'lu', 'nd'])
+        self.assertEqual(uniprops.classify('', 'script'), [])
+
+    def test_partitions(self):
+        """Test that the values of properties that are classified do not overlap, and cover all code points."""
+
+        for prop in [*uniprops._PARTITIONS, 'generalcategory']:
+            firsts, lasts, _ = uniprops._get_partition(prop)
+            for i in range(1, len(firsts)):
+                self.assertGreater(firsts[i], lasts[i - 1])
+
+        firsts, lasts, _ = uniprops._get_partition('generalcategory')
+        self.assertEqual(sum(last - first + 1 for first, last in zip(firsts, lasts, strict=True)), 0x110000)
+
+    def test_classify_many(self):
+        """Test classifying the characters of many strings at once."""
+
+        from array import array
+
+        strings = ['a\u03b11 ', '', '\U0001f600a\U000e0001', '\U0010ffff']
+        for prop in ('script', 'gc', 'ea', 'block', 'bc'):
+            names, results = uniprops.classify_many(iter(strings), prop)
+            self.assertIsNone(names[0])
+            self.assertEqual(len(results), len(strings))
+            for string, result in zip(strings, results, strict=True):
+                self.assertIsInstance(result, array if len(names) > 256 else bytes)
+                self.assertEqual([names[i] for i in result], uniprops.classify(string, prop))
+
+        names, results = uniprops.classify_many(['aA'], 'General_Category')
+        self.assertEqual([names[i] for i in results[0]], ['ll', 'lu'])
+        self.assertIsInstance(uniprops.classify_many(['a'], 'block')[1][0], array)
+
+        with self.assertRaises(ValueError):
+            uniprops.classify_many(['a'], 'scx')
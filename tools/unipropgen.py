@@ -3,6 +3,9 @@ import sys
 import unicodedata
 import os
 import re
+import json
+import struct
+import importlib.util
 
 __version__ = '5.0.0'
 
@@ -26,6 +29,15 @@ HEADER = '''\
 {}'''
 TYPING = 'from __future__ import annotations\n\n'
 
+# Packed tables: a header of magic, format version, padding, index size, and the offset of the ranges, then the index,
+# then one index of each table, then the code point ranges as pairs of little endian 32 bit integers.
+# The index maps each module's tables to the offset and size of their own index, which maps keys to ranges.
+# Indexes are JSON. Keep in sync with `backrefs/uniprops/_packed.py`.
+PACKED_NAME = 'unidata.bin'
+PACKED_MAGIC = b'BRUP'
+PACKED_VERSION = 1
+PACKED_HEADER = struct.Struct('<4sHHII')
+
 
 def uniformat(value):
     """Convert a Unicode char."""
@@ -1227,6 +1239,160 @@ def gen_properties(output, files, aliases, ascii_props=False, append=False):
             f.write(HEADER.format(UNIVERSION, ''))
 
 
+def str2ranges(value):
+    """Convert a range string back to a list of code point ranges."""
+
+    ranges = []
+    i = 0
+    end = len(value)
+    while i < end:
+        if value[i] == '\\':
+            i += 1
+        first = last = ord(value[i])
+        i += 1
+        if i < end and value[i] == '-':
+            i += 1
+            if value[i] == '\\':
+                i += 1
+            last = ord(value[i])
+            i += 1
+        ranges.append((first, last))
+    return ranges
+
+
+def gen_packed(output, files):
+    """Pack the range tables of the generated modules into one binary file of code point ranges with an index."""
+
+    print('Building: Packed Tables')
+    index = {}
+    data = []
+    offsets = {}
+
+    def pack(value):
+        """Pack a table's ranges and return its index entry."""
+
+        if isinstance(value, dict):
+            return {k: pack(v) for k, v in sorted(value.items())}
+        ranges = tuple(str2ranges(value))
+        if ranges not in offsets:
+            offsets[ranges] = len(data) // 2
+            for r in ranges:
+                data.extend(r)
+        return [offsets[ranges], len(ranges)]
+
+    for key, path in sorted(files.items()):
+        if key == 'alias':
+            continue
+        name = os.path.splitext(os.path.basename(path))[0]
+        module = load_module(path)
+        index[name] = {
+            k: pack(v) for k, v in sorted(vars(module).items()) if k.startswith(('unicode_', 'ascii_'))
+        }
+
+    blocks = []
+    size = 0
+    for tables in index.values():
+        for k, v in tables.items():
+            block = json.dumps(v, separators=(',', ':')).encode('utf-8')
+            tables[k] = [size, len(block)]
+            blocks.append(block)
+            size += len(block)
+
+    encoded = json.dumps(index, separators=(',', ':')).encode('utf-8')
+    with open(os.path.join(output, PACKED_NAME), 'wb') as f:
+        offset = PACKED_HEADER.size + len(encoded) + size
+        f.write(PACKED_HEADER.pack(PACKED_MAGIC, PACKED_VERSION, 0, len(encoded), offset))
+        f.write(encoded)
+        f.write(b''.join(blocks))
+        f.write(struct.pack('<%dI' % len(data), *data))
+
+
+def load_module(path):
+    """Load a generated module from its path."""
+
+    name = os.path.splitext(os.path.basename(path))[0]
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def gen_names(files):
+    """
+    Append an index of the names that can be used without a property name to the alias table.
+
+    Each name maps to the first kind of property, in the order they are tried, that accepts it: a general category,
+    a script, a binary property, a block, or a script or binary property with an `is` prefix, or a block with an `in`
+    prefix. Negated names are looked up without their `^`.
+    """
+
+    print('Building: Name Index')
+    aliases = load_module(files['alias']).unicode_alias
+    gc = load_module(files['gc']).unicode_properties
+    scx = load_module(files['scx']).unicode_script_extensions
+    binary = load_module(files['binary']).unicode_binary
+    blocks = load_module(files['blk']).unicode_blocks
+
+    def is_gc(name):
+        """Check if a name is a general category."""
+
+        value = aliases['generalcategory'].get(name, name)
+        if len(value) == 1:
+            return value in gc
+        return len(value) == 2 and value[0] in gc and value[1] in gc[value[0]]
+
+    def is_scx(name):
+        """Check if a name is a script."""
+
+        return aliases['script'].get(name, name) in scx
+
+    def is_binary(name):
+        """Check if a name is a binary property."""
+
+        return aliases['binary'].get(name, name) in binary
+
+    def is_block(name):
+        """Check if a name is a block."""
+
+        return aliases['block'].get(name, name) in blocks
+
+    owners = (
+        ('generalcategory', is_gc),
+        ('scriptextensions', is_scx),
+        ('binary', is_binary),
+        ('block', is_block),
+        ('is', lambda name: name.startswith('is') and (is_scx(name[2:]) or is_binary(name[2:]))),
+        ('in', lambda name: name.startswith('in') and is_block(name[2:]))
+    )
+
+    names = set()
+    for p1, v in gc.items():
+        names.add(p1)
+        names.update(p1 + p2 for p2 in v if len(p2) == 1)
+    for table, key in ((scx, 'script'), (binary, 'binary'), (blocks, 'block')):
+        found = set(table) | set(aliases[key])
+        names |= found
+        if key != 'block':
+            names.update('is' + name for name in found)
+        else:
+            names.update('in' + name for name in found)
+    names |= set(aliases['generalcategory'])
+
+    index = {}
+    for name in sorted(names):
+        if name.startswith('^'):
+            continue
+        for owner, check in owners:
+            if check(name):
+                index[name] = owner
+                break
+
+    with open(files['alias'], 'a', encoding='utf-8') as f:
+        f.write('unicode_names: dict[str, str] = {\n')
+        f.write(',\n'.join(['    "%s": "%s"' % (k, v) for k, v in index.items()]))
+        f.write('\n}\n')
+
+
 def build_unicode_property_table(output, files, aliases):
     """Build and write out Unicode property table."""
 
@@ -1255,6 +1421,8 @@ def build_tables(output, version=None):
 
     build_unicode_property_table(output, files, aliases)
     build_ascii_property_table(output, files, aliases)
+    gen_names(files)
+    gen_packed(output, files)
 
 
 def set_version(version):